@@ -0,0 +1,86 @@
+"""
+测试共用的合成数据与测试基类
+
+生成与币安格式相同的分钟K线、按币安目录结构写出月度 zip，以及为每个测试准备独立数据/缓存目录的基类。
+各测试模块显式地从这里导入，不依赖某个测试模块的文件名。
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '规则类课程'))
+
+import crypto_cache
+import crypto_process
+
+
+def make_minutes(start: str, periods: int, seed: int = 0) -> pd.DataFrame:
+    """生成与币安 1m K线同格式的合成数据（open_time/close_time 为毫秒时间戳）"""
+    rng = np.random.default_rng(seed)
+    open_time = pd.date_range(start, periods=periods, freq='1min')
+    open_ms = open_time.asi8 // 10 ** 6
+    close = np.round(30000 + np.cumsum(rng.normal(0, 5, periods)), 2)
+    open_ = np.round(np.r_[close[0], close[:-1]], 2)
+    high = np.round(np.maximum(open_, close) + rng.uniform(0, 3, periods), 2)
+    low = np.round(np.minimum(open_, close) - rng.uniform(0, 3, periods), 2)
+    volume = np.round(rng.uniform(0, 10, periods), 5)
+    taker = np.round(volume * rng.uniform(0, 1, periods), 5)
+    return pd.DataFrame({
+        'open_time': open_ms,
+        'open': open_,
+        'high': high,
+        'low': low,
+        'close': close,
+        'volume': volume,
+        'close_time': open_ms + 59999,
+        'quote_volume': np.round(volume * close, 8),
+        'count': rng.integers(1, 500, periods),
+        'taker_buy_volume': taker,
+        'taker_buy_quote_volume': np.round(taker * close, 8),
+        'ignore': 0,
+    })
+
+
+def write_month_zip(data_dir: str, month: str, z: pd.DataFrame, symbol: str = 'BTCUSDT') -> str:
+    """按币安目录结构写出月度 zip（CSV 无 header）"""
+    folder = os.path.join(data_dir, symbol)
+    os.makedirs(folder, exist_ok=True)
+    name = f"{symbol}-1m-{month}"
+    path = os.path.join(folder, f"{name}.zip")
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(f"{name}.csv", z.to_csv(header=False, index=False))
+    return path
+
+
+class CryptoProcessTestCase(unittest.TestCase):
+    """为每个测试准备独立的数据目录与缓存目录"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self._patches = {
+            (crypto_process, 'DATA_DIR'): os.path.join(self.tmp, 'data'),
+            (crypto_cache, 'CACHE_DIR'): os.path.join(self.tmp, 'cache'),
+        }
+        self._saved = {}
+        for (mod, name), value in self._patches.items():
+            self._saved[(mod, name)] = getattr(mod, name)
+            setattr(mod, name, value)
+        self.data_dir = crypto_process.DATA_DIR
+
+        # 每个月只生成月末/月初两天，覆盖跨月边界同时保持测试足够快
+        self.jan = make_minutes('2024-01-30', 2 * 1440, seed=1)
+        self.feb = make_minutes('2024-02-01', 2 * 1440, seed=2)
+        write_month_zip(self.data_dir, '2024-01', self.jan)
+        write_month_zip(self.data_dir, '2024-02', self.feb)
+
+    def tearDown(self):
+        for (mod, name), value in self._saved.items():
+            setattr(mod, name, value)
+        shutil.rmtree(self.tmp, ignore_errors=True)
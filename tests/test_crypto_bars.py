@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+crypto_bars 测试
+"""
+
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '规则类课程'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '规则类课程', 'Stategy'))
+
+import crypto_bars
+import crypto_process
+import puppyV3_strategy
+from crypto_test_utils import make_minutes
+
+
+def loop_bar_ids(measure, threshold):
+    """逐行循环的参考实现：累计值跨过下一个 threshold 整数倍时结束当前 bar"""
+    ids, bar, total = [], 0, 0.0
+    for x in measure:
+        ids.append(bar)
+        total += x
+        while total >= (bar + 1) * threshold:
+            bar += 1
+    return ids
+
+
+class TestActivityBars(unittest.TestCase):
+    """测试成交量/成交额/成交笔数 bar"""
+
+    def setUp(self):
+        z = make_minutes('2024-01-30', 2 * 1440, seed=12)
+        for col in ('open_time', 'close_time'):
+            z[col] = crypto_process._parse_epoch_mixed(z[col])
+        self.z = z
+
+    def test_matches_loop_reference(self):
+        bars = crypto_bars.volume_bars(self.z, threshold=50.0)
+        ids = pd.Series(loop_bar_ids(self.z['volume'].to_numpy(), 50.0))
+        expected_volume = self.z['volume'].groupby(ids).sum()
+        np.testing.assert_allclose(bars['volume'].to_numpy(), expected_volume.to_numpy())
+        first_rows = ids.drop_duplicates().index
+        self.assertTrue((bars.index == self.z['open_time'].iloc[first_rows].to_numpy()).all())
+        self.assertEqual(bars.loc[bars.index[0], 'open'], self.z['open'].iloc[0])
+
+    def test_kinds_and_default_threshold(self):
+        for build, column in ((crypto_bars.volume_bars, 'volume'),
+                              (crypto_bars.dollar_bars, 'quote_volume'),
+                              (crypto_bars.tick_bars, 'count')):
+            bars = build(self.z)
+            self.assertEqual(bars.attrs['bar_column'], column)
+            self.assertEqual(bars.columns.tolist(), crypto_process.RESAMPLED_COLUMNS)
+            self.assertAlmostEqual(bars[column].sum(), self.z[column].sum(), delta=1e-6)
+            # 默认 threshold 使 bar 数与 1h 时间 bar 相当
+            self.assertLess(abs(len(bars) - 48), 5)
+        with self.assertRaises(ValueError):
+            crypto_bars.dollar_bars(self.z[['open_time', 'close', 'volume']])
+
+    def test_strategy_compatible(self):
+        bars = crypto_bars.volume_bars(self.z, threshold=self.z['volume'].sum() / 400)
+        data_price, _ = puppyV3_strategy.execute_strategy(bars, columns=['close', 'position', 'nav'])
+        self.assertEqual(len(data_price), len(bars))
+        self.assertTrue(np.isfinite(data_price['nav']).all())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+crypto_manifest 测试
+"""
+
+import hashlib
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '规则类课程'))
+
+import crypto_cache
+import crypto_manifest
+import crypto_process
+from crypto_test_utils import CryptoProcessTestCase, make_minutes, write_month_zip
+
+
+class TestManifest(CryptoProcessTestCase):
+    """测试数据集清单"""
+
+    def setUp(self):
+        super().setUp()
+        # 2 月数据中挖掉 30 分钟
+        feb = self.feb.drop(index=range(100, 130)).reset_index(drop=True)
+        write_month_zip(self.data_dir, '2024-02', feb)
+
+    def test_entries(self):
+        manifest = crypto_manifest.update_manifest()
+        self.assertEqual(sorted(manifest['files']), ['2024-01', '2024-02'])
+        feb = manifest['files']['2024-02']
+        path = crypto_process._month_file_path('2024-02')
+        with open(path, 'rb') as f:
+            self.assertEqual(feb['sha256'], hashlib.sha256(f.read()).hexdigest())
+        self.assertEqual(feb['rows'], len(self.feb) - 30)
+        gap_start = pd.Timestamp(feb['gaps'][0][0], unit='ms')
+        self.assertEqual(gap_start, pd.Timestamp('2024-02-01 01:40'))
+        self.assertEqual(feb['gaps'][0][1] - feb['gaps'][0][0], 30 * 60_000)
+
+    def test_incremental_update(self):
+        crypto_manifest.update_manifest()
+        before = crypto_manifest.load_manifest()
+        write_month_zip(self.data_dir, '2024-03', make_minutes('2024-03-01', 100, seed=3))
+        os.remove(crypto_process._month_file_path('2024-01'))
+        after = crypto_manifest.update_manifest()
+        self.assertEqual(sorted(after['files']), ['2024-02', '2024-03'])
+        self.assertEqual(after['files']['2024-02'], before['files']['2024-02'])
+
+    def test_load_data_uses_manifest(self):
+        crypto_manifest.update_manifest()
+        z = crypto_process.load_data('2024-01-31', '2024-04')
+        self.assertEqual(z['open_time'].max(), pd.Timestamp('2024-02-02 23:59'))
+
+        gaps = z.attrs['gaps']
+        self.assertIn((pd.Timestamp('2024-02-01 01:40'), pd.Timestamp('2024-02-01 02:10')), gaps)
+        # 2 月末尾到 4 月底（end='2024-04' 含整个 4 月）没有数据，合并为一段
+        self.assertEqual(gaps[-1], (pd.Timestamp('2024-02-03'), pd.Timestamp('2024-05-01')))
+
+    def test_load_data_refreshes_stale_entries(self):
+        crypto_manifest.update_manifest(use_cache=False)
+        # 被改写（补齐缺口）的月份以磁盘上的文件为准；清单中没有的月份不访问磁盘
+        write_month_zip(self.data_dir, '2024-03', make_minutes('2024-03-01', 100, seed=3))
+        write_month_zip(self.data_dir, '2024-02', self.feb)
+        z = crypto_process.load_data('2024-02', '2024-03', use_cache=False)
+        self.assertEqual(len(z), len(self.feb))
+        self.assertNotIn((pd.Timestamp('2024-02-01 01:40'), pd.Timestamp('2024-02-01 02:10')),
+                         z.attrs['gaps'])
+        manifest = crypto_manifest.load_manifest()
+        self.assertEqual(manifest['files']['2024-02']['rows'], len(self.feb))
+        self.assertNotIn('2024-03', manifest['files'])
+        # use_cache=False 时重新扫描也不写缓存
+        self.assertFalse(os.path.isdir(crypto_cache.CACHE_DIR) and os.listdir(crypto_cache.CACHE_DIR))
+
+        # 删除的文件从清单中移除
+        os.remove(crypto_process._month_file_path('2024-02'))
+        with self.assertRaises(ValueError):
+            crypto_process.load_data('2024-02', '2024-02')
+        self.assertNotIn('2024-02', crypto_manifest.load_manifest()['files'])
+
+    def test_load_resampled_refreshes_once(self):
+        crypto_manifest.update_manifest()
+        write_month_zip(self.data_dir, '2024-02', self.feb)
+        z = crypto_process.load_resampled('2024-01', '2024-02', '1h', max_workers=2)
+        expected = crypto_process.resample_data(crypto_process.load_data('2024-01', '2024-02'), '1h')
+        pd.testing.assert_frame_equal(z, expected, check_freq=False)
+        manifest = crypto_manifest.load_manifest()
+        self.assertEqual(manifest['files']['2024-02']['rows'], len(self.feb))
+        folder = os.path.dirname(crypto_manifest.manifest_path())
+        self.assertEqual([f for f in os.listdir(folder) if f.endswith('.tmp')], [])
+
+    def test_clean_data_uses_gaps(self):
+        crypto_manifest.update_manifest()
+        z = crypto_process.resample_data(crypto_process.load_data('2024-02', '2024-02'), '5min')
+        self.assertIn('gaps', z.attrs)
+        self.assertTrue(z['close'].isna().any())
+        cleaned = crypto_process.clean_data(z)
+        self.assertFalse(cleaned['close'].isna().any())
+
+        z = crypto_process.resample_data(crypto_process.load_data('2024-01-31', '2024-02-01'), '5min')
+        self.assertEqual(z.attrs['gaps'], [])
+        self.assertIs(crypto_process.clean_data(z), z)
+
+        # close 没有缺口，但其他列有 NaN：仍然前向填充
+        z = crypto_process.resample_data(crypto_process.load_data('2024-01-31', '2024-02-01'), '5min',
+                                         extra=['vwap'])
+        z.iloc[3, z.columns.get_loc('vwap')] = np.nan
+        for limit in (None, 3):
+            cleaned = crypto_process.clean_data(z, limit=limit)
+            self.assertFalse(cleaned['vwap'].isna().any())
+            self.assertEqual(cleaned['vwap'].iloc[3], z['vwap'].iloc[2])
+
+    def test_clean_data_limit_and_gap_index(self):
+        # 2 月已有 01:40~02:10 的 30 分钟缺口，再挖掉 10 分钟的短缺口
+        feb = self.feb.drop(index=[*range(100, 130), *range(300, 310)])
+        write_month_zip(self.data_dir, '2024-02', feb)
+        crypto_manifest.update_manifest()
+        z = crypto_process.resample_data(crypto_process.load_data('2024-02', '2024-02'), '5min')
+        runs = crypto_process.gap_index(z)
+        expected = [(pd.Timestamp('2024-02-01 01:40'), pd.Timestamp('2024-02-01 02:10')),
+                    (pd.Timestamp('2024-02-01 05:00'), pd.Timestamp('2024-02-01 05:10'))]
+        self.assertEqual(runs, expected)
+        # 不借助清单、直接扫描数据得到相同的结果
+        z_scan = z.copy()
+        z_scan.attrs = {}
+        self.assertEqual(crypto_process.gap_index(z_scan), expected)
+
+        cleaned = crypto_process.clean_data(z, limit=3)
+        self.assertEqual(cleaned.attrs['gap_index'], expected)
+        self.assertTrue(cleaned.loc['2024-02-01 01:40':'2024-02-01 02:05', 'close'].isna().all())
+        self.assertTrue(cleaned.loc['2024-02-01 01:40':'2024-02-01 02:05', 'gap'].all())
+        self.assertEqual(int(cleaned['gap'].sum()), 6)
+        self.assertEqual(cleaned.loc['2024-02-01 05:05', 'close'], z.loc['2024-02-01 04:55', 'close'])
+        self.assertFalse(cleaned.loc[~cleaned['gap'], 'close'].isna().any())
+
+        # 再次调用直接使用 attrs 中的缺失区间，结果不变
+        again = crypto_process.clean_data(cleaned.drop(columns='gap'), limit=3)
+        pd.testing.assert_frame_equal(again, cleaned)
+
+    def test_stale_gap_index_is_ignored(self):
+        # 无缺口的数据算出的 gap_index 被 pandas 带到了其他表上
+        z = crypto_process.resample_data(crypto_process.load_data('2024-01-31', '2024-02-01'), '5min')
+        cleaned = crypto_process.clean_data(z, limit=1)
+        self.assertEqual(cleaned.attrs['gap_index'], [])
+        self.assertFalse(cleaned['gap'].any())
+
+        holed = cleaned.drop(columns='gap').iloc[50:].copy()
+        holed.iloc[50:60] = float('nan')  # 10 根的缺口
+        self.assertEqual(holed.attrs['gap_index'], [])
+        self.assertEqual(crypto_process.gap_index(holed), [(holed.index[50], holed.index[60])])
+        refilled = crypto_process.clean_data(holed, limit=1)
+        self.assertTrue(refilled['close'].iloc[50:60].isna().all())
+        self.assertEqual(int(refilled['gap'].sum()), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
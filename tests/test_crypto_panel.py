@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+crypto_panel 测试
+"""
+
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '规则类课程'))
+
+import crypto_process
+from crypto_panel import load_panel
+from crypto_test_utils import CryptoProcessTestCase, make_minutes, write_month_zip
+
+
+class TestLoadPanel(CryptoProcessTestCase):
+    """测试多币种面板"""
+
+    def setUp(self):
+        super().setUp()
+        # ETHUSDT 只有 1 月最后一天的上午，其余时间缺失
+        eth = make_minutes('2024-01-31', 720, seed=9)
+        write_month_zip(self.data_dir, '2024-01', eth, symbol='ETHUSDT')
+
+    def test_panel_alignment_and_mask(self):
+        panel = load_panel(['BTCUSDT', 'ETHUSDT', 'XRPUSDT'], '2024-01', '2024-02', '1h',
+                           max_workers=2)
+        self.assertEqual(panel.symbols, ['BTCUSDT', 'ETHUSDT'])
+        self.assertEqual(panel.shape, (2, 4 * 24, 5))
+
+        btc = crypto_process.resample_data(crypto_process.load_data('2024-01', '2024-02'), '1h')
+        pd.testing.assert_frame_equal(panel.frame('BTCUSDT'), btc[panel.fields], check_freq=False)
+
+        eth_mask = pd.Series(panel.mask[1], index=panel.index)
+        self.assertFalse(eth_mask['2024-01-31 00:00':'2024-01-31 11:00'].any())
+        self.assertTrue(eth_mask['2024-01-31 12:00':].all())
+        self.assertTrue(np.isnan(panel.values[1][panel.mask[1]]).all())
+
+    def test_shared_origin_for_uneven_freq(self):
+        # 两个交易对的数据起点不同，7min 不能整除一天，bar 仍须落在同一网格上
+        panel = load_panel(['BTCUSDT', 'ETHUSDT'], '2024-01', '2024-02', '7min', max_workers=2)
+        offsets = (panel.index - pd.Timestamp(0)) % pd.Timedelta('7min')
+        self.assertTrue((offsets == pd.Timedelta(0)).all())
+        btc = crypto_process.resample_data(crypto_process.load_data('2024-01', '2024-02'), '7min',
+                                           origin='epoch')
+        self.assertTrue(panel.index.equals(btc.index))
+        eth_minutes = pd.date_range('2024-01-31', periods=720, freq='min')
+        self.assertEqual(int((~panel.mask[1]).sum()), eth_minutes.floor('7min').nunique())
+
+    def test_views(self):
+        panel = load_panel(['BTCUSDT', 'ETHUSDT'], '2024-01', '2024-02', '1d', max_workers=2)
+        self.assertTrue(np.shares_memory(panel.frame('ETHUSDT').to_numpy(), panel.values))
+        close = panel.field('close')
+        self.assertEqual(close.columns.tolist(), ['BTCUSDT', 'ETHUSDT'])
+        long = panel.to_frame()
+        self.assertEqual(len(long), int((~panel.mask).sum()))
+
+
+if __name__ == "__main__":
+    unittest.main()
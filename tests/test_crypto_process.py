@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+crypto_process 测试：使用临时目录中的合成币安月度 zip，不依赖真实数据
+"""
+
+import os
+import sys
+import unittest
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+# 添加 规则类课程 目录到路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '规则类课程'))
+
+import crypto_cache
+import crypto_process
+from crypto_test_utils import CryptoProcessTestCase, make_minutes, write_month_zip
+
+
+class TestParseEpochMixed(unittest.TestCase):
+    """测试时间戳解析"""
+
+    def setUp(self):
+        self.expected = pd.Series(pd.date_range('2025-01-01', periods=5, freq='1min'))
+        self.ms = pd.Series(self.expected.to_numpy().astype('datetime64[ms]').astype('int64'))
+
+    def test_integer_units(self):
+        for factor in [10 ** -3, 1, 10 ** 3, 10 ** 6]:
+            values = (self.ms * factor).astype('int64') if factor >= 1 else self.ms // 1000
+            result = crypto_process._parse_epoch_mixed(values)
+            pd.testing.assert_series_equal(result, self.expected, check_names=False)
+
+    def test_microsecond_close_time_is_exact(self):
+        close_us = pd.Series([1735689659999999])
+        result = crypto_process._parse_epoch_mixed(close_us)
+        self.assertEqual(result.iloc[0], pd.Timestamp('2025-01-01 00:00:59.999999'))
+
+    def test_microsecond_precision_on_every_path(self):
+        expected = pd.Timestamp('2025-01-01 00:00:59.999999')
+        for raw in (pd.Series([1735689659999999]), pd.Series(['1735689659999999']),
+                    pd.Series([1735689659999999.0, np.nan]),
+                    pd.Series([1735689659999999, None], dtype='Int64')):
+            result = crypto_process._parse_epoch_mixed(raw)
+            self.assertEqual(result.iloc[0], expected)
+            self.assertTrue(result.iloc[1:].isna().all())
+
+    def test_nullable_integer_with_na(self):
+        raw = pd.Series([self.ms[0], pd.NA, self.ms[2] // 1000], dtype='Int64')
+        result = crypto_process._parse_epoch_mixed(raw)
+        self.assertEqual(result.iloc[0], self.expected.iloc[0])
+        self.assertTrue(pd.isna(result.iloc[1]))
+        self.assertEqual(result.iloc[2], self.expected.iloc[2])
+
+    def test_mixed_units_and_strings(self):
+        raw = pd.Series([str(self.ms[0]), str(self.ms[1] * 1000), ' 2025-01-01 00:02:00 ',
+                         str(self.ms[3] // 1000), 'bad'])
+        result = crypto_process._parse_epoch_mixed(raw)
+        pd.testing.assert_series_equal(result.iloc[:4], self.expected.iloc[:4], check_names=False)
+        self.assertTrue(pd.isna(result.iloc[4]))
+
+    def test_float_with_nan(self):
+        raw = pd.Series([float(self.ms[0]), np.nan])
+        result = crypto_process._parse_epoch_mixed(raw)
+        self.assertEqual(result.iloc[0], self.expected.iloc[0])
+        self.assertTrue(pd.isna(result.iloc[1]))
+
+
+class TestLoadDataCache(CryptoProcessTestCase):
+    """测试月度列式缓存"""
+
+    def test_warm_load_matches_cold_load(self):
+        cold = crypto_process.load_data('2024-01', '2024-02', use_cache=False)
+        first = crypto_process.load_data('2024-01', '2024-02')
+        warm = crypto_process.load_data('2024-01', '2024-02')
+        self.assertEqual(len(cold), 4 * 1440)
+        pd.testing.assert_frame_equal(cold, first)
+        pd.testing.assert_frame_equal(cold, warm)
+        self.assertTrue(str(warm['open_time'].dtype).startswith('datetime64'))
+
+    def test_cache_invalidated_when_source_changes(self):
+        crypto_process.load_data('2024-01', '2024-01')
+        src = crypto_process._month_file_path('2024-01')
+        self.assertIsNotNone(crypto_cache.read_month(src))
+
+        write_month_zip(self.data_dir, '2024-01', self.jan.iloc[:100])
+        self.assertIsNone(crypto_cache.read_month(src))
+        z = crypto_process.load_data('2024-01', '2024-01')
+        self.assertEqual(len(z), 100)
+
+    def test_lru_eviction(self):
+        crypto_process.load_data('2024-01', '2024-02')
+        files = [f for f in os.listdir(crypto_cache.CACHE_DIR) if f.endswith('.feather')]
+        self.assertEqual(len(files), 2)
+
+        # 把 1 月标记为最久未访问，然后把容量压到只够一个文件
+        os.utime(os.path.join(crypto_cache.CACHE_DIR, 'BTCUSDT-1m-2024-01.feather'), ns=(0, 0))
+        feb_path = os.path.join(crypto_cache.CACHE_DIR, 'BTCUSDT-1m-2024-02.feather')
+        crypto_cache.evict(max_bytes=os.path.getsize(feb_path))
+        files = [f for f in os.listdir(crypto_cache.CACHE_DIR) if f.endswith('.feather')]
+        self.assertEqual(files, ['BTCUSDT-1m-2024-02.feather'])
+
+    def test_missing_month_is_skipped(self):
+        z = crypto_process.load_data('2023-12', '2024-01')
+        self.assertEqual(len(z), len(self.jan))
+
+
+class TestTimeRangePushdown(CryptoProcessTestCase):
+    """测试任意时间区间读取与块索引"""
+
+    def setUp(self):
+        super().setUp()
+        self._block_rows = crypto_cache.BLOCK_ROWS
+        crypto_cache.BLOCK_ROWS = 500
+
+    def tearDown(self):
+        crypto_cache.BLOCK_ROWS = self._block_rows
+        super().tearDown()
+
+    def test_timestamp_range(self):
+        full = crypto_process.load_data('2024-01', '2024-02', use_cache=False)
+        start, end = pd.Timestamp('2024-01-31 10:17'), pd.Timestamp('2024-02-01 03:00')
+        expected = full[(full.open_time >= start) & (full.open_time < end)].reset_index(drop=True)
+        for use_cache in (False, True, True):
+            z = crypto_process.load_data('2024-01-31 10:17', '2024-02-01 03:00', use_cache=use_cache)
+            pd.testing.assert_frame_equal(z, expected)
+
+    def test_zone_map_reads_only_overlapping_blocks(self):
+        crypto_process.load_data('2024-01', '2024-01')
+        src = crypto_process._month_file_path('2024-01')
+        meta = crypto_cache.read_meta(src)
+        self.assertEqual(len(meta['blocks']), int(np.ceil(len(self.jan) / 500)))
+
+        start, end = pd.Timestamp('2024-01-30 12:00'), pd.Timestamp('2024-01-30 13:00')
+        z = crypto_cache.read_month(src, start=start, end=end)
+        self.assertLessEqual(len(z), 2 * 500)
+        self.assertTrue(((z.open_time >= start) & (z.open_time < end)).sum() == 60)
+
+    def test_month_strings_keep_whole_month_semantics(self):
+        z = crypto_process.load_data('2024-1', '2024-1')
+        self.assertEqual(len(z), len(self.jan))
+        with self.assertRaises(ValueError):
+            crypto_process.load_data('2024-02-01', '2024-01-01')
+
+
+class TestLeanLoad(CryptoProcessTestCase):
+    """测试精简读取模式"""
+
+    def test_lean_uses_half_the_memory(self):
+        for use_cache in (False, True, True):
+            full = crypto_process.load_data('2024-01', '2024-02', use_cache=use_cache)
+            lean = crypto_process.load_data('2024-01', '2024-02', use_cache=use_cache, lean=True)
+            self.assertEqual(lean.columns.tolist(), crypto_process.LEAN_COLUMNS)
+            self.assertEqual(lean['count'].dtype, np.int32)
+            self.assertEqual(lean['volume'].dtype, np.float32)
+            self.assertLessEqual(lean.memory_usage(index=False, deep=True).sum(),
+                                 full.memory_usage(index=False, deep=True).sum() / 2)
+            pd.testing.assert_series_equal(lean['close'], full['close'])
+            np.testing.assert_allclose(lean['volume'], full['volume'], rtol=1e-6)
+
+    def test_lean_resample(self):
+        full = crypto_process.resample_data(crypto_process.load_data('2024-01', '2024-02'), '1h')
+        lean = crypto_process.resample_data(
+            crypto_process.load_data('2024-01', '2024-02', lean=True), '1h')
+        self.assertEqual(lean.columns.tolist(), ['open', 'high', 'low', 'close', 'volume', 'count'])
+        pd.testing.assert_frame_equal(lean[['open', 'high', 'low', 'close']],
+                                      full[['open', 'high', 'low', 'close']])
+
+    def test_header_row_default_and_lean(self):
+        expected = {lean: crypto_process.load_data('2024-01', '2024-01', use_cache=False, lean=lean)
+                    for lean in (False, True)}
+        folder = os.path.join(self.data_dir, 'BTCUSDT')
+        with zipfile.ZipFile(os.path.join(folder, 'BTCUSDT-1m-2024-01.zip'), 'w') as zf:
+            zf.writestr('BTCUSDT-1m-2024-01.csv', self.jan.to_csv(index=False))
+        for lean in (False, True):
+            for use_cache in (False, True):
+                z = crypto_process.load_data('2024-01', '2024-01', use_cache=use_cache, lean=lean)
+                pd.testing.assert_frame_equal(z, expected[lean])
+
+    def test_columns_projection(self):
+        z = crypto_process.load_data('2024-01', '2024-01', columns=['close', 'high'])
+        self.assertEqual(z.columns.tolist(), ['open_time', 'high', 'close'])
+        with self.assertRaises(ValueError):
+            crypto_process.load_data('2024-01', '2024-01', columns=['nope'])
+
+
+@unittest.skipIf(crypto_process.pa_csv is None, "需要 pyarrow")
+class TestArrowEngine(CryptoProcessTestCase):
+    """测试 pyarrow 多线程 CSV 解析后端"""
+
+    def test_matches_c_engine(self):
+        c = crypto_process.load_data('2024-01', '2024-02', use_cache=False)
+        arrow = crypto_process.load_data('2024-01', '2024-02', use_cache=False, engine='arrow')
+        pd.testing.assert_frame_equal(c, arrow)
+
+    def test_lean_and_header_row(self):
+        c = crypto_process.load_data('2024-01', '2024-01', use_cache=False, lean=True)
+        # 带 header 行的文件：arrow 后端跳过第一行
+        folder = os.path.join(self.data_dir, 'BTCUSDT')
+        with zipfile.ZipFile(os.path.join(folder, 'BTCUSDT-1m-2024-01.zip'), 'w') as zf:
+            zf.writestr('BTCUSDT-1m-2024-01.csv', self.jan.to_csv(index=False))
+        arrow = crypto_process.load_data('2024-01', '2024-01', use_cache=False, lean=True,
+                                         engine='arrow')
+        self.assertEqual(len(arrow), len(self.jan))
+        pd.testing.assert_frame_equal(c, arrow)
+
+    def test_cold_cache_write(self):
+        cold = crypto_process.load_data('2024-01', '2024-02', engine='arrow')
+        warm = crypto_process.load_data('2024-01', '2024-02')
+        pd.testing.assert_frame_equal(cold, warm)
+        with self.assertRaises(ValueError):
+            crypto_process.load_data('2024-01', '2024-01', use_cache=False, engine='nope')
+
+
+class TestStreaming(CryptoProcessTestCase):
+    """测试流式读取与流式重采样"""
+
+    def test_iter_load_chunks(self):
+        chunks = list(crypto_process.iter_load('2024-01', '2024-02', chunksize=1000))
+        self.assertTrue(all(len(c) <= 1000 for c in chunks))
+        expected = crypto_process.load_data('2024-01', '2024-02', use_cache=False)
+        pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), expected)
+
+    def test_iter_load_lean_with_header_row(self):
+        expected = crypto_process.load_data('2024-01', '2024-01', use_cache=False, lean=True)
+        folder = os.path.join(self.data_dir, 'BTCUSDT')
+        with zipfile.ZipFile(os.path.join(folder, 'BTCUSDT-1m-2024-01.zip'), 'w') as zf:
+            zf.writestr('BTCUSDT-1m-2024-01.csv', self.jan.to_csv(index=False))
+        chunks = list(crypto_process.iter_load('2024-01', '2024-01', chunksize=1000, lean=True))
+        pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), expected)
+
+    def test_streaming_resample_matches_batch(self):
+        os.remove(crypto_process._month_file_path('2024-02'))
+        write_month_zip(self.data_dir, '2024-03', make_minutes('2024-03-01 05:13', 1000, seed=3))
+        z = crypto_process.load_data('2024-01', '2024-03', use_cache=False)
+        for freq in ['7min', '1h', '1d']:
+            expected = crypto_process.resample_data(z, freq)
+            parts = list(crypto_process.iter_resample(
+                crypto_process.iter_load('2024-01', '2024-03', chunksize=997), freq))
+            pd.testing.assert_frame_equal(pd.concat(parts), expected, check_freq=False)
+
+
+class TestIncrementalResampler(unittest.TestCase):
+    """测试增量重采样"""
+
+    def setUp(self):
+        z = make_minutes('2024-01-30', 2 * 1440, seed=4)
+        z['open_time'] = crypto_process._parse_epoch_mixed(z['open_time'])
+        self.z = z.drop(columns=['close_time', 'ignore'])
+
+    def test_batches_match_full_resample(self):
+        z = self.z.drop(index=range(1500, 1700))  # 中间缺几个小时
+        expected = crypto_process.resample_data(z, '1h')
+        seed = z.iloc[:1000]
+        resampler = crypto_process.IncrementalResampler(
+            '1h', bars=crypto_process.resample_data(seed, '1h'), minutes=seed.iloc[960:])
+        rest = z.iloc[1000:]
+        for start in range(0, len(rest), 337):
+            batch = rest.iloc[start:start + 337]
+            # 每批都重复上一批的最后几分钟，并把自己的前几分钟打乱顺序
+            overlap = rest.iloc[max(0, start - 5):start]
+            resampler.update(pd.concat([overlap, batch.iloc[::-1]]))
+        pd.testing.assert_frame_equal(resampler.bars, expected, check_freq=False)
+        self.assertGreater(resampler.duplicates, 0)
+        self.assertEqual(resampler.late_dropped, 0)
+
+    def test_late_minutes(self):
+        resampler = crypto_process.IncrementalResampler('1h', lookback=2)
+        resampler.update(self.z.iloc[:180])
+        corrected = self.z.iloc[[150]].assign(high=99999.0)  # 仍在窗口内：合并
+        too_late = self.z.iloc[[10]]  # 第一个小时已定稿：丢弃
+        updated = resampler.update(pd.concat([corrected, too_late]))
+        self.assertEqual(resampler.late_dropped, 1)
+        self.assertEqual(updated.loc['2024-01-30 02:00', 'high'], 99999.0)
+        self.assertEqual(len(resampler.bars), 3)
+        with self.assertRaises(ValueError):
+            crypto_process.IncrementalResampler('7min')
+
+    def test_bars_only_with_late_or_empty_update(self):
+        bars = crypto_process.resample_data(self.z.iloc[:600], '1h')
+        resampler = crypto_process.IncrementalResampler('1h', bars=bars)
+        for z in (self.z.iloc[:0], self.z.iloc[[10, 20]]):
+            updated = resampler.update(z)
+            self.assertEqual(len(updated), 0)
+            self.assertEqual(updated.columns.tolist(), bars.columns.tolist())
+        self.assertEqual(resampler.late_dropped, 2)
+        pd.testing.assert_frame_equal(resampler.bars, bars)
+
+
+class TestResamplePyramid(unittest.TestCase):
+    """测试多频率逐级重采样"""
+
+    def test_levels_match_direct_resample(self):
+        z = make_minutes('2024-01-30', 3 * 1440, seed=7).drop(index=range(2000, 2300))
+        z['open_time'] = crypto_process._parse_epoch_mixed(z['open_time'])
+        freqs = ['1d', '5min', '1h', '15min', '4h']
+        levels = crypto_process.resample_pyramid(z, freqs)
+        self.assertEqual(list(levels), ['5min', '15min', '1h', '4h', '1d'])
+        for freq in freqs:
+            pd.testing.assert_frame_equal(levels[freq], crypto_process.resample_data(z, freq),
+                                          check_freq=False)
+
+    def test_incompatible_freqs(self):
+        z = make_minutes('2024-01-30', 60, seed=7)
+        with self.assertRaises(ValueError):
+            crypto_process.resample_pyramid(z, ['15min', '20min'])
+        with self.assertRaises(ValueError):
+            crypto_process.resample_pyramid(z, ['7min'])
+
+
+class TestExtraAggregations(unittest.TestCase):
+    """测试 resample_data 的附加聚合"""
+
+    def setUp(self):
+        z = make_minutes('2024-01-30', 2 * 1440, seed=10).drop(index=range(200, 400))
+        z['open_time'] = crypto_process._parse_epoch_mixed(z['open_time'])
+        self.z = z.reset_index(drop=True)
+
+    def test_values(self):
+        extra = crypto_process.EXTRA_AGGREGATIONS
+        bars = crypto_process.resample_data(self.z, '1h', extra=extra)
+        self.assertEqual(bars.columns.tolist(), crypto_process.RESAMPLED_COLUMNS + extra)
+
+        hour = self.z[self.z['open_time'].dt.floor('1h') == pd.Timestamp('2024-01-30 08:00')]
+        row = bars.loc['2024-01-30 08:00']
+        self.assertAlmostEqual(row['vwap'], hour['quote_volume'].sum() / hour['volume'].sum())
+        self.assertAlmostEqual(row['taker_ratio'],
+                               hour['taker_buy_volume'].sum() / hour['volume'].sum())
+        self.assertAlmostEqual(row['realized_var'],
+                               (np.log(hour['close'] / hour['open']) ** 2).sum())
+        self.assertEqual(row['max_range'], (hour['high'] - hour['low']).max())
+        self.assertEqual(row['minutes'], 60)
+
+        # 200~400 分钟缺失：整点 04:00 的 bar 为空，05:00 只有 20 分钟
+        self.assertTrue(np.isnan(bars.loc['2024-01-30 04:00', 'vwap']))
+        self.assertEqual(bars.loc['2024-01-30 04:00', 'minutes'], 0)
+        self.assertEqual(bars.loc['2024-01-30 06:00', 'minutes'], 20)
+
+    def test_engines_and_pyramid(self):
+        extra = ['vwap', 'realized_var', 'minutes']
+        expected = crypto_process.resample_data(self.z, '1h', extra=extra)
+        pd.testing.assert_frame_equal(
+            crypto_process.resample_data(self.z, '1h', engine='numpy', extra=extra), expected,
+            check_exact=True)
+        levels = crypto_process.resample_pyramid(self.z, ['15min', '1h'], extra=extra)
+        pd.testing.assert_frame_equal(levels['1h'], expected, check_freq=False)
+        with self.assertRaises(ValueError):
+            crypto_process.resample_data(self.z, '1h', extra=['nope'])
+        with self.assertRaises(ValueError):
+            crypto_process.resample_data(self.z[['open_time', 'close', 'volume']], '1h',
+                                         extra=['vwap'])
+
+
+class TestNumpyResampleEngine(unittest.TestCase):
+    """测试 reduceat 重采样内核与 pandas 路径逐位一致"""
+
+    def setUp(self):
+        z = make_minutes('2024-01-30', 3 * 1440, seed=8).drop(index=range(2000, 2300))
+        z['open_time'] = crypto_process._parse_epoch_mixed(z['open_time'])
+        self.z = z.reset_index(drop=True)
+
+    def assert_engines_equal(self, z, freq, **kwargs):
+        expected = crypto_process.resample_data(z, freq, **kwargs)
+        result = crypto_process.resample_data(z, freq, engine='numpy', **kwargs)
+        pd.testing.assert_frame_equal(result, expected, check_exact=True)
+
+    def test_matches_pandas(self):
+        for freq in ('5min', '7min', '1h', '1d'):
+            self.assert_engines_equal(self.z, freq)
+        self.assert_engines_equal(self.z, '1h', origin=pd.Timestamp('2024-01-29 00:30'))
+
+    def test_lean_unsorted_and_nan(self):
+        z = self.z.astype({'volume': 'float32', 'count': 'int32'})
+        z.loc[10:70, ['open', 'close', 'volume']] = np.nan
+        z.loc[100, 'high'] = np.inf
+        self.assert_engines_equal(z.sample(frac=1, random_state=0), '1h')
+        self.assert_engines_equal(z[['open_time', 'close', 'volume', 'count']], '15min')
+        with self.assertRaises(ValueError):
+            crypto_process.resample_data(z, 'MS', engine='numpy')
+
+
+class TestLoadResampled(CryptoProcessTestCase):
+    """测试按月并行读取 + 重采样"""
+
+    def test_matches_serial_pipeline(self):
+        z = crypto_process.load_data('2024-01', '2024-02', use_cache=False)
+        for freq in ['5min', '1h', '1d']:
+            expected = crypto_process.resample_data(z, freq)
+            result = crypto_process.load_resampled('2024-01', '2024-02', freq,
+                                                   max_workers=2, use_cache=False)
+            pd.testing.assert_frame_equal(result, expected, check_freq=False)
+
+    def test_missing_month_gives_empty_buckets(self):
+        write_month_zip(self.data_dir, '2024-03', make_minutes('2024-03-01', 1440, seed=3))
+        os.remove(crypto_process._month_file_path('2024-02'))
+        expected = crypto_process.resample_data(
+            crypto_process.load_data('2024-01', '2024-03', use_cache=False), '1h')
+        result = crypto_process.load_resampled('2024-01', '2024-03', '1h', max_workers=2)
+        pd.testing.assert_frame_equal(result, expected, check_freq=False)
+        self.assertTrue(result.loc['2024-02', 'close'].isna().all())
+
+
+if __name__ == "__main__":
+    unittest.main()
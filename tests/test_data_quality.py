@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+data_quality 测试
+"""
+
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '规则类课程'))
+
+import crypto_process
+import data_quality
+from crypto_test_utils import CryptoProcessTestCase, make_minutes, write_month_zip
+
+
+class TestValidate(CryptoProcessTestCase):
+    """测试向量化质量检查"""
+
+    def test_clean_data_passes(self):
+        z = crypto_process.load_data('2024-01', '2024-02', validate='raise')
+        self.assertEqual(z.attrs['quality'], dict.fromkeys(data_quality.CHECKS, 0))
+
+    def test_each_check(self):
+        z = make_minutes('2024-01-30', 20, seed=11)
+        z.loc[3, 'high'] = z.loc[3, ['open', 'close']].max() - 1
+        z.loc[4, 'low'] = z.loc[4, ['open', 'close']].min() + 1
+        z.loc[5, ['volume', 'taker_buy_volume']] = [-1.0, -2.0]
+        z.loc[6, 'taker_buy_volume'] = z.loc[6, 'volume'] + 1
+        z.loc[7, 'close_time'] += 1
+        z = z.drop(index=[10, 11])                       # 缺失 bar
+        z = pd.concat([z, z.iloc[[-1]]], ignore_index=True)  # 重复的最后一行
+        for col in ('open_time', 'close_time'):
+            z[col] = crypto_process._parse_epoch_mixed(z[col])
+
+        flags = data_quality.validate(z)
+        expected = np.zeros(len(z), dtype='uint8')
+        expected[3] = data_quality.HIGH_BELOW
+        expected[4] = data_quality.LOW_ABOVE
+        expected[5] = data_quality.NEGATIVE_VOLUME
+        expected[6] = data_quality.TAKER_EXCEEDS
+        expected[7] = data_quality.BAD_CLOSE_TIME
+        expected[10] = data_quality.BAD_SPACING
+        expected[-1] = data_quality.NOT_INCREASING
+        np.testing.assert_array_equal(flags, expected)
+        self.assertEqual(data_quality.summarize(flags)['bad_spacing'], 1)
+
+    def test_load_data_raise(self):
+        bad = self.jan.copy()
+        bad.loc[100, 'volume'] = -1.0
+        write_month_zip(self.data_dir, '2024-01', bad)
+        z = crypto_process.load_data('2024-01', '2024-01', validate=True)
+        self.assertEqual(z.attrs['quality']['negative_volume'], 1)
+        with self.assertRaises(ValueError):
+            crypto_process.load_data('2024-01', '2024-01', validate='raise')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+download_binance_data 测试：用本地 HTTP 服务器代替币安
+"""
+
+import contextlib
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '规则类课程'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '规则类课程', 'Other'))
+
+import pandas as pd
+import requests
+
+import crypto_cache
+import crypto_manifest
+import crypto_process
+import download_binance_data as dl
+from ohlcv_store import OHLCVStore
+from crypto_test_utils import make_minutes
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """按 FILES 返回内容，支持 Range 请求，并记录收到的 Range 头与请求时间"""
+    FILES = {}
+    ERRORS = {}  # {路径: 状态码}，模拟服务器错误
+    DELAYS = {}  # {路径: 秒}，模拟慢速下载
+    ranges = []
+    requested = {}  # {路径: 收到请求的时刻}
+
+    def do_GET(self):
+        self.requested.setdefault(self.path, time.monotonic())
+        time.sleep(self.DELAYS.get(self.path, 0))
+        if self.path in self.ERRORS:
+            self.send_error(self.ERRORS[self.path])
+            return
+        body = self.FILES.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+        status, start = 200, 0
+        range_header = self.headers.get('Range')
+        if range_header:
+            self.ranges.append(range_header)
+            start = int(range_header.split('=')[1].split('-')[0])
+            if start >= len(body):
+                self.send_error(416)
+                return
+            status = 206
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body) - start))
+        self.end_headers()
+        self.wfile.write(body[start:])
+
+    def log_message(self, *args):
+        pass
+
+
+class TestDownloader(unittest.TestCase):
+    """测试并发下载、续传与校验"""
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self._base_url = dl.BASE_URL
+        dl.BASE_URL = f"http://127.0.0.1:{self.server.server_port}/klines"
+
+        # 用真实的 zip 内容，使“已存在但不完整”的判断可以生效
+        self.bodies = {}
+        for month in (1, 2, 3):
+            name = f"BTCUSDT-1m-2024-{month:02d}.zip"
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(buffer, 'w') as zf:
+                zf.writestr(name.replace('.zip', '.csv'), os.urandom(100_000))
+            body = buffer.getvalue()
+            self.bodies[name] = body
+            path = f"/klines/BTCUSDT/1m/{name}"
+            _Handler.FILES[path] = body
+            _Handler.FILES[f"{path}.CHECKSUM"] = \
+                f"{hashlib.sha256(body).hexdigest()}  {name}\n".encode()
+        _Handler.ranges = []
+        self.data_dir = self.tmp / 'data'
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        dl.BASE_URL = self._base_url
+        _Handler.FILES = {}
+        _Handler.ERRORS = {}
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_concurrent_download(self):
+        ok = dl.download_date_range('BTCUSDT', '1m', '2024-01', '2024-03', data_dir=self.data_dir,
+                                    max_workers=3, chunk_size=4096)
+        self.assertTrue(ok)
+        for name, body in self.bodies.items():
+            self.assertEqual((self.data_dir / name).read_bytes(), body)
+        self.assertEqual(list(self.data_dir.glob('*.part')), [])
+        # 4 月不存在：返回 False，不留下任何文件
+        self.assertFalse(dl.download_date_range('BTCUSDT', '1m', '2024-04', '2024-04',
+                                                data_dir=self.data_dir))
+        self.assertEqual(len(list(self.data_dir.iterdir())), 3)
+
+    def test_resume_with_range(self):
+        name = 'BTCUSDT-1m-2024-01.zip'
+        self.data_dir.mkdir()
+        (self.data_dir / f"{name}.part").write_bytes(self.bodies[name][:10_000])
+        self.assertTrue(dl.download_binance_data('BTCUSDT', '1m', 2024, 1, self.data_dir))
+        self.assertEqual(_Handler.ranges, ['bytes=10000-'])
+        self.assertEqual((self.data_dir / name).read_bytes(), self.bodies[name])
+
+    def test_checksum_mismatch_and_truncated_file(self):
+        name = 'BTCUSDT-1m-2024-02.zip'
+        self.data_dir.mkdir()
+        # 旧版本留下的半个 zip 不再被当作已下载
+        (self.data_dir / name).write_bytes(self.bodies[name][:1000])
+        _Handler.FILES[f"/klines/BTCUSDT/1m/{name}.CHECKSUM"] = b"0" * 64 + b"  x\n"
+        self.assertFalse(dl.download_binance_data('BTCUSDT', '1m', 2024, 2, self.data_dir))
+        self.assertEqual(list(self.data_dir.iterdir()), [])
+
+    def test_checksum_unavailable(self):
+        name = 'BTCUSDT-1m-2024-03.zip'
+        checksum_path = f"/klines/BTCUSDT/1m/{name}.CHECKSUM"
+        self.data_dir.mkdir()
+        # 取不到校验文件（不带重试的 session）：下载失败，.part 保留供下次续传后校验
+        _Handler.ERRORS[checksum_path] = 500
+        self.assertFalse(dl.download_binance_data('BTCUSDT', '1m', 2024, 3, self.data_dir,
+                                                  session=requests.Session()))
+        self.assertEqual([p.name for p in self.data_dir.iterdir()], [f"{name}.part"])
+        # 服务器明确没有校验文件：接受下载，并提示未经校验
+        del _Handler.ERRORS[checksum_path]
+        del _Handler.FILES[checksum_path]
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.assertTrue(dl.download_binance_data('BTCUSDT', '1m', 2024, 3, self.data_dir))
+        self.assertIn("未经校验", output.getvalue())
+        self.assertEqual((self.data_dir / name).read_bytes(), self.bodies[name])
+
+
+class TestDailyUpdater(unittest.TestCase):
+    """测试用日文件保持当月数据最新"""
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self._urls = dl.BASE_URL, dl.DAILY_BASE_URL
+        dl.BASE_URL = f"http://127.0.0.1:{self.server.server_port}/monthly"
+        dl.DAILY_BASE_URL = f"http://127.0.0.1:{self.server.server_port}/daily"
+        self._saved = crypto_process.DATA_DIR, crypto_cache.CACHE_DIR
+        crypto_process.DATA_DIR = str(self.tmp)
+        crypto_cache.CACHE_DIR = str(self.tmp / 'cache')
+        self.data_dir = self.tmp / 'BTCUSDT'
+
+        # 2 月每天 3 根 bar；28 日的文件重复了 27 日的最后一分钟，且带 header
+        self.days = {}
+        for day in pd.date_range('2024-02-01', '2024-02-29'):
+            z = make_minutes(f"{day:%Y-%m-%d} 00:00", 3, seed=day.day)
+            if day.day == 28:
+                z = pd.concat([self.days['2024-02-27'].iloc[[-1]], z], ignore_index=True)
+            self.days[f"{day:%Y-%m-%d}"] = z
+            self.serve(f"/daily/BTCUSDT/1m/BTCUSDT-1m-{day:%Y-%m-%d}.zip", z, header=day.day == 28)
+        _Handler.ranges = []
+
+    def serve(self, path, z, header=False):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as zf:
+            zf.writestr('data.csv', z.to_csv(header=header, index=False))
+        body = buffer.getvalue()
+        _Handler.FILES[path] = body
+        _Handler.FILES[f"{path}.CHECKSUM"] = f"{hashlib.sha256(body).hexdigest()}  x\n".encode()
+        return body
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        dl.BASE_URL, dl.DAILY_BASE_URL = self._urls
+        crypto_process.DATA_DIR, crypto_cache.CACHE_DIR = self._saved
+        _Handler.FILES = {}
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_daily_merge_then_monthly_swap(self):
+        crypto_manifest.update_manifest()  # 已有（空的）清单，更新后应随之更新
+        store = OHLCVStore(root=str(self.tmp / 'store'))
+        self.assertEqual(dl.update_recent_data(today='2024-02-11', data_dir=self.data_dir,
+                                               store=store), ['2024-02'])
+        self.assertEqual(crypto_manifest.load_manifest()['files']['2024-02']['rows'], 30)
+        z = crypto_process.load_data('2024-02', '2024-02', use_cache=False)
+        self.assertEqual(len(z), 30)
+        self.assertEqual(len(store), 30)
+
+        # 下一天只下载新的日文件
+        files_before = set(os.listdir(self.data_dir / 'daily'))
+        dl.update_recent_data(today='2024-03-01', data_dir=self.data_dir, store=store)
+        self.assertEqual(len(set(os.listdir(self.data_dir / 'daily')) - files_before), 19)
+        z = crypto_process.load_data('2024-02', '2024-02', use_cache=False)
+        self.assertEqual(len(z), 29 * 3)  # 重复的一分钟只保留一条
+        self.assertEqual(crypto_manifest.load_manifest()['files']['2024-02']['rows'], 29 * 3)
+        self.assertTrue(z['open_time'].is_monotonic_increasing)
+        self.assertEqual(len(store), 29 * 3)
+
+        # 官方月度归档发布后替换合成文件
+        monthly = pd.concat(self.days.values()).drop_duplicates('open_time')
+        body = self.serve('/monthly/BTCUSDT/1m/BTCUSDT-1m-2024-02.zip', monthly)
+        dl.update_recent_data(today='2024-03-03', data_dir=self.data_dir, store=store)
+        self.assertEqual((self.data_dir / 'BTCUSDT-1m-2024-02.zip').read_bytes(), body)
+        self.assertFalse((self.data_dir / 'BTCUSDT-1m-2024-02.zip.daily.json').exists())
+        self.assertFalse(any(n.startswith('BTCUSDT-1m-2024-02')
+                             for n in os.listdir(self.data_dir / 'daily')))
+        self.assertEqual(len(store), 29 * 3)
+
+    def test_crash_during_merge_is_retried(self):
+        dl.update_recent_data(today='2024-02-11', data_dir=self.data_dir)
+        # 模拟上次合并在写入月度文件后、写完标记前崩溃
+        marker = self.data_dir / 'BTCUSDT-1m-2024-02.zip.daily.json'
+        marker.write_text(json.dumps({'days': None}), encoding='utf-8')
+        self.assertEqual(dl.update_recent_data(today='2024-02-11', data_dir=self.data_dir), ['2024-02'])
+        self.assertEqual(len(json.loads(marker.read_text(encoding='utf-8'))['days']), 10)
+
+
+class TestIngest(unittest.TestCase):
+    """测试边下载边转换为列式缓存"""
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self._saved = dl.BASE_URL, crypto_process.DATA_DIR, crypto_cache.CACHE_DIR
+        dl.BASE_URL = f"http://127.0.0.1:{self.server.server_port}/monthly"
+        crypto_process.DATA_DIR = str(self.tmp / 'data')
+        crypto_cache.CACHE_DIR = str(self.tmp / 'cache')
+
+        self.months = {}
+        for i, month in enumerate(['2024-01', '2024-02', '2024-03']):
+            z = make_minutes(f"{month}-01", 500, seed=i)
+            self.months[month] = z
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(buffer, 'w') as zf:
+                zf.writestr(f"BTCUSDT-1m-{month}.csv", z.to_csv(header=False, index=False))
+            path = f"/monthly/BTCUSDT/1m/BTCUSDT-1m-{month}.zip"
+            _Handler.FILES[path] = buffer.getvalue()
+            _Handler.FILES[f"{path}.CHECKSUM"] = \
+                f"{hashlib.sha256(buffer.getvalue()).hexdigest()}  x\n".encode()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        dl.BASE_URL, crypto_process.DATA_DIR, crypto_cache.CACHE_DIR = self._saved
+        _Handler.FILES = {}
+        _Handler.DELAYS = {}
+        _Handler.requested = {}
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_ingest_into_cache_and_store(self):
+        crypto_manifest.update_manifest()
+        store = OHLCVStore(root=str(self.tmp / 'store'))
+        result = dl.ingest_date_range('BTCUSDT', '1m', '2024-01', '2024-04',
+                                      data_dir=self.tmp / 'data' / 'BTCUSDT', store=store,
+                                      max_workers=3, converters=2, queue_size=1)
+        self.assertEqual(result, {'2024-01': 500, '2024-02': 500, '2024-03': 500, '2024-04': None})
+        for month in self.months:
+            src = crypto_process._month_file_path(month)
+            self.assertIsNotNone(crypto_cache.read_month(src))
+        self.assertEqual(store.months, ['2024-01', '2024-02', '2024-03'])
+        self.assertEqual(len(store), 1500)
+
+        # load_data 直接命中转换好的缓存，结果与解析 CSV 一致
+        self.assertEqual(sorted(crypto_manifest.load_manifest()['files']), list(self.months))
+        cached = crypto_process.load_data('2024-01', '2024-03')
+        parsed = crypto_process.load_data('2024-01', '2024-03', use_cache=False)
+        pd.testing.assert_frame_equal(cached, parsed)
+
+    def test_slow_month_bounds_pending(self):
+        # 1 月下载很慢：容量为 queue_size + converters = 2，3 月要等 1 月入库后才开始下载
+        january = '/monthly/BTCUSDT/1m/BTCUSDT-1m-2024-01.zip'
+        _Handler.DELAYS[january] = 1.0
+        _Handler.requested = {}
+        store = OHLCVStore(root=str(self.tmp / 'store'))
+        result = dl.ingest_date_range('BTCUSDT', '1m', '2024-01', '2024-03',
+                                      data_dir=self.tmp / 'data' / 'BTCUSDT', store=store,
+                                      max_workers=3, converters=1, queue_size=1)
+        self.assertEqual(result, {'2024-01': 500, '2024-02': 500, '2024-03': 500})
+        self.assertEqual(store.months, ['2024-01', '2024-02', '2024-03'])
+        march = '/monthly/BTCUSDT/1m/BTCUSDT-1m-2024-03.zip'
+        self.assertGreaterEqual(_Handler.requested[march] - _Handler.requested[january], 1.0)
+
+    def test_store_append_failure(self):
+        # 库中已有更晚的数据，每个月的 append 都会抛出 ValueError
+        store = OHLCVStore(root=str(self.tmp / 'store'))
+        later = make_minutes('2024-05-01', 10, seed=9)
+        later['open_time'] = crypto_process._parse_epoch_mixed(later['open_time'])
+        later['close_time'] = crypto_process._parse_epoch_mixed(later['close_time'])
+        store.append(later, month='2024-05')
+
+        result = {}
+        worker = threading.Thread(target=lambda: result.update(dl.ingest_date_range(
+            'BTCUSDT', '1m', '2024-01', '2024-03', data_dir=self.tmp / 'data' / 'BTCUSDT',
+            store=store, max_workers=3, converters=1, queue_size=1)), daemon=True)
+        worker.start()
+        worker.join(timeout=60)
+        self.assertFalse(worker.is_alive(), "追加失败后 ingest 不应卡住")
+        self.assertEqual(result, {'2024-01': None, '2024-02': None, '2024-03': None})
+        self.assertEqual(store.months, ['2024-05'])
+        self.assertEqual(len(store), 10)
+        # 列式缓存仍然写好了
+        self.assertIsNotNone(crypto_cache.read_month(crypto_process._month_file_path('2024-01')))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+feature_frame 与 V3 按需预处理测试
+"""
+
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+import talib as ta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '规则类课程'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '规则类课程', 'Stategy'))
+
+import crypto_process
+import puppyV3_strategy
+from feature_frame import FeatureFrame
+from crypto_test_utils import make_minutes
+
+
+def eager_preprocess(z_):
+    """改造前一次算出全部列的 V3 预处理，作为参照"""
+    z = z_.copy()
+    z["ret"] = z["close"].pct_change().fillna(0)
+    z["rolling_ret"] = z["close"].pct_change(periods=24).fillna(0)
+    z["rolling_vol"] = z["ret"].rolling(window=24).std().fillna(1e-6)
+    z["signal_strength"] = z["rolling_ret"] / z["rolling_vol"]
+    z["sma_fast"] = z["close"].rolling(48).mean()
+    z["sma_slow"] = z["close"].rolling(200).mean()
+    z["adx"] = ta.ADX(z["high"], z["low"], z["close"], timeperiod=14)
+    z["atr"] = ta.ATR(z["high"], z["low"], z["close"], timeperiod=14)
+    z["hh"] = z["high"].rolling(48).max().shift(1)
+    z["position"] = 0.0
+    z["flag"] = 0.0
+    return z
+
+
+class TestFeatureFrame(unittest.TestCase):
+    """测试按需计算与依赖解析"""
+
+    def setUp(self):
+        self.calls = []
+        z = pd.DataFrame({'x': np.arange(5.0)})
+
+        def define(name, deps, func):
+            def compute(frame):
+                self.calls.append(name)
+                return func(frame)
+            return (deps, compute)
+
+        self.frame = FeatureFrame(z, {
+            'a': define('a', (), lambda f: f['x'] + 1),
+            'b': define('b', ('a',), lambda f: f['a'] * 2),
+            'c': define('c', ('a', 'b'), lambda f: f['a'] + f['b']),
+            'unused': define('unused', ('x',), lambda f: f['x'] * 0),
+        })
+
+    def test_dependencies_computed_once_in_order(self):
+        np.testing.assert_array_equal(self.frame['c'], 3 * (np.arange(5.0) + 1))
+        self.frame.require(['b', 'c'])
+        self.assertEqual(self.calls, ['a', 'b', 'c'])
+        self.assertNotIn('unused', self.frame.frame.columns)
+
+    def test_unknown_and_cyclic(self):
+        with self.assertRaises(KeyError):
+            self.frame['missing']
+        cyclic = FeatureFrame(pd.DataFrame({'x': [1.0]}), {'p': (('q',), None), 'q': (('p',), None)})
+        with self.assertRaises(ValueError):
+            cyclic['p']
+
+
+class TestLazyV3Preprocess(unittest.TestCase):
+    """测试 V3 只计算开关需要的指标，结果与一次算全部相同"""
+
+    def setUp(self):
+        z = make_minutes('2024-01-30', 4 * 1440, seed=23)
+        z['open_time'] = crypto_process._parse_epoch_mixed(z['open_time'])
+        self.bars = crypto_process.resample_data(z, '5min')
+        self.eager = eager_preprocess(self.bars)
+
+    def test_default_keeps_all_columns(self):
+        z = puppyV3_strategy.preprocess_data(self.bars)
+        pd.testing.assert_frame_equal(z[self.eager.columns], self.eager)
+
+    def test_required_features_skips_unused(self):
+        z = puppyV3_strategy.preprocess_data(self.bars, features=puppyV3_strategy.required_features())
+        for name in ('hh', 'signal_strength', 'rolling_ret', 'rolling_vol'):
+            self.assertNotIn(name, z.columns)
+        for name in ('sma_fast', 'sma_slow', 'atr', 'adx'):
+            pd.testing.assert_series_equal(z[name], self.eager[name])
+        no_adx = puppyV3_strategy.preprocess_data(
+            self.bars, features=puppyV3_strategy.required_features(use_adx=False))
+        self.assertNotIn('adx', no_adx.columns)
+
+    def test_all_features_match_eager(self):
+        z = puppyV3_strategy.preprocess_data(self.bars, features=puppyV3_strategy.FEATURES)
+        pd.testing.assert_frame_equal(z[self.eager.columns], self.eager)
+
+    def test_run_strategy_fills_missing_features(self):
+        switches = dict(require_breakout=True, require_momentum=True)
+        expected, trades_expected = puppyV3_strategy.run_strategy(self.eager.copy(), **switches)
+        z = puppyV3_strategy.preprocess_data(self.bars, features=puppyV3_strategy.required_features())
+        result, trades = puppyV3_strategy.run_strategy(z, **switches)
+        pd.testing.assert_series_equal(result['hh'], expected['hh'])
+        pd.testing.assert_series_equal(result['nav'], expected['nav'])
+        pd.testing.assert_frame_equal(trades, trades_expected)
+
+    def test_execute_strategy_matches_eager(self):
+        expected, trades_expected = puppyV3_strategy.run_strategy(self.eager.copy())
+        result, trades = puppyV3_strategy.execute_strategy(self.bars)
+        for name in ('position', 'flag', 'nav'):
+            pd.testing.assert_series_equal(result[name], expected[name])
+        pd.testing.assert_frame_equal(trades, trades_expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+indicator_cache 测试
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+import talib as ta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '规则类课程'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '规则类课程', 'Stategy'))
+
+import crypto_process
+import indicator_cache
+import puppyV2_strategy
+import puppyV3_strategy
+from crypto_test_utils import make_minutes
+
+
+class TestIndicatorCache(unittest.TestCase):
+    """测试指标缓存的结果与命中"""
+
+    def setUp(self):
+        z = make_minutes('2024-01-30', 3 * 1440, seed=21)
+        z['open_time'] = crypto_process._parse_epoch_mixed(z['open_time'])
+        self.bars = crypto_process.resample_data(z, '5min')
+        self.cache = indicator_cache.IndicatorCache()
+
+    def test_values_match_direct_computation(self):
+        z = self.bars
+        high, low, close = z['high'], z['low'], z['close']
+        pd.testing.assert_series_equal(indicator_cache.atr(z, 14, cache=self.cache),
+                                       ta.ATR(high, low, close, timeperiod=14).rename('atr'))
+        pd.testing.assert_series_equal(indicator_cache.adx(z, 14, cache=self.cache),
+                                       ta.ADX(high, low, close, timeperiod=14).rename('adx'))
+        pd.testing.assert_series_equal(indicator_cache.sma(z, 48, cache=self.cache),
+                                       close.rolling(48).mean().rename('sma'))
+        pd.testing.assert_series_equal(indicator_cache.ema(z, 10, cache=self.cache),
+                                       ta.MA(close, timeperiod=10, matype=1).rename('ema'))
+        pd.testing.assert_series_equal(indicator_cache.rolling_std(z, 24, 'close', cache=self.cache),
+                                       close.rolling(24).std().rename('rolling_std'))
+
+    def test_hits_misses_and_invalidation(self):
+        first = indicator_cache.atr(self.bars, 14, cache=self.cache)
+        indicator_cache.atr(self.bars.copy(), 14, cache=self.cache)  # 内容相同的另一份数据
+        indicator_cache.atr(self.bars, 20, cache=self.cache)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 2))
+
+        changed = self.bars.copy()
+        changed.iloc[-1, changed.columns.get_loc('high')] += 100.0
+        self.assertFalse(np.array_equal(indicator_cache.atr(changed, 14, cache=self.cache), first,
+                                        equal_nan=True))
+        self.assertEqual(self.cache.misses, 3)
+        # volume 不参与 ATR 的指纹
+        other = self.bars.copy()
+        other['volume'] = 0.0
+        indicator_cache.atr(other, 14, cache=self.cache)
+        self.assertEqual(self.cache.hits, 2)
+
+    def test_lru_eviction(self):
+        cache = indicator_cache.IndicatorCache(max_entries=2)
+        for period in (10, 20, 30):
+            indicator_cache.sma(self.bars, period, cache=cache)
+        indicator_cache.sma(self.bars, 30, cache=cache)
+        indicator_cache.sma(self.bars, 10, cache=cache)
+        self.assertEqual(cache.stats(), {'hits': 1, 'disk_hits': 0, 'misses': 4, 'entries': 2})
+
+    def test_disk_tier(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        first = indicator_cache.adx(self.bars, 14, cache=indicator_cache.IndicatorCache(cache_dir=cache_dir))
+        fresh = indicator_cache.IndicatorCache(cache_dir=cache_dir)  # 相当于重启内核
+        again = indicator_cache.adx(self.bars, 14, cache=fresh)
+        pd.testing.assert_series_equal(again, first)
+        self.assertEqual((fresh.disk_hits, fresh.misses), (1, 0))
+
+    def test_shared_across_strategy_versions(self):
+        indicator_cache.default_cache.clear()
+        v2 = puppyV2_strategy.preprocess_data(self.bars)
+        misses = indicator_cache.stats()['misses']
+        v3 = puppyV3_strategy.preprocess_data(self.bars, features=puppyV3_strategy.FEATURES)
+        stats = indicator_cache.stats()
+        self.assertEqual(stats['misses'], misses)  # V3 的指标全部来自 V2 算好的结果
+        self.assertGreaterEqual(stats['hits'], 5)
+        for name in ('atr', 'adx', 'sma_fast', 'sma_slow', 'rolling_vol'):
+            pd.testing.assert_series_equal(v3[name], v2[name])
+        pd.testing.assert_series_equal(v3['sma_slow'], self.bars['close'].rolling(200).mean().rename('sma_slow'))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+ohlcv_store 测试
+"""
+
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '规则类课程'))
+
+import crypto_process
+from ohlcv_store import OHLCVStore
+from crypto_test_utils import CryptoProcessTestCase, make_minutes, write_month_zip
+
+
+class TestOHLCVStore(CryptoProcessTestCase):
+    """测试 memmap K线库"""
+
+    def setUp(self):
+        super().setUp()
+        self.root = os.path.join(self.tmp, 'store')
+        self.store = OHLCVStore('BTCUSDT', '1m', root=self.root)
+
+    def test_load_data_through_store(self):
+        expected = crypto_process.load_data('2024-01', '2024-02', use_cache=False)
+        z = crypto_process.load_data('2024-01', '2024-02', store=self.store)
+        self.assertEqual(self.store.months, ['2024-01', '2024-02'])
+        self.assertEqual(len(z), len(expected))
+        for col in ['open', 'high', 'low', 'close', 'volume', 'count']:
+            np.testing.assert_array_equal(z[col].to_numpy(), expected[col].to_numpy())
+        np.testing.assert_array_equal(z['open_time'].to_numpy(),
+                                      expected['open_time'].to_numpy().astype('datetime64[ms]'))
+
+    def test_view_is_zero_copy(self):
+        crypto_process.load_data('2024-01', '2024-02', store=self.store)
+        z = self.store.view('2024-01-31 12:00', '2024-02-01 06:00')
+        self.assertEqual(len(z), 18 * 60)
+        self.assertEqual(z['open_time'].iloc[0], pd.Timestamp('2024-01-31 12:00'))
+        self.assertTrue(np.shares_memory(z['close'].to_numpy(), self.store.column('close')))
+
+    def test_reopen_and_append(self):
+        crypto_process.load_data('2024-01', '2024-01', store=self.store)
+        reopened = OHLCVStore('BTCUSDT', '1m', root=self.root)
+        self.assertEqual(len(reopened), len(self.jan))
+
+        write_month_zip(self.data_dir, '2024-03', make_minutes('2024-03-01', 60, seed=3))
+        z = crypto_process.load_data('2024-01', '2024-03', store=reopened)
+        self.assertEqual(len(z), len(self.jan) + len(self.feb) + 60)
+        self.assertEqual(reopened.months, ['2024-01', '2024-02', '2024-03'])
+
+    def test_append_rejects_older_rows(self):
+        crypto_process.load_data('2024-02', '2024-02', store=self.store)
+        with self.assertRaises(ValueError):
+            self.store.append(crypto_process.load_data('2024-01', '2024-01'))
+
+    def test_append_after_interrupted_append(self):
+        crypto_process.load_data('2024-01', '2024-01', store=self.store)
+        feb = crypto_process.load_data('2024-02', '2024-02')
+
+        # 模拟写完列文件、写 header 之前崩溃
+        def crash():
+            raise OSError("模拟中断")
+        self.store._write_header = crash
+        with self.assertRaises(OSError):
+            self.store.append(feb.iloc[:100], month='2024-02')
+
+        reopened = OHLCVStore('BTCUSDT', '1m', root=self.root)
+        self.assertEqual(len(reopened), len(self.jan))
+        reopened.append(feb, month='2024-02')
+        z = reopened.view()
+        self.assertEqual(len(z), len(self.jan) + len(self.feb))
+        self.assertTrue(z['open_time'].is_monotonic_increasing)
+        np.testing.assert_array_equal(z['close'].to_numpy()[len(self.jan):], feb['close'].to_numpy())
+        for name, dtype in reopened.header['columns'].items():
+            self.assertEqual(os.path.getsize(reopened._column_path(name)),
+                             len(z) * np.dtype(dtype).itemsize)
+
+    def test_resample_from_store_view(self):
+        expected = crypto_process.resample_data(
+            crypto_process.load_data('2024-01', '2024-02', use_cache=False), '1h')
+        z = crypto_process.resample_data(
+            crypto_process.load_data('2024-01', '2024-02', store=self.store), '1h')
+        np.testing.assert_array_equal(z.to_numpy(), expected.to_numpy())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+策略流水线测试：inplace 预处理与 columns 投影
+"""
+
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '规则类课程'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '规则类课程', 'Stategy'))
+
+import crypto_process
+import puppyV3_strategy
+from crypto_test_utils import make_minutes
+
+
+class TestCopyFreePipeline(unittest.TestCase):
+    """测试不复制整表的流水线模式"""
+
+    def setUp(self):
+        z = make_minutes('2024-01-30', 2 * 1440, seed=5)
+        z['open_time'] = crypto_process._parse_epoch_mixed(z['open_time'])
+        self.bars = crypto_process.resample_data(z, '5min')
+
+    def test_resample_does_not_touch_input(self):
+        z = make_minutes('2024-01-30', 300, seed=6)
+        z['open_time'] = crypto_process._parse_epoch_mixed(z['open_time'])
+        before = z.copy()
+        crypto_process.resample_data(z, '1h')
+        pd.testing.assert_frame_equal(z, before)
+
+    def test_inplace_preprocess(self):
+        copied = puppyV3_strategy.preprocess_data(self.bars)
+        self.assertNotIn('atr', self.bars.columns)
+        bars = self.bars.copy()
+        result = puppyV3_strategy.preprocess_data(bars, inplace=True)
+        self.assertIs(result, bars)
+        pd.testing.assert_frame_equal(result, copied)
+
+    def test_columns_projection(self):
+        columns = ['close', 'position', 'flag', 'nav']
+        full, trades_full = puppyV3_strategy.execute_strategy(self.bars)
+        lean, trades_lean = puppyV3_strategy.execute_strategy(self.bars.copy(), inplace=True,
+                                                              columns=columns)
+        self.assertEqual(lean.columns.tolist(), columns)
+        pd.testing.assert_frame_equal(lean, full[columns])
+        pd.testing.assert_frame_equal(trades_lean, trades_full)
+        self.assertTrue(np.isfinite(lean['nav']).all())
+
+
+if __name__ == "__main__":
+    unittest.main()
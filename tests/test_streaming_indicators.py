@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+streaming_indicators 测试：逐 bar 增量结果与批量 preprocess_data 一致
+"""
+
+import os
+import pickle
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+import talib as ta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '规则类课程'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '规则类课程', 'Stategy'))
+
+import crypto_process
+import puppyV2_strategy
+import puppyV3_strategy
+import streaming_indicators as si
+from crypto_test_utils import make_minutes
+
+
+def stream(indicator, *columns):
+    """逐个元素喂给 indicator，返回每步的输出"""
+    return np.array([indicator.update(*args) for args in zip(*columns)])
+
+
+class TestStreamingIndicators(unittest.TestCase):
+    """测试单个增量指标"""
+
+    def setUp(self):
+        z = make_minutes('2024-01-30', 3 * 1440, seed=31)
+        z['open_time'] = crypto_process._parse_epoch_mixed(z['open_time'])
+        self.bars = crypto_process.resample_data(z, '5min')
+        self.close = self.bars['close'].to_numpy()
+        self.hlc = [self.bars[c].to_numpy() for c in ('high', 'low', 'close')]
+
+    def assert_matches(self, actual, expected):
+        np.testing.assert_array_equal(np.isnan(actual), np.isnan(expected))
+        np.testing.assert_allclose(actual, expected, rtol=1e-9, atol=1e-9)
+
+    def test_against_batch(self):
+        close = pd.Series(self.close)
+        self.assert_matches(stream(si.SMA(48), self.close), close.rolling(48).mean().to_numpy())
+        self.assert_matches(stream(si.EMA(10), self.close), ta.MA(self.close, timeperiod=10, matype=1))
+        self.assert_matches(stream(si.RollingStd(24), self.close), close.rolling(24).std().to_numpy())
+        self.assert_matches(stream(si.RollingMax(48), self.hlc[0]),
+                            pd.Series(self.hlc[0]).rolling(48).max().to_numpy())
+        self.assert_matches(stream(si.ATR(14), *self.hlc), ta.ATR(*self.hlc, timeperiod=14))
+        self.assert_matches(stream(si.ADX(14), *self.hlc), ta.ADX(*self.hlc, timeperiod=14))
+
+    def test_constant_window_std_is_exactly_zero(self):
+        values = np.r_[np.linspace(1, 2, 30), np.full(30, 0.1)]
+        out = stream(si.RollingStd(10), values)
+        self.assertEqual(out[-1], 0.0)
+        self.assertEqual(pd.Series(values).rolling(10).std().iloc[-1], 0.0)
+        z = stream(si.ZScore(10), values)
+        self.assertEqual(z[-1], 0.0)
+        self.assertEqual(z[0], 0.0)  # 预热期 fillna(0)
+
+    def test_snapshot_restore(self):
+        adx = si.ADX(14)
+        stream(adx, *(c[:100] for c in self.hlc))
+        state = pickle.loads(pickle.dumps(adx.snapshot()))
+        tail = stream(adx, *(c[100:] for c in self.hlc))
+        adx.update(1.0, 1.0, 1.0)  # 恢复后应与这根 bar 无关
+        adx.restore(state)
+        np.testing.assert_array_equal(stream(adx, *(c[100:] for c in self.hlc)), tail)
+
+
+class TestStrategyFeatures(unittest.TestCase):
+    """测试组合特征与 V2/V3 preprocess_data 一致"""
+
+    def setUp(self):
+        z = make_minutes('2024-01-30', 4 * 1440, seed=32)
+        z['open_time'] = crypto_process._parse_epoch_mixed(z['open_time'])
+        self.bars = crypto_process.resample_data(z, '5min')
+
+    def run_features(self, features, bars):
+        rows = [features.update(bar) for bar in bars[['high', 'low', 'close']].to_dict('records')]
+        return pd.DataFrame(rows, index=bars.index)
+
+    def test_matches_preprocess(self):
+        streamed = self.run_features(si.StrategyFeatures(), self.bars)
+        v2 = puppyV2_strategy.preprocess_data(self.bars)
+        v3 = puppyV3_strategy.preprocess_data(self.bars, features=puppyV3_strategy.FEATURES)
+        for batch in (v2, v3):
+            for name in batch.columns.intersection(streamed.columns):
+                np.testing.assert_allclose(streamed[name], batch[name], rtol=1e-9, atol=1e-9,
+                                           err_msg=name)
+
+    def test_resume_from_snapshot(self):
+        split = len(self.bars) // 2
+        full = self.run_features(si.StrategyFeatures(), self.bars)
+        features = si.StrategyFeatures()
+        self.run_features(features, self.bars.iloc[:split])
+        resumed = si.StrategyFeatures()
+        resumed.restore(pickle.loads(pickle.dumps(features.snapshot())))
+        pd.testing.assert_frame_equal(self.run_features(resumed, self.bars.iloc[split:]), full.iloc[split:])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+tick_codec 测试
+"""
+
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '规则类课程'))
+
+import crypto_process
+import tick_codec
+from crypto_test_utils import make_minutes
+
+
+class TestTickCodec(unittest.TestCase):
+    """测试整数 tick 编码"""
+
+    def setUp(self):
+        z = make_minutes('2024-01-30', 2 * 1440, seed=3)
+        for col in ('open_time', 'close_time'):
+            z[col] = crypto_process._parse_epoch_mixed(z[col])
+        self.z = z
+
+    def test_minute_round_trip_is_lossless(self):
+        bars = tick_codec.encode(self.z)
+        self.assertEqual(bars.price_scale, 100)
+        expected = self.z.drop(columns=['close_time', 'ignore'])
+        pd.testing.assert_frame_equal(bars.decode(), expected)
+        pd.testing.assert_frame_equal(bars.decode(columns=['close']), expected[['close']])
+        # 分钟级差分可以用 int16 保存，整体不到 float 表的一半
+        self.assertEqual(bars.prices['close'].dtype, np.int16)
+        self.assertLess(bars.nbytes, expected.memory_usage(index=False).sum() / 2)
+
+    def test_resampled_with_empty_bars(self):
+        z = self.z.drop(index=range(120, 300))
+        bars_1h = crypto_process.resample_data(z, '1h')
+        self.assertTrue(bars_1h['close'].isna().any())
+        bars = tick_codec.encode(bars_1h)
+        decoded = bars.decode()
+        pd.testing.assert_frame_equal(decoded, bars_1h, check_freq=False)
+
+    def test_count_dtype_is_preserved(self):
+        # lean dtypes 读入的 count 为 int32，解码后不应被放大为 int64
+        z = self.z.drop(columns=['close_time', 'ignore']).astype({'count': 'int32'})
+        pd.testing.assert_frame_equal(tick_codec.encode(z).decode(), z)
+
+    def test_off_grid_price_raises(self):
+        with self.assertRaises(ValueError):
+            tick_codec.encode(self.z, price_scale=10)
+
+
+if __name__ == "__main__":
+    unittest.main()
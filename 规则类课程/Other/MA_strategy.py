@@ -1,6 +1,10 @@
+import os
+import sys
 import pandas as pd
 import numpy as np
-import talib as ta
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import indicator_cache
 
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
@@ -16,8 +20,8 @@ def preprocess_data(z_:pd.DataFrame) -> pd.DataFrame:
     # 计算指标，计算了sma short moving average lma long moving average
     # open + close
     # z.rolling(window=20).std() 计算滚动窗口的标准差 atr/rsi
-    z['sma'] = ta.MA(z['close'], timeperiod = 10, matype = 1)  # 0为SMA 1为EMA
-    z['lma'] = ta.MA(z['close'], timeperiod = 30, matype = 1)
+    z['sma'] = indicator_cache.ema(z, 10)  # 同 ta.MA(z['close'], timeperiod=10, matype=1)，0为SMA 1为EMA
+    z['lma'] = indicator_cache.ema(z, 30)
     # 增加了2个列，仓位列和记录买卖的列
     z['position'] = 0.0 # 记录仓位
     z['flag'] = 0.0 # 记录买卖，对买卖的情况进行记录
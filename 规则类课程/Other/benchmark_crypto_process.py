@@ -0,0 +1,193 @@
+"""
+crypto_process 性能基准
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'Stategy'))
+
+import crypto_cache
+import crypto_process
+import data_quality
+
+
+def _timeit(func, *args, **kwargs):
+    t0 = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - t0
+
+
+def bench_load_cache(start_month: str = '2024-01', end_month: str = '2025-03'):
+    """对比不使用缓存、冷缓存（首次写入）、热缓存三种情况下 load_data 的耗时"""
+    crypto_cache.clear_cache()
+    _, t_nocache = _timeit(crypto_process.load_data, start_month, end_month, use_cache=False)
+    _, t_cold = _timeit(crypto_process.load_data, start_month, end_month, use_cache=True)
+    _, t_warm = _timeit(crypto_process.load_data, start_month, end_month, use_cache=True)
+
+    print("\n" + "=" * 50)
+    print(f"load_data({start_month!r}, {end_month!r})")
+    print(f"不使用缓存: {t_nocache:.2f}s")
+    print(f"冷缓存(写入): {t_cold:.2f}s")
+    print(f"热缓存: {t_warm:.2f}s  (加速 {t_nocache / t_warm:.1f}x)")
+
+
+def bench_csv_engine(start_month: str = '2024-01', end_month: str = '2024-06'):
+    """冷缓存下 pandas C 解析器与 pyarrow 多线程解析器的耗时对比"""
+    _, t_c = _timeit(crypto_process.load_data, start_month, end_month, use_cache=False)
+    _, t_arrow = _timeit(crypto_process.load_data, start_month, end_month, use_cache=False,
+                         engine='arrow')
+
+    print("\n" + "=" * 50)
+    print(f"解析 CSV {start_month} ~ {end_month}")
+    print(f"engine='c': {t_c:.2f}s")
+    print(f"engine='arrow': {t_arrow:.2f}s  (加速 {t_c / t_arrow:.1f}x)")
+
+
+def bench_load_resampled(start_month: str = '2024-01', end_month: str = '2025-03', freq: str = '1h'):
+    """对比串行 resample_data(load_data(...)) 与按月并行 load_resampled 的耗时"""
+    _, t_serial = _timeit(lambda: crypto_process.resample_data(
+        crypto_process.load_data(start_month, end_month), freq))
+    _, t_parallel = _timeit(crypto_process.load_resampled, start_month, end_month, freq)
+
+    print("\n" + "=" * 50)
+    print(f"重采样 {start_month} ~ {end_month}, freq={freq}")
+    print(f"串行: {t_serial:.2f}s")
+    print(f"按月并行: {t_parallel:.2f}s  (加速 {t_serial / t_parallel:.1f}x)")
+
+
+def bench_resample_engine(start_month: str = '2024-01', end_month: str = '2025-03', freq: str = '1h'):
+    """resample_data 的 pandas 路径 vs reduceat 内核"""
+    z = crypto_process.load_data(start_month, end_month)
+    _, t_pandas = _timeit(crypto_process.resample_data, z, freq)
+    _, t_numpy = _timeit(crypto_process.resample_data, z, freq, engine='numpy')
+
+    print("\n" + "=" * 50)
+    print(f"重采样 {start_month} ~ {end_month}, freq={freq}")
+    print(f"engine='pandas': {t_pandas:.2f}s")
+    print(f"engine='numpy': {t_numpy:.2f}s  (加速 {t_pandas / t_numpy:.1f}x)")
+
+
+def bench_resample_pyramid(start_month: str = '2024-01', end_month: str = '2025-03',
+                           freqs: tuple = ('5min', '15min', '1h', '4h', '1d')):
+    """逐个频率 resample_data vs resample_pyramid 一次构建全部层级"""
+    z = crypto_process.load_data(start_month, end_month)
+    _, t_finest = _timeit(crypto_process.resample_data, z, freqs[0])
+    _, t_each = _timeit(lambda: [crypto_process.resample_data(z, f) for f in freqs])
+    _, t_pyramid = _timeit(crypto_process.resample_pyramid, z, list(freqs))
+
+    print("\n" + "=" * 50)
+    print(f"重采样 {start_month} ~ {end_month}, freqs={list(freqs)}")
+    print(f"只构建 {freqs[0]}: {t_finest:.2f}s")
+    print(f"逐个 resample_data: {t_each:.2f}s")
+    print(f"resample_pyramid: {t_pyramid:.2f}s")
+
+
+def bench_parse_epoch(n: int = 1_000_000):
+    """_parse_epoch_mixed：int64 快速路径 vs object（字符串）兜底路径，各 n 行"""
+    start_ms = 1704067200000  # 2024-01-01
+    ms = pd.Series(start_ms + np.arange(n, dtype='int64') * 60000)
+    us = ms * 1000
+    as_str = ms.astype(str).astype(object)
+
+    print("\n" + "=" * 50)
+    print(f"_parse_epoch_mixed, {n:,} 行")
+    for name, series in [('int64 毫秒', ms), ('int64 微秒', us), ('object 字符串', as_str)]:
+        _, t = _timeit(crypto_process._parse_epoch_mixed, series)
+        print(f"{name}: {t * 1000:.1f}ms")
+
+
+def bench_validate(start_month: str = '2024-01', end_month: str = '2025-03'):
+    """热缓存读取耗时 vs 一次向量化质量检查的耗时"""
+    crypto_process.load_data(start_month, end_month)  # 预热缓存
+    z, t_load = _timeit(crypto_process.load_data, start_month, end_month)
+    _, t_check = _timeit(data_quality.validate, z)
+
+    print("\n" + "=" * 50)
+    print(f"质量检查 {start_month} ~ {end_month}, {len(z):,} 行")
+    print(f"热缓存读取: {t_load:.2f}s")
+    print(f"validate: {t_check * 1000:.1f}ms  (占读取耗时 {t_check / t_load:.1%})")
+
+
+def bench_range_pushdown(year: str = '2024', day: str = '2024-06-15'):
+    """热缓存下读取一整年 vs 借助块索引只读取其中一天"""
+    crypto_process.load_data(f'{year}-01', f'{year}-12')  # 预热缓存
+    _, t_year = _timeit(crypto_process.load_data, f'{year}-01', f'{year}-12')
+    end = (pd.Timestamp(day) + pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+    _, t_day = _timeit(crypto_process.load_data, day, end)
+
+    print("\n" + "=" * 50)
+    print(f"热缓存读取 {year} 全年: {t_year:.2f}s")
+    print(f"热缓存读取 {day} 一天: {t_day * 1000:.1f}ms")
+
+
+def _peak_memory(func, *args, **kwargs):
+    """func 执行期间 numpy/pandas 分配的峰值内存（MB，tracemalloc 统计）"""
+    tracemalloc.start()
+    func(*args, **kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024 ** 2
+
+
+def bench_pipeline_memory(start_month: str = '2023-01', end_month: str = '2024-12', freq: str = '1h'):
+    """load_data -> resample_data -> V3 预处理/策略：默认（逐级复制）与 inplace + columns 投影的峰值内存"""
+    import puppyV3_strategy
+
+    def pipeline(inplace, columns):
+        z = crypto_process.resample_data(crypto_process.load_data(start_month, end_month), freq)
+        return puppyV3_strategy.execute_strategy(z, inplace=inplace, columns=columns)
+
+    peak_default = _peak_memory(pipeline, False, None)
+    peak_lean = _peak_memory(pipeline, True, ['close', 'position', 'flag', 'nav'])
+
+    print("\n" + "=" * 50)
+    print(f"流水线峰值内存 {start_month} ~ {end_month}, freq={freq}")
+    print(f"默认: {peak_default:.0f}MB")
+    print(f"inplace + columns: {peak_lean:.0f}MB  (降低 {1 - peak_lean / peak_default:.0%})")
+
+
+def bench_streaming_update(n_bars: int = 20000):
+    """追加一根 bar 的耗时：V2 预处理整段重算 与 StrategyFeatures.update"""
+    import puppyV2_strategy
+    import streaming_indicators
+
+    rng = np.random.default_rng(0)
+    close = 30000 + np.cumsum(rng.normal(0, 50, n_bars))
+    z = pd.DataFrame({'open': close, 'high': close + rng.uniform(0, 30, n_bars),
+                      'low': close - rng.uniform(0, 30, n_bars), 'close': close},
+                     index=pd.date_range('2022-01-01', periods=n_bars, freq='1h'))
+    _, t_batch = _timeit(puppyV2_strategy.preprocess_data, z)
+
+    features = streaming_indicators.StrategyFeatures()
+    bars = z.to_dict('records')
+    start = time.perf_counter()
+    for bar in bars:
+        features.update(bar)
+    t_stream = (time.perf_counter() - start) / n_bars
+
+    print("\n" + "=" * 50)
+    print(f"追加一根 bar（历史 {n_bars} 根）")
+    print(f"整段重算 preprocess_data: {t_batch * 1000:.1f}ms")
+    print(f"StrategyFeatures.update: {t_stream * 1e6:.1f}us")
+
+
+def main():
+    bench_parse_epoch()
+    bench_load_cache()
+    bench_csv_engine()
+    bench_load_resampled()
+    bench_resample_engine()
+    bench_resample_pyramid()
+    bench_range_pushdown()
+    bench_validate()
+    bench_pipeline_memory()
+    bench_streaming_update()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,102 +2,448 @@
 从币安下载BTCUSDT历史数据的脚本
 """
 
+import hashlib
+import json
 import os
+import queue
+import threading
 import requests
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import pandas as pd
 from pathlib import Path
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
-def create_data_directory():
+import crypto_cache
+import crypto_manifest
+import crypto_process
+
+# 币安历史数据下载地址（测试时可替换为本地服务器）
+BASE_URL = "https://data.binance.vision/data/spot/monthly/klines"
+DAILY_BASE_URL = "https://data.binance.vision/data/spot/daily/klines"
+# 本地数据根目录，每个交易对一个子目录
+DATA_ROOT = "D:/workspace/data/crypto/1min"
+# 每次写入的字节数、并发下载数、单个请求的超时（秒）
+CHUNK_SIZE = 1024 * 1024
+MAX_WORKERS = 4
+TIMEOUT = 60
+
+def create_data_directory(symbol='BTCUSDT'):
     """创建数据存储目录"""
-    data_dir = Path("D:/workspace/data/crypto/1min/BTCUSDT")
+    data_dir = Path(DATA_ROOT) / symbol
     data_dir.mkdir(parents=True, exist_ok=True)
     return data_dir
 
-def download_binance_data(symbol, interval, year, month, data_dir):
+def create_session(max_workers=MAX_WORKERS):
+    """所有下载共用的 Session：连接池大小与并发数一致，连接失败和 5xx 自动重试"""
+    session = requests.Session()
+    retry = Retry(total=3, backoff_factor=1, status_forcelist=(500, 502, 503, 504),
+                  allowed_methods=('GET',))
+    adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers, max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def _sha256(path, chunk_size=CHUNK_SIZE):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _fetch_checksum(session, url):
+    """
+    读取币安发布的 .CHECKSUM 文件（格式: '<sha256>  <文件名>'）。
+
+    Returns:
+        str: sha256；服务器明确返回 404（没有发布校验文件）时为 None。
+
+    Raises:
+        requests.exceptions.RequestException: 其他原因（网络错误、5xx 等）取不到校验文件，
+            此时无法确认文件完整，调用方应按下载失败处理。
+    """
+    response = session.get(f"{url}.CHECKSUM", timeout=TIMEOUT)
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+    return response.text.split()[0].lower()
+
+def _fetch_to_part(session, url, part_path, chunk_size):
+    """下载到 .part 临时文件；已有部分内容时用 HTTP Range 续传"""
+    offset = part_path.stat().st_size if part_path.exists() else 0
+    headers = {'Range': f'bytes={offset}-'} if offset else {}
+    with session.get(url, headers=headers, stream=True, timeout=TIMEOUT) as response:
+        if response.status_code == 416:
+            # 请求的起点已在文件末尾：上次其实已经下载完整
+            return
+        response.raise_for_status()
+        # 服务器不支持 Range 时返回 200 和完整文件，从头写
+        mode = 'ab' if response.status_code == 206 else 'wb'
+        if mode == 'ab':
+            print(f"续传 {part_path.name}，已有 {offset} 字节")
+        with open(part_path, mode) as f:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                f.write(chunk)
+
+def _download_file(url, local_path, session, chunk_size=CHUNK_SIZE, verify=True):
+    """下载 url 到 local_path：先写 .part 临时文件（可续传），校验通过后再改名"""
+    filename = Path(local_path).name
+    part_path = Path(local_path).with_name(f"{filename}.part")
+    print(f"正在下载 {filename}...")
+    try:
+        _fetch_to_part(session, url, part_path, chunk_size)
+        if verify:
+            # 取校验文件失败会抛出异常，.part 保留，下次续传后再校验
+            expected = _fetch_checksum(session, url)
+            if expected is None:
+                print(f"警告: 服务器没有 {filename}.CHECKSUM，{filename} 未经校验")
+            elif _sha256(part_path) != expected:
+                print(f"{filename} 校验失败，已删除，下次重新下载")
+                part_path.unlink()
+                return False
+        os.replace(part_path, local_path)
+        print(f"成功下载 {filename}")
+        return True
+        
+    except (requests.exceptions.RequestException, OSError) as e:
+        print(f"下载 {filename} 失败: {e}")
+        return False
+
+def _refresh_manifest(symbol, interval, data_dir):
+    """目录中已有清单时增量更新，使 load_data 读到新下载或改写的文件"""
+    if crypto_manifest.load_manifest(symbol, interval, folder=data_dir) is not None:
+        crypto_manifest.update_manifest(symbol, interval, folder=data_dir)
+
+def download_binance_data(symbol, interval, year, month, data_dir, session=None,
+                          chunk_size=CHUNK_SIZE, verify=True, refresh_manifest=True):
     """
     从币安下载指定月份的K线数据
     
+    先写入同目录下的 .part 临时文件，校验通过后再改名为正式文件，
+    因此目录中的 zip 一定是完整的；中断后再次运行会从 .part 的末尾续传。
+    
     Args:
         symbol: 交易对，如 'BTCUSDT'
         interval: 时间间隔，如 '1m'
         year: 年份
         month: 月份
         data_dir: 数据存储目录
+        session: 共用的 requests.Session，默认新建一个
+        chunk_size: 每次写入的字节数
+        verify: 是否用币安发布的 .CHECKSUM 校验 sha256
+        refresh_manifest: 下载成功后是否更新目录中已有的清单（批量下载时由调用方最后统一更新）
     """
     # 构建文件名
     filename = f"{symbol}-{interval}-{year}-{month:02d}.zip"
-    
-    # 币安历史数据下载URL
-    base_url = "https://data.binance.vision/data/spot/monthly/klines"
-    url = f"{base_url}/{symbol}/{interval}/{filename}"
+    url = f"{BASE_URL}/{symbol}/{interval}/{filename}"
     
     # 本地文件路径
-    local_path = data_dir / filename
+    local_path = Path(data_dir) / filename
     
-    # 检查文件是否已存在
+    # 检查文件是否已存在（旧版本直接写正式文件，可能留下不完整的 zip）
     if local_path.exists():
-        print(f"文件 {filename} 已存在，跳过下载")
-        return True
-    
-    print(f"正在下载 {filename}...")
+        if zipfile.is_zipfile(local_path):
+            print(f"文件 {filename} 已存在，跳过下载")
+            return True
+        print(f"文件 {filename} 不完整，重新下载")
+        local_path.unlink()
     
-    try:
-        # 下载文件
-        response = requests.get(url, stream=True)
-        response.raise_for_status()
-        
-        # 保存文件
-        with open(local_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-        
-        print(f"成功下载 {filename}")
-        return True
-        
-    except requests.exceptions.RequestException as e:
-        print(f"下载 {filename} 失败: {e}")
-        return False
+    ok = _download_file(url, local_path, session or create_session(), chunk_size, verify)
+    if ok and refresh_manifest:
+        _refresh_manifest(symbol, interval, data_dir)
+    return ok
 
-def download_date_range(symbol, interval, start_date, end_date):
+def download_date_range(symbol, interval, start_date, end_date, data_dir=None,
+                        max_workers=MAX_WORKERS, chunk_size=CHUNK_SIZE, verify=True):
     """
-    下载指定日期范围的数据
+    并发下载指定日期范围的数据
     
     Args:
         symbol: 交易对，如 'BTCUSDT'
         interval: 时间间隔，如 '1m'
         start_date: 开始日期，格式 'YYYY-MM'
         end_date: 结束日期，格式 'YYYY-MM'
+        data_dir: 数据存储目录，默认 DATA_ROOT/symbol
+        max_workers: 并发下载数
+        chunk_size: 每次写入的字节数
+        verify: 是否校验 .CHECKSUM
     """
     # 创建数据目录
-    data_dir = create_data_directory()
+    data_dir = Path(data_dir) if data_dir is not None else create_data_directory(symbol)
+    data_dir.mkdir(parents=True, exist_ok=True)
     
     # 解析日期
     start = datetime.strptime(start_date, '%Y-%m')
     end = datetime.strptime(end_date, '%Y-%m')
     
+    months = []
     current = start
-    success_count = 0
-    total_count = 0
-    
     while current <= end:
-        year = current.year
-        month = current.month
-        
-        total_count += 1
-        if download_binance_data(symbol, interval, year, month, data_dir):
-            success_count += 1
-        
+        months.append((current.year, current.month))
         # 移动到下个月
-        if month == 12:
-            current = current.replace(year=year + 1, month=1)
+        if current.month == 12:
+            current = current.replace(year=current.year + 1, month=1)
         else:
-            current = current.replace(month=month + 1)
+            current = current.replace(month=current.month + 1)
     
+    with create_session(max_workers) as session, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(
+            lambda ym: download_binance_data(symbol, interval, ym[0], ym[1], data_dir,
+                                             session=session, chunk_size=chunk_size, verify=verify,
+                                             refresh_manifest=False),
+            months))
+    _refresh_manifest(symbol, interval, data_dir)
+    
+    success_count = sum(results)
+    total_count = len(results)
     print(f"\n下载完成！成功下载 {success_count}/{total_count} 个文件")
     return success_count == total_count
 
+def ingest_date_range(symbol, interval, start_date, end_date, data_dir=None, store=None,
+                      max_workers=MAX_WORKERS, converters=2, queue_size=4, engine=None,
+                      chunk_size=CHUNK_SIZE, verify=True):
+    """
+    边下载边转换为列式数据：下载线程把下载完成的月度 zip 放入有界队列，
+    转换线程同时从队列中取出、按币安已知的列类型解析，并直接写入列式缓存（见 crypto_cache），
+    之后 load_data 不再需要解析 CSV。网络 I/O 与解析相互重叠；队列满时下载线程等待，
+    内存中最多只有 queue_size + converters 个月的数据。提供 store 时先完成的月份要等前面的月份追加进库，
+    因此某个月份只有在与尚未入库的最早月份相差不到 queue_size + converters 个月时才开始下载，
+    前面的月份下载较慢时后面的月份不会在内存中无限堆积。目录中已有清单（crypto_manifest）时最后统一更新。
+
+    Args:
+        symbol: 交易对，如 'BTCUSDT'
+        interval: 时间间隔，如 '1m'
+        start_date: 开始月份，格式 'YYYY-MM'
+        end_date: 结束月份，格式 'YYYY-MM'
+        data_dir: 数据存储目录，默认 DATA_ROOT/symbol
+        store: 若提供 ohlcv_store.OHLCVStore，解析结果按月份顺序追加进库
+        max_workers: 下载线程数
+        converters: 转换线程数
+        queue_size: 下载与转换之间队列的容量（月份数）
+        engine: CSV 解析器，默认安装了 pyarrow 时用 'arrow'，否则用 'c'
+        chunk_size: 每次写入的字节数
+        verify: 是否校验 .CHECKSUM
+
+    Returns:
+        dict: {月份: 行数}，下载或解析失败的月份为 None。
+    """
+    data_dir = Path(data_dir) if data_dir is not None else create_data_directory(symbol)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    if engine is None:
+        engine = 'arrow' if crypto_process.pa_csv is not None else 'c'
+    months = crypto_process._month_range(datetime.strptime(start_date, '%Y-%m'),
+                                         datetime.strptime(end_date, '%Y-%m'))
+
+    tasks = queue.Queue(maxsize=queue_size)
+    results = {}
+    # 追加进库必须按月份顺序：先完成的月份在 pending 中等待前面的月份（head 为最早未入库月份的序号）
+    pending = {}
+    head = [0]
+    window = queue_size + converters
+    lock = threading.Lock()
+    head_moved = threading.Condition(lock)
+
+    def flush_store():
+        while head[0] < len(months) and months[head[0]] in pending:
+            month_str = months[head[0]]
+            z = pending.pop(month_str)
+            # 无论追加是否成功都要前进到下一个月，否则后面的月份永远等不到
+            head[0] += 1
+            head_moved.notify_all()
+            if z is None or not len(z) or month_str in store.months:
+                continue
+            try:
+                store.append(z, month=month_str)
+            except Exception as e:
+                print(f"追加 {month_str} 到K线库失败: {e}")
+                results[month_str] = None
+
+    def download(month_str):
+        if store is not None:
+            # 最早的未入库月份总能开始，因此不会死锁
+            with head_moved:
+                head_moved.wait_for(lambda: months.index(month_str) < head[0] + window)
+        year, month = int(month_str[:4]), int(month_str[5:])
+        ok = download_binance_data(symbol, interval, year, month, data_dir,
+                                   session=session, chunk_size=chunk_size, verify=verify,
+                                   refresh_manifest=False)
+        tasks.put((month_str, data_dir / f"{symbol}-{interval}-{month_str}.zip" if ok else None))
+
+    def convert():
+        while True:
+            item = tasks.get()
+            if item is None:
+                return
+            # 任何异常都不能让转换线程退出：否则队列无人消费，下载线程会在 put 上永远阻塞
+            month_str, path = item
+            z = None
+            if path is not None:
+                try:
+                    z = crypto_process._read_csv(str(path), engine=engine)
+                    crypto_cache.write_month(str(path), z)
+                    print(f"已转换 {path.name}: {len(z)} 行")
+                except Exception as e:
+                    print(f"转换 {path.name} 失败: {e}")
+                    z = None
+            with lock:
+                results[month_str] = None if z is None else len(z)
+                if store is not None:
+                    pending[month_str] = z
+                    flush_store()
+
+    workers = [threading.Thread(target=convert, daemon=True) for _ in range(converters)]
+    for worker in workers:
+        worker.start()
+    with create_session(max_workers) as session, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(download, months))
+    for _ in workers:
+        tasks.put(None)
+    for worker in workers:
+        worker.join()
+    _refresh_manifest(symbol, interval, data_dir)
+
+    done = sum(v is not None for v in results.values())
+    print(f"\n转换完成！成功 {done}/{len(months)} 个月")
+    return {m: results.get(m) for m in months}
+
+def download_daily_data(symbol, interval, day, daily_dir, session=None,
+                        chunk_size=CHUNK_SIZE, verify=True):
+    """下载某一天的K线日文件（day 格式 'YYYY-MM-DD'），已存在的完整文件直接跳过"""
+    filename = f"{symbol}-{interval}-{day}.zip"
+    local_path = Path(daily_dir) / filename
+    if local_path.exists() and zipfile.is_zipfile(local_path):
+        return True
+    url = f"{DAILY_BASE_URL}/{symbol}/{interval}/{filename}"
+    return _download_file(url, local_path, session or create_session(), chunk_size, verify)
+
+def _read_raw_rows(path):
+    """读取 zip 中的 CSV，所有列保留为原始字符串（写回时不改变数值格式），去掉可能存在的 header 行"""
+    with zipfile.ZipFile(path) as zf:
+        with zf.open(zf.namelist()[0]) as f:
+            z = pd.read_csv(f, header=None, names=crypto_process.COLUMN_NAMES, dtype=str)
+    return z[pd.to_numeric(z['open_time'], errors='coerce').notna()]
+
+def merge_daily_files(paths, out_path):
+    """
+    把若干日文件按 open_time 合并、去重（同一分钟保留后出现的一条）并排序，
+    写成与币安月度 zip 相同格式的文件（先写临时文件再替换）。
+
+    Returns:
+        int: 合并后的行数。
+    """
+    z = pd.concat([_read_raw_rows(p) for p in paths], ignore_index=True)
+    z['_key'] = z['open_time'].astype('int64')
+    z = z.drop_duplicates('_key', keep='last').sort_values('_key', kind='stable').drop(columns='_key')
+    out_path = Path(out_path)
+    tmp_path = out_path.with_name(f"{out_path.name}.tmp")
+    with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(f"{out_path.stem}.csv", z.to_csv(header=False, index=False))
+    os.replace(tmp_path, out_path)
+    return len(z)
+
+def _append_to_store(store, path, month_str):
+    """把文件中晚于库末尾的行追加进 memmap K线库"""
+    z = crypto_process._read_csv(str(path))
+    last = store.last_open_time()
+    if last is not None:
+        z = z[z['open_time'] > pd.Timestamp(last, unit='ms')]
+    if len(z):
+        store.append(z, month=month_str)
+        print(f"已追加 {len(z)} 行到K线库")
+
+def update_recent_data(symbol='BTCUSDT', interval='1m', today=None, data_dir=None, store=None,
+                       max_workers=MAX_WORKERS, chunk_size=CHUNK_SIZE, verify=True):
+    """
+    用币安日文件保持当月数据最新。
+
+    尚未发布月度归档的月份，下载截至昨天的日文件（已下载的跳过，只传输新的一天），
+    合并去重后写成该月的月度 zip，旁边的 <月度文件>.daily.json 记录由哪些日文件合成；
+    load_data 因此可以直接读到当月数据。之后再运行时，已结束月份的官方月度归档一旦发布，
+    就用它替换合成文件并删除对应的日文件。有月份更新且目录中已有清单时，同时更新清单中的行数与缺口。
+
+    Args:
+        symbol: 交易对，如 'BTCUSDT'
+        interval: 时间间隔，如 '1m'
+        today: 当前日期，默认为 UTC 今天（日文件在次日发布，因此只下载到昨天）
+        data_dir: 数据存储目录，默认 DATA_ROOT/symbol；日文件放在其下的 daily 子目录
+        store: 若提供 ohlcv_store.OHLCVStore，同时把新数据按 open_time 追加进库
+        max_workers: 并发下载数
+        chunk_size: 每次写入的字节数
+        verify: 是否校验 .CHECKSUM
+
+    Returns:
+        list: 本次更新过的月份（'YYYY-MM'）。
+    """
+    data_dir = Path(data_dir) if data_dir is not None else create_data_directory(symbol)
+    daily_dir = data_dir / 'daily'
+    daily_dir.mkdir(parents=True, exist_ok=True)
+    today = pd.Timestamp(today) if today is not None else pd.Timestamp.now(tz='UTC').tz_localize(None)
+    yesterday = today.normalize() - pd.Timedelta(days=1)
+    current_month = yesterday.strftime('%Y-%m')
+
+    def monthly_path(month_str):
+        return data_dir / f"{symbol}-{interval}-{month_str}.zip"
+
+    def marker_path(month_str):
+        return data_dir / f"{symbol}-{interval}-{month_str}.zip.daily.json"
+
+    # 由日文件合成的月份，加上昨天所在的月份
+    months = {p.name[len(f"{symbol}-{interval}-"):][:7] for p in data_dir.glob('*.zip.daily.json')}
+    if not (monthly_path(current_month).exists() and not marker_path(current_month).exists()):
+        months.add(current_month)
+
+    updated = []
+    with create_session(max_workers) as session:
+        for month_str in sorted(months):
+            month_start = pd.Timestamp(month_str)
+            month_end = month_start + pd.offsets.MonthBegin(1)
+            daily_names = [f"{symbol}-{interval}-{d:%Y-%m-%d}.zip"
+                           for d in pd.date_range(month_start, min(month_end - pd.Timedelta(days=1), yesterday))]
+
+            if month_str < current_month:
+                # 已结束的月份：尝试用官方月度归档替换合成文件
+                url = f"{BASE_URL}/{symbol}/{interval}/{monthly_path(month_str).name}"
+                tmp_path = monthly_path(month_str).with_name(f"{monthly_path(month_str).name}.monthly")
+                if _download_file(url, tmp_path, session, chunk_size, verify):
+                    os.replace(tmp_path, monthly_path(month_str))
+                    marker_path(month_str).unlink()
+                    for name in daily_names:
+                        (daily_dir / name).unlink(missing_ok=True)
+                    print(f"{month_str} 已替换为官方月度归档")
+                    if store is not None:
+                        _append_to_store(store, monthly_path(month_str), month_str)
+                    updated.append(month_str)
+                    continue
+
+            days = [name[len(f"{symbol}-{interval}-"):-len('.zip')] for name in daily_names]
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                list(executor.map(lambda day: download_daily_data(symbol, interval, day, daily_dir,
+                                                                  session=session, chunk_size=chunk_size,
+                                                                  verify=verify), days))
+            present = [daily_dir / name for name in daily_names if (daily_dir / name).exists()]
+            if not present:
+                continue
+            included = [p.name for p in present]
+            marker = marker_path(month_str)
+            if marker.exists() and json.loads(marker.read_text(encoding='utf-8'))['days'] == included:
+                continue
+            # 先写入未完成的标记再替换月度文件：中途崩溃时文件仍被识别为合成文件，下次重新合并，
+            # 不会被误当作官方月度归档
+            marker.write_text(json.dumps({'days': None}), encoding='utf-8')
+            rows = merge_daily_files(present, monthly_path(month_str))
+            marker.write_text(json.dumps({'days': included}), encoding='utf-8')
+            print(f"{month_str} 由 {len(present)} 个日文件合成，共 {rows} 行")
+            if store is not None:
+                _append_to_store(store, monthly_path(month_str), month_str)
+            updated.append(month_str)
+    if updated:
+        _refresh_manifest(symbol, interval, data_dir)
+    return updated
+
 def verify_data_format(data_dir, filename):
     """验证下载的数据格式"""
     file_path = data_dir / filename
@@ -138,7 +484,7 @@ def main():
         print("\n所有数据下载成功！")
         
         # 验证第一个文件的格式
-        data_dir = create_data_directory()
+        data_dir = create_data_directory(symbol)
         first_file = f"{symbol}-{interval}-2023-01.zip"
         verify_data_format(data_dir, first_file)
         
@@ -1,22 +1,24 @@
 
 import pandas as pd
-import talib as ta
 import numpy as np
 
+import indicator_cache
+
 def preprocess_data(
     z_: pd.DataFrame,
     ret_periods: int = 24,
     vol_window: int = 24,
     atr_period: int = 14,
+    inplace: bool = False,
 ) -> pd.DataFrame:
     """数据预处理：计算收益率、波动率、ATR（小时级可调）"""
-    z = z_.copy()
+    z = z_ if inplace else z_.copy()
     z["ret"] = z["close"].pct_change().fillna(0)
     # 小时级：默认用近1天(24小时)的动量与波动率衡量信号强度
     z["rolling_ret"] = z["close"].pct_change(periods=ret_periods).fillna(0)
-    z["rolling_vol"] = z["ret"].rolling(window=vol_window).std().fillna(1e-6)
+    z["rolling_vol"] = indicator_cache.rolling_std(z, vol_window, "ret").fillna(1e-6)
     z["signal_strength"] = z["rolling_ret"] / z["rolling_vol"]
-    z["atr"] = ta.ATR(z["high"], z["low"], z["close"], timeperiod=atr_period)
+    z["atr"] = indicator_cache.atr(z, atr_period)
     z["position"] = 0.0
     z["flag"] = 0.0
     return z
@@ -30,26 +32,28 @@ def preprocess_data(
     sma_slow: int = 200,
     adx_period: int = 14,
     breakout_lookback: int = 48,
+    inplace: bool = False,
 ) -> pd.DataFrame:
     """V2 预处理：仅做多所需的趋势/波动/突破特征。
     要求输入为 1 小时 K 线 DataFrame，至少包含: ['open','high','low','close']，索引为时间。
+    inplace=True 时直接在 z_ 上添加列，不复制整表。
     """
-    z = z_.copy()
+    z = z_ if inplace else z_.copy()
     # 基础收益与波动
     z["ret"] = z["close"].pct_change().fillna(0)
     z["rolling_ret"] = z["close"].pct_change(periods=ret_periods).fillna(0)
-    z["rolling_vol"] = z["ret"].rolling(window=vol_window).std().fillna(1e-6)
+    z["rolling_vol"] = indicator_cache.rolling_std(z, vol_window, "ret").fillna(1e-6)
     z["signal_strength"] = z["rolling_ret"] / z["rolling_vol"]
     # 信号 zscore（长期均值/方差）
-    _mean = z["signal_strength"].rolling(240).mean()
-    _std = z["signal_strength"].rolling(240).std().replace(0, 1)
+    _mean = indicator_cache.sma(z, 240, "signal_strength")
+    _std = indicator_cache.rolling_std(z, 240, "signal_strength").replace(0, 1)
     z["signal_z"] = ((z["signal_strength"] - _mean) / _std).fillna(0)
     # 趋势与动量过滤
-    z["sma_fast"] = z["close"].rolling(sma_fast).mean()
-    z["sma_slow"] = z["close"].rolling(sma_slow).mean()
-    z["adx"] = ta.ADX(z["high"], z["low"], z["close"], timeperiod=adx_period)
+    z["sma_fast"] = indicator_cache.sma(z, sma_fast)
+    z["sma_slow"] = indicator_cache.sma(z, sma_slow)
+    z["adx"] = indicator_cache.adx(z, adx_period)
     # ATR 与突破价
-    z["atr"] = ta.ATR(z["high"], z["low"], z["close"], timeperiod=atr_period)
+    z["atr"] = indicator_cache.atr(z, atr_period)
     z["hh"] = (
         z["high"].rolling(breakout_lookback).max().shift(1)
     )  # 上一根之前 N 小时最高
@@ -67,6 +71,7 @@ def run_strategy(
     cool_down_hours: int = 24,  # 冷却期：平仓后 N 小时内不再开新仓
     use_adx: bool = True,
     adx_min: float = 15.0,
+    columns: list = None,  # 返回的列，如 ['close','position','flag','nav']；None 时返回整表
 ) -> tuple:
     """V2 仅做多、全仓、无费率版本。
     入场：趋势过滤(仅多头)，signal_z > z_long，且收盘上破过去 N 小时高点。
@@ -170,9 +175,9 @@ def run_strategy(
     effective_position = z["position"].shift(1).fillna(0)
     z["nav"] = (1 + z["ret"] * effective_position).cumprod()
     z["benchmark"] = z["close"] / z["close"].iloc[0]
-    return z, transaction
+    return (z if columns is None else z[columns]), transaction
 
-def execute_strategy(z: pd.DataFrame) -> tuple:
-    z = preprocess_data(z)
-    data_price, transaction = run_strategy(z)
+def execute_strategy(z: pd.DataFrame, inplace: bool = False, columns: list = None) -> tuple:
+    z = preprocess_data(z, inplace=inplace)
+    data_price, transaction = run_strategy(z, columns=columns)
     return data_price, transaction
\ No newline at end of file
@@ -1,9 +1,55 @@
 import pandas as pd
-import talib as ta
 import numpy as np
 
+import indicator_cache
+from feature_frame import FeatureFrame
+
 # --- 第一部分：数据预处理 (与之前基本一致) ---
 # 这部分主要是计算策略需要用到的各种技术指标，我们保持不变。
+# 每个指标登记为 (依赖的列, 计算函数)，由 FeatureFrame 按需计算；preprocess_data 默认算出全部特征，
+# 传入 features=required_features(...) 时只算 run_strategy 用得到的指标（execute_strategy 即如此）。
+def feature_definitions(
+    ret_periods: int = 24,
+    vol_window: int = 24,
+    atr_period: int = 14,
+    sma_fast: int = 48,
+    sma_slow: int = 200,
+    adx_period: int = 14,
+    breakout_lookback: int = 48,
+) -> dict:
+    """V3 的全部特征：{列名: (依赖的列, compute(z))}"""
+    return {
+        # 基础收益与波动
+        "ret": ((), lambda z: z["close"].pct_change().fillna(0)),
+        "rolling_ret": ((), lambda z: z["close"].pct_change(periods=ret_periods).fillna(0)),
+        "rolling_vol": (("ret",), lambda z: indicator_cache.rolling_std(z, vol_window, "ret").fillna(1e-6)),
+        "signal_strength": (("rolling_ret", "rolling_vol"), lambda z: z["rolling_ret"] / z["rolling_vol"]),
+        # 趋势与动量过滤指标
+        "sma_fast": ((), lambda z: indicator_cache.sma(z, sma_fast)),
+        "sma_slow": ((), lambda z: indicator_cache.sma(z, sma_slow)),
+        "adx": ((), lambda z: indicator_cache.adx(z, adx_period)),
+        # ATR 与突破价
+        "atr": ((), lambda z: indicator_cache.atr(z, atr_period)),
+        "hh": ((), lambda z: z["high"].rolling(breakout_lookback).max().shift(1)),
+    }
+
+
+FEATURES = list(feature_definitions())
+
+
+def required_features(use_adx: bool = True, require_breakout: bool = False,
+                      require_momentum: bool = False) -> list:
+    """run_strategy 在给定开关下会读取的特征列（参数含义同 run_strategy）"""
+    features = ["sma_fast", "sma_slow", "atr"]
+    if use_adx:
+        features.append("adx")
+    if require_momentum:
+        features.append("signal_strength")
+    if require_breakout:
+        features.append("hh")
+    return features
+
+
 def preprocess_data(
     z_: pd.DataFrame,
     ret_periods: int = 24,
@@ -13,29 +59,24 @@ def preprocess_data(
     sma_slow: int = 200,
     adx_period: int = 14,
     breakout_lookback: int = 48, # breakout_lookback 在新版中可选使用
+    inplace: bool = False, # True 时直接在 z_ 上添加列，不复制整表
+    features: list = None, # 需要的特征列；None 时为全部（FEATURES），可传 required_features(...) 只算开关所需的列
 ) -> pd.DataFrame:
     """
     V3 预处理（宽松版）：计算做多所需的趋势/波动/突破特征。
+    默认计算全部特征列；传入 features 时只计算这些列及其依赖。指标参数记录在 attrs['feature_params'] 中，
+    run_strategy 打开其他开关时会用同样的参数补算缺少的列。
     """
-    z = z_.copy()
-    # 基础收益与波动
-    z["ret"] = z["close"].pct_change().fillna(0)
-    z["rolling_ret"] = z["close"].pct_change(periods=ret_periods).fillna(0)
-    z["rolling_vol"] = z["ret"].rolling(window=vol_window).std().fillna(1e-6)
-    z["signal_strength"] = z["rolling_ret"] / z["rolling_vol"]
-    
+    z = z_ if inplace else z_.copy()
+    params = dict(ret_periods=ret_periods, vol_window=vol_window, atr_period=atr_period,
+                  sma_fast=sma_fast, sma_slow=sma_slow, adx_period=adx_period,
+                  breakout_lookback=breakout_lookback)
     # 【修改点】之前的 signal_z 条件过于严格，这里我们直接使用原始的 signal_strength
     # 也可以选择完全不使用这个指标，在run_strategy中控制
-    
-    # 趋势与动量过滤指标 (保持不变)
-    z["sma_fast"] = z["close"].rolling(sma_fast).mean()
-    z["sma_slow"] = z["close"].rolling(sma_slow).mean()
-    z["adx"] = ta.ADX(z["high"], z["low"], z["close"], timeperiod=adx_period)
-    
-    # ATR 与突破价 (保持不变)
-    z["atr"] = ta.ATR(z["high"], z["low"], z["close"], timeperiod=atr_period)
-    z["hh"] = z["high"].rolling(breakout_lookback).max().shift(1)
-    
+    FeatureFrame(z, feature_definitions(**params)).require(
+        FEATURES if features is None else features)
+    z.attrs["feature_params"] = params
+
     # 初始化仓位和标记列
     z["position"] = 0.0
     z["flag"] = 0.0
@@ -58,6 +99,7 @@ def run_strategy(
     require_breakout: bool = False, # 开关：是否要求突破前期高点 (改为False，极大放宽条件)
     require_momentum: bool = False, # 开关：是否要求动能强度 (改为False, 极大放宽条件)
     commission_rate: float = 0.0005, # 新增：手续费率
+    columns: list = None, # 返回的列，如 ['close','position','flag','nav']；None 时返回整表
 ) -> tuple:
     """
     V3 宽松版做多策略：
@@ -66,6 +108,12 @@ def run_strategy(
     出场条件：保持原有的严格风控（ATR止损、追踪止损、时间止损、趋势失效）。
     """
     Buy, Sell = [], []
+
+    # 补算当前开关需要、但 preprocess_data 没有计算的特征
+    needed = required_features(use_adx, require_breakout, require_momentum)
+    missing = [c for c in needed if c not in z.columns]
+    if missing:
+        FeatureFrame(z, feature_definitions(**z.attrs.get("feature_params", {}))).require(missing)
     
     # 确定需要计算指标的最小数据长度
     sma_slow = 200
@@ -174,22 +222,22 @@ def run_strategy(
     z["nav"] = (1 + strategy_ret).cumprod()
     z["benchmark"] = z["close"] / z["close"].iloc[0]
     
-    return z, transaction_v3
+    return (z if columns is None else z[columns]), transaction_v3
 
 
 # --- 第三部分：策略执行入口 ---
-def execute_strategy(z: pd.DataFrame) -> tuple:
-    """新版策略执行入口"""
-    # 1. 数据预处理
-    z_preprocessed = preprocess_data(z)
-    
-    # 2. 运行宽松版的策略逻辑
+def execute_strategy(z: pd.DataFrame, inplace: bool = False, columns: list = None) -> tuple:
+    """新版策略执行入口；inplace/columns 见 preprocess_data 与 run_strategy"""
     # 你可以在这里调整开关来测试不同严格程度的策略
-    data_price, transaction = run_strategy(
-        z_preprocessed,
+    switches = dict(
         require_breakout=False, # 设置为 False 来关闭突破要求
-        require_momentum=False  # 设置为 False 来关闭动能要求
+        require_momentum=False,  # 设置为 False 来关闭动能要求
     )
+    # 1. 数据预处理：只计算这组开关用得到的指标
+    z_preprocessed = preprocess_data(z, inplace=inplace, features=required_features(**switches))
+    
+    # 2. 运行宽松版的策略逻辑
+    data_price, transaction = run_strategy(z_preprocessed, columns=columns, **switches)
     
     return data_price, transaction
 
@@ -1,20 +1,22 @@
 import pandas as pd
-import talib as ta
 
-def preprocess_data(z_: pd.DataFrame) -> pd.DataFrame:
-    """数据预处理：计算收益率、波动率、ATR"""
-    z = z_.copy()
+import indicator_cache
+
+def preprocess_data(z_: pd.DataFrame, inplace: bool = False) -> pd.DataFrame:
+    """数据预处理：计算收益率、波动率、ATR。inplace=True 时直接在 z_ 上添加列，不复制整表"""
+    z = z_ if inplace else z_.copy()
     z['ret'] = z['close'].pct_change().fillna(0)
     # 波动率校正后的收益率，夏普比率的变形
     z['rolling_ret'] = z['close'].pct_change(periods=10).fillna(0)  # 滚动计算过去10个周期的ret
-    z['rolling_vol'] = z['ret'].rolling(window=10).std().fillna(1e-6)  # 滚动计算过去10个周期的波动率
+    z['rolling_vol'] = indicator_cache.rolling_std(z, 10, 'ret').fillna(1e-6)  # 滚动计算过去10个周期的波动率
     z['signal_strength'] = z['rolling_ret'] / z['rolling_vol']
-    z['atr'] = ta.ATR(z['high'], z['low'], z['close'], timeperiod=14)
+    z['atr'] = indicator_cache.atr(z, 14)
     z['position'] = 0.0
     z['flag'] = 0.0
     return z
 
-def run_strategy(z: pd.DataFrame) -> tuple:
+def run_strategy(z: pd.DataFrame, columns: list = None) -> tuple:
+    """columns 指定返回的列（如 ['close', 'position', 'flag', 'nav']），None 时返回整表"""
     Buy, Sell = [], []
     max_price = 0
     atr_entry = 0
@@ -78,10 +80,10 @@ def run_strategy(z: pd.DataFrame) -> tuple:
     z['nav'] = 1 + (z['ret'] * z['position']).cumsum()  # 单利的计算
     z['benchmark'] = z['close'] / z['close'].iloc[0]
 
-    return z, transaction
+    return (z if columns is None else z[columns]), transaction
 
 
-def execute_strategy(z: pd.DataFrame) -> tuple:
-    z = preprocess_data(z)
-    data_price, transaction = run_strategy(z)
+def execute_strategy(z: pd.DataFrame, inplace: bool = False, columns: list = None) -> tuple:
+    z = preprocess_data(z, inplace=inplace)
+    data_price, transaction = run_strategy(z, columns=columns)
     return data_price, transaction
\ No newline at end of file
@@ -0,0 +1,73 @@
+"""
+按成交活跃度采样的K线：成交量 bar、成交额（dollar）bar、成交笔数（tick）bar
+
+时间 bar 在行情剧烈时一根包含的成交远多于平静时；按活跃度采样时每根 bar 的成交量大致相同。
+实现上不做逐行循环：对分钟数据的成交量做累计和，累计值每跨过一个 threshold 的整数倍就结束一根 bar，
+跨过时多出的部分计入下一根（不清零），因此 bar 的编号可以直接由整数除法得到，然后一次 groupby 聚合。
+
+输出与 resample_data 的格式相同（以 bar 第一分钟的 open_time 为索引，列为 RESAMPLED_COLUMNS），
+可以直接传给各版本的 preprocess_data / run_strategy。
+"""
+
+import numpy as np
+import pandas as pd
+
+import crypto_process
+
+
+def _default_threshold(z: pd.DataFrame, measure: np.ndarray) -> float:
+    """未指定 threshold 时，取平均每小时的成交量，使 bar 的数量与 1h 时间 bar 相当"""
+    open_time = pd.to_datetime(z['open_time'])
+    hours = max((open_time.iloc[-1] - open_time.iloc[0]) / pd.Timedelta(hours=1), 1.0)
+    return float(measure.sum()) / hours
+
+
+def activity_bars(z: pd.DataFrame, column: str, threshold: float = None) -> pd.DataFrame:
+    """
+    按某一列的累计值切分 bar。
+
+    Args:
+        z (pd.DataFrame): load_data 格式的分钟数据，按 open_time 升序。
+        column (str): 作为活跃度的列，如 'volume'、'quote_volume'、'count'。
+        threshold (float): 每根 bar 的活跃度；None 时取平均每小时的活跃度。
+
+    Returns:
+        pd.DataFrame: 与 resample_data 格式相同的 bar，attrs 中的 bar_column/bar_threshold
+            记录切分方式。
+    """
+    if column not in z.columns:
+        raise ValueError(f"数据中没有 {column} 列，无法生成 {column} bar")
+    if len(z) == 0:
+        return crypto_process.resample_data(z, '1h')
+    measure = np.nan_to_num(z[column].to_numpy(dtype='float64'))
+    if threshold is None:
+        threshold = _default_threshold(z, measure)
+    if threshold <= 0:
+        raise ValueError("threshold 必须为正数")
+
+    # 每行归入的 bar：该行之前的累计值落在第几个 threshold 区间
+    cum_before = np.cumsum(measure) - measure
+    bar_id = (cum_before // threshold).astype('int64')
+
+    agg = {k: crypto_process.RESAMPLE_AGG[k] for k in crypto_process.RESAMPLED_COLUMNS if k in z.columns}
+    agg['open_time'] = 'first'
+    bars = z.groupby(bar_id, sort=False).agg(agg)
+    bars.index = pd.DatetimeIndex(pd.to_datetime(bars.pop('open_time')), name='open_time')
+    bars.attrs = dict(z.attrs)
+    bars.attrs.update({'bar_column': column, 'bar_threshold': threshold})
+    return bars
+
+
+def volume_bars(z: pd.DataFrame, threshold: float = None) -> pd.DataFrame:
+    """每根 bar 约含 threshold 个币的成交量"""
+    return activity_bars(z, 'volume', threshold)
+
+
+def dollar_bars(z: pd.DataFrame, threshold: float = None) -> pd.DataFrame:
+    """每根 bar 约含 threshold（计价币，如 USDT）的成交额"""
+    return activity_bars(z, 'quote_volume', threshold)
+
+
+def tick_bars(z: pd.DataFrame, threshold: float = None) -> pd.DataFrame:
+    """每根 bar 约含 threshold 笔成交"""
+    return activity_bars(z, 'count', threshold)
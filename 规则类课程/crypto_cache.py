@@ -0,0 +1,184 @@
+"""
+月度K线的列式磁盘缓存
+
+每个月度 zip 解析一次后写成 feather 文件（open_time/close_time 为 int64 纳秒时间戳，
+价格/成交量为 float 列），之后 load_data 直接读取缓存，不再解析 CSV 和时间戳。
+每个缓存文件旁有一个 json 记录源 zip 的 mtime/size，源文件变化时缓存自动失效。
+缓存总大小超过 CACHE_MAX_BYTES 时按最近访问时间（LRU）淘汰。
+
+feather 按 BLOCK_ROWS 行分块写入，json 中同时保存每块 open_time 的最小/最大值和行号
+（zone map），按时间区间读取时只解码与区间相交的块。
+"""
+
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa  # feather 读写依赖 pyarrow
+    import pyarrow.ipc
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# 缓存目录与容量上限
+CACHE_DIR = "D:/workspace/data/crypto/cache"
+CACHE_MAX_BYTES = 4 * 1024 ** 3
+# feather 中每个 record batch（zone map 中每块）的行数
+BLOCK_ROWS = 64 * 1024
+
+
+def _cache_paths(src_path: str) -> tuple:
+    """源 zip 对应的 (feather 路径, 元数据 json 路径)"""
+    stem = Path(src_path).stem
+    return (os.path.join(CACHE_DIR, f"{stem}.feather"),
+            os.path.join(CACHE_DIR, f"{stem}.json"))
+
+
+def _src_signature(src_path: str) -> dict:
+    st = os.stat(src_path)
+    return {'src_mtime_ns': st.st_mtime_ns, 'src_size': st.st_size}
+
+
+def read_meta(src_path: str) -> dict:
+    """读取缓存元数据；缓存不存在或已失效时返回 None"""
+    if not HAS_PYARROW:
+        return None
+    data_path, meta_path = _cache_paths(src_path)
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        signature = _src_signature(src_path)
+    except (OSError, ValueError):
+        return None
+    if not os.path.exists(data_path):
+        return None
+    if any(meta.get(k) != v for k, v in signature.items()):
+        return None
+    return meta
+
+
+def _zone_map(open_time: pd.Series) -> list:
+    """每 BLOCK_ROWS 行一块：[最小 open_time(ms), 最大 open_time(ms), 起始行, 结束行]"""
+    values = open_time.to_numpy().astype('datetime64[ms]').view('int64')
+    blocks = []
+    for row_start in range(0, len(values), BLOCK_ROWS):
+        block = values[row_start:row_start + BLOCK_ROWS]
+        blocks.append([int(block.min()), int(block.max()), row_start, row_start + len(block)])
+    return blocks
+
+
+def _read_blocks(data_path: str, blocks: list, columns: list,
+                 start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+    """按 zone map 只读取与 [start, end) 相交的 record batch；文件结构与索引不符时返回 None"""
+    lo = -np.inf if start is None else start.value // 10 ** 6
+    hi = np.inf if end is None else end.value // 10 ** 6
+    with pa.memory_map(data_path) as source:
+        reader = pa.ipc.open_file(source)
+        if reader.num_record_batches != len(blocks):
+            return None
+        batches = [reader.get_batch(i) for i, (b_min, b_max, _, _) in enumerate(blocks)
+                   if b_max >= lo and b_min < hi]
+        table = pa.Table.from_batches(batches, schema=reader.schema)
+        if columns is not None:
+            table = table.select(columns)
+        return table.to_pandas()
+
+
+def read_month(src_path: str, columns: list = None,
+               start: pd.Timestamp = None, end: pd.Timestamp = None) -> pd.DataFrame:
+    """
+    读取源 zip 对应的缓存。
+
+    Args:
+        src_path (str): 月度 zip 的路径，用于定位缓存并校验 mtime/size。
+        columns (list): 只读取这些列，None 表示全部列。
+        start (pd.Timestamp): 指定时只读取包含 open_time >= start 的块（块内不做行过滤）。
+        end (pd.Timestamp): 指定时只读取包含 open_time < end 的块。
+
+    Returns:
+        pd.DataFrame: 缓存的数据；未命中（不存在/已失效/缺少 pyarrow）时返回 None。
+    """
+    meta = read_meta(src_path)
+    if meta is None:
+        return None
+    data_path, _ = _cache_paths(src_path)
+    z = None
+    if (start is not None or end is not None) and meta.get('blocks'):
+        z = _read_blocks(data_path, meta['blocks'], columns, start, end)
+    if z is None:
+        z = pd.read_feather(data_path, columns=columns)
+    # 刷新访问时间，供 LRU 淘汰使用
+    os.utime(data_path)
+    return z
+
+
+def write_month(src_path: str, z: pd.DataFrame, meta: dict = None) -> None:
+    """把解析好的月度数据写入缓存（先写临时文件再替换，避免读到半个文件），然后按容量淘汰"""
+    if not HAS_PYARROW:
+        return
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    data_path, meta_path = _cache_paths(src_path)
+
+    tmp_path = f"{data_path}.{os.getpid()}.tmp"
+    z.reset_index(drop=True).to_feather(tmp_path, chunksize=BLOCK_ROWS)
+    os.replace(tmp_path, data_path)
+
+    meta = dict(meta or {})
+    meta.update(_src_signature(src_path))
+    if 'open_time' in z.columns:
+        meta['blocks'] = _zone_map(z['open_time'])
+    tmp_path = f"{meta_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, meta_path)
+
+    evict()
+
+
+def evict(max_bytes: int = None) -> int:
+    """
+    按 LRU 淘汰缓存，直到总大小不超过 max_bytes。
+
+    Returns:
+        int: 被淘汰的文件数。
+    """
+    if max_bytes is None:
+        max_bytes = CACHE_MAX_BYTES
+    if not os.path.isdir(CACHE_DIR):
+        return 0
+
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+        if not name.endswith('.feather'):
+            continue
+        path = os.path.join(CACHE_DIR, name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        entries.append((st.st_mtime_ns, st.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        for p in (path, path[:-len('.feather')] + '.json'):
+            try:
+                os.remove(p)
+            except OSError:
+                pass
+        total -= size
+        removed += 1
+    if removed:
+        print(f"缓存超过上限，已淘汰 {removed} 个文件")
+    return removed
+
+
+def clear_cache() -> None:
+    """清空全部缓存（用于测量冷加载耗时）"""
+    evict(max_bytes=-1)
@@ -0,0 +1,9 @@
+"""
+K线数据模块共用的常量
+
+不依赖任何其他模块，crypto_process、crypto_manifest、data_quality 都可以直接导入而不形成循环导入。
+"""
+
+# K线周期对应的相邻两根 open_time 的间隔（毫秒）
+INTERVAL_MS = {'1m': 60_000, '3m': 180_000, '5m': 300_000, '15m': 900_000,
+               '30m': 1_800_000, '1h': 3_600_000, '1d': 86_400_000}
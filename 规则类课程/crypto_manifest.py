@@ -0,0 +1,216 @@
+"""
+数据集清单（manifest）：每个 symbol/interval 一个 json
+
+记录每个月度 zip 的 sha256、行数、首末 open_time 以及缺失分钟区间（gap）。
+load_data 根据清单直接跳过不存在的月份，不再逐个试探读取文件；
+缺失区间随数据一起传给 clean_data，无需扫描数据即可知道哪里有缺口。
+清单按文件的 mtime/size 增量更新，只有新增或变化的文件才会被重新解析。
+下载脚本在写入文件后会更新已有的清单；load_data 读取前也会用 mtime/size 核对区间内清单已有的条目
+（refresh_entries），因此绕过下载脚本改写或删除的文件也不会沿用过期的条目。
+清单中没有的月份不做任何文件系统访问，新文件需由下载脚本或 update_manifest 加入清单。
+"""
+
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+import crypto_process
+from crypto_constants import INTERVAL_MS
+
+
+def _folder(symbol: str, folder: str = None) -> str:
+    """月度 zip 所在目录，默认 DATA_DIR/symbol"""
+    return str(folder) if folder is not None else os.path.join(crypto_process.DATA_DIR, symbol)
+
+
+def manifest_path(symbol: str = 'BTCUSDT', interval: str = '1m', folder: str = None) -> str:
+    return os.path.join(_folder(symbol, folder), f"{symbol}-{interval}-manifest.json")
+
+
+def load_manifest(symbol: str = 'BTCUSDT', interval: str = '1m', folder: str = None) -> dict:
+    """读取清单，不存在时返回 None"""
+    try:
+        with open(manifest_path(symbol, interval, folder), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _save_manifest(manifest: dict, symbol: str, interval: str, folder: str = None) -> None:
+    path = manifest_path(symbol, interval, folder)
+    # 临时文件名带上进程号，多个进程同时保存时不会互相覆盖或抢先改名
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """计算文件的 sha256（与币安 .CHECKSUM 文件中的值格式相同）"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def find_gaps(open_ms: np.ndarray, step_ms: int, lo: int = None, hi: int = None) -> list:
+    """
+    找出缺失的 bar 区间。
+
+    Args:
+        open_ms (np.ndarray): 升序的 open_time（毫秒）。
+        step_ms (int): 相邻 bar 的间隔（毫秒）。
+        lo (int): 期望的第一根 open_time，早于它开始的数据不算缺口。
+        hi (int): 期望的最后一根之后的时刻（不含）。
+
+    Returns:
+        list: [[缺口起点, 缺口终点), ...]，单位毫秒。
+    """
+    gaps = []
+    if len(open_ms) == 0:
+        return [[lo, hi]] if lo is not None and hi is not None and lo < hi else gaps
+    if lo is not None and open_ms[0] > lo:
+        gaps.append([int(lo), int(open_ms[0])])
+    jumps = np.flatnonzero(np.diff(open_ms) > step_ms)
+    gaps.extend([int(open_ms[i]) + step_ms, int(open_ms[i + 1])] for i in jumps)
+    if hi is not None and open_ms[-1] + step_ms < hi:
+        gaps.append([int(open_ms[-1]) + step_ms, int(hi)])
+    return gaps
+
+
+def _scan_file(path: str, month: str, interval: str, use_cache: bool = True) -> dict:
+    """解析一个月度 zip，生成清单条目（use_cache 时读取或顺带写入列式缓存）"""
+    z = crypto_process._read_month(path, use_cache=use_cache, columns=['open_time'])
+    open_ms = z['open_time'].to_numpy().astype('datetime64[ms]').view('int64')
+    month_start = pd.Timestamp(month)
+    month_end = month_start + pd.offsets.MonthBegin(1)
+    st = os.stat(path)
+    return {
+        'file': os.path.basename(path),
+        'sha256': file_sha256(path),
+        'size': st.st_size,
+        'mtime_ns': st.st_mtime_ns,
+        'rows': int(len(open_ms)),
+        'first_open_time': int(open_ms[0]) if len(open_ms) else None,
+        'last_open_time': int(open_ms[-1]) if len(open_ms) else None,
+        'gaps': find_gaps(open_ms, INTERVAL_MS[interval],
+                          month_start.value // 10 ** 6, month_end.value // 10 ** 6),
+    }
+
+
+def _is_stale(entry: dict, st: os.stat_result) -> bool:
+    return entry is None or entry['size'] != st.st_size or entry['mtime_ns'] != st.st_mtime_ns
+
+
+def update_manifest(symbol: str = 'BTCUSDT', interval: str = '1m', folder: str = None,
+                    use_cache: bool = True) -> dict:
+    """
+    增量更新清单：新增或 mtime/size 变化的文件会被重新解析，已删除的文件从清单中移除。
+
+    Args:
+        folder (str): 月度 zip 所在目录，默认 DATA_DIR/symbol；清单保存在同一目录。
+        use_cache (bool): 解析文件时是否使用（并写入）列式磁盘缓存。
+
+    Returns:
+        dict: 更新后的清单，{'symbol', 'interval', 'files': {月份: 条目}}。
+    """
+    folder = _folder(symbol, folder)
+    manifest = load_manifest(symbol, interval, folder) or {'symbol': symbol, 'interval': interval, 'files': {}}
+    pattern = re.compile(rf"^{re.escape(symbol)}-{re.escape(interval)}-(\d{{4}}-\d{{2}})\.zip$")
+
+    present = {}
+    for name in sorted(os.listdir(folder)) if os.path.isdir(folder) else []:
+        match = pattern.match(name)
+        if match:
+            present[match.group(1)] = os.path.join(folder, name)
+
+    files = {}
+    changed = 0
+    for month, path in present.items():
+        entry = manifest['files'].get(month)
+        if _is_stale(entry, os.stat(path)):
+            entry = _scan_file(path, month, interval, use_cache)
+            changed += 1
+        files[month] = entry
+    removed = len(set(manifest['files']) - set(files))
+    manifest['files'] = files
+
+    if changed or removed or not os.path.exists(manifest_path(symbol, interval, folder)):
+        os.makedirs(folder, exist_ok=True)
+        _save_manifest(manifest, symbol, interval, folder)
+    print(f"manifest 已更新: {len(files)} 个文件，新增/变化 {changed} 个，移除 {removed} 个")
+    return manifest
+
+
+def refresh_entries(manifest: dict, months: list, symbol: str = 'BTCUSDT', interval: str = '1m',
+                    folder: str = None, use_cache: bool = True) -> dict:
+    """
+    核对 months 中清单已有的条目与磁盘上的文件：mtime/size 变化的文件重新扫描，
+    已不存在的文件移除条目；有变化时保存清单。清单中没有的月份直接跳过，不访问文件系统；
+    只对已有条目做 stat，不解析未变化的文件。
+
+    Args:
+        use_cache (bool): 重新扫描时是否使用（并写入）列式磁盘缓存，同 load_data。
+
+    Returns:
+        dict: 核对后的清单（原地修改）。
+    """
+    folder = _folder(symbol, folder)
+    files = manifest['files']
+    changed = 0
+    for month in (m for m in months if m in files):
+        path = os.path.join(folder, files[month]['file'])
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            del files[month]
+            changed += 1
+            continue
+        if _is_stale(files[month], st):
+            try:
+                files[month] = _scan_file(path, month, interval, use_cache)
+            except Exception as e:
+                print(f"扫描文件 {path} 时出错: {e}")
+                files.pop(month, None)
+            changed += 1
+    if changed:
+        _save_manifest(manifest, symbol, interval, folder)
+        print(f"manifest 中 {changed} 个月份与磁盘文件不一致，已重新扫描")
+    return manifest
+
+
+def gaps_in_range(manifest: dict, start: pd.Timestamp, end: pd.Timestamp) -> list:
+    """
+    [start, end) 内的缺失区间：清单中记录的缺口，加上清单中不存在的整月。
+
+    Returns:
+        list: [(起点, 终点), ...]，相邻区间已合并，元素为 Timestamp。
+    """
+    lo, hi = start.value // 10 ** 6, end.value // 10 ** 6
+    months = crypto_process._month_range(start.normalize().replace(day=1),
+                                         (end - pd.Timedelta(1)).normalize().replace(day=1))
+    intervals = []
+    for month in months:
+        entry = manifest['files'].get(month)
+        if entry is not None:
+            intervals.extend(entry['gaps'])
+        else:
+            month_start = pd.Timestamp(month)
+            intervals.append([month_start.value // 10 ** 6,
+                              (month_start + pd.offsets.MonthBegin(1)).value // 10 ** 6])
+
+    gaps = []
+    for g_start, g_end in intervals:
+        g_start, g_end = max(g_start, lo), min(g_end, hi)
+        if g_start >= g_end:
+            continue
+        if gaps and gaps[-1][1] == g_start:
+            gaps[-1][1] = g_end
+        else:
+            gaps.append([g_start, g_end])
+    return [(pd.Timestamp(s, unit='ms'), pd.Timestamp(e, unit='ms')) for s, e in gaps]
@@ -0,0 +1,120 @@
+"""
+多币种面板数据：symbol × time × field 的三维数组
+
+每个交易对在独立的子进程中读取并重采样，主进程只接收重采样后的小表，
+再对齐到共同的时间索引。缺失的 bar 不做前向填充，而是保留 NaN 并在 mask 中标记，
+下游可以对所有币种做一次性的向量化计算。
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import crypto_cache
+import crypto_process
+
+# 面板默认包含的字段
+PANEL_FIELDS = ['open', 'high', 'low', 'close', 'volume']
+
+
+class Panel:
+    """
+    多币种面板。
+
+    Attributes:
+        values (np.ndarray): 形状为 (symbol, time, field) 的数组，缺失的 bar 为 NaN。
+        mask (np.ndarray): 形状为 (symbol, time) 的布尔数组，True 表示该 bar 缺失。
+        symbols (list): 交易对列表，对应第 0 维。
+        index (pd.DatetimeIndex): 共同的时间索引，对应第 1 维。
+        fields (list): 字段列表，对应第 2 维。
+    """
+
+    def __init__(self, values: np.ndarray, mask: np.ndarray, symbols: list,
+                 index: pd.DatetimeIndex, fields: list):
+        self.values = values
+        self.mask = mask
+        self.symbols = list(symbols)
+        self.index = index
+        self.fields = list(fields)
+
+    @property
+    def shape(self) -> tuple:
+        return self.values.shape
+
+    def frame(self, symbol: str) -> pd.DataFrame:
+        """单个交易对的 time × field 表（与 values 共享内存，不拷贝）"""
+        s = self.symbols.index(symbol)
+        return pd.DataFrame(self.values[s], index=self.index, columns=self.fields, copy=False)
+
+    def field(self, name: str) -> pd.DataFrame:
+        """单个字段的 time × symbol 表，如 panel.field('close')"""
+        f = self.fields.index(name)
+        return pd.DataFrame(self.values[:, :, f].T, index=self.index, columns=self.symbols)
+
+    def to_frame(self) -> pd.DataFrame:
+        """展开为以 (symbol, open_time) 为索引的长表，不含缺失的 bar"""
+        frames = {s: self.frame(s)[~self.mask[i]] for i, s in enumerate(self.symbols)}
+        return pd.concat(frames, names=['symbol'])
+
+
+def _load_symbol(args: tuple) -> pd.DataFrame:
+    """子进程任务：读取一个交易对并重采样，只返回所需字段"""
+    symbol, start, end, freq, fields, use_cache, origin = args
+    try:
+        z = crypto_process.load_data(start, end, use_cache=use_cache, symbol=symbol)
+    except ValueError:
+        return None
+    return crypto_process.resample_data(z, freq, origin=origin)[fields]
+
+
+def load_panel(symbols: list, start: str, end: str, freq: str, fields: list = None,
+               max_workers: int = None, use_cache: bool = True, dtype: str = 'float64',
+               origin='epoch') -> Panel:
+    """
+    并行读取多个交易对，重采样后对齐为面板。
+
+    Args:
+        symbols (list): 交易对列表，如 ['BTCUSDT', 'ETHUSDT']。
+        start (str): 起始月份或时间戳，同 load_data。
+        end (str): 结束月份或时间戳，同 load_data。
+        freq (str): 重采样频率。
+        fields (list): 面板包含的字段，默认 PANEL_FIELDS。
+        max_workers (int): 进程数，默认使用 CPU 核数。
+        use_cache (bool): 是否使用列式磁盘缓存。
+        dtype (str): 面板数组的类型。
+        origin: 所有交易对共用的 bar 对齐基准，同 resample 的 origin。默认 'epoch'；
+            不能用 'start_day' 等按各自数据起点计算的基准，否则上市日期不同的交易对在
+            '7min'、'90min' 这类不能整除一天的频率下会落在互相错开的 bar 上。
+
+    Returns:
+        Panel: 对齐后的面板；没有任何数据的交易对会被跳过。
+    """
+    fields = list(fields or PANEL_FIELDS)
+    tasks = [(s, start, end, freq, fields, use_cache, origin) for s in symbols]
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=crypto_process._init_worker,
+                             initargs=(crypto_process.DATA_DIR, crypto_cache.CACHE_DIR)) as executor:
+        results = list(executor.map(_load_symbol, tasks))
+
+    loaded = [(s, z) for s, z in zip(symbols, results) if z is not None and len(z)]
+    for s, z in zip(symbols, results):
+        if z is None or len(z) == 0:
+            print(f"{s} 没有任何数据，已跳过")
+    if not loaded:
+        raise ValueError("没有成功读取任何交易对")
+
+    # 所有交易对的 bar 标签取并集，作为共同时间索引
+    index = loaded[0][1].index
+    for _, z in loaded[1:]:
+        index = index.union(z.index)
+
+    values = np.full((len(loaded), len(index), len(fields)), np.nan, dtype=dtype)
+    for i, (_, z) in enumerate(loaded):
+        rows = index.get_indexer(z.index)
+        values[i, rows] = z.to_numpy(dtype=dtype)
+    # 没有成交的空 bar（resample 后价格为 NaN）与未出现的 bar 一样视为缺失
+    mask = np.isnan(values[:, :, fields.index('close')] if 'close' in fields else values[:, :, 0])
+    values[mask] = np.nan
+
+    print(f"面板形状 (symbol, time, field): {values.shape}，缺失 bar 占比: {mask.mean():.2%}")
+    return Panel(values, mask, [s for s, _ in loaded], index, fields)
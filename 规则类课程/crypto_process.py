@@ -4,78 +4,375 @@ resample crypto数据
 
 import pandas as pd
 import numpy as np
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa_csv = None
+
+import crypto_cache
+import crypto_manifest
+import data_quality
+
+# 币安 1 分钟K线的本地存放目录
+DATA_DIR = "D:/workspace/data/crypto/1min"
+
+# 币安K线CSV的标准列名（文件本身没有 header）
+COLUMN_NAMES = ['open_time', 'open', 'high', 'low', 'close', 'volume',
+                'close_time', 'quote_volume', 'count', 'taker_buy_volume',
+                'taker_buy_quote_volume', 'ignore']
+
+# 1 分钟K线重采样时各列的聚合方式，以及 resample_data 输出的列
+RESAMPLE_AGG = {'open_time':'first',
+                'open':'first',
+                'high':'max',
+                'low':'min',
+                'close':'last',
+                'volume':'sum',
+                'close_time':'last',
+                'quote_volume':'sum',
+                'count':'sum',
+                'taker_buy_volume':'sum',
+                'taker_buy_quote_volume':'sum',
+                'ignore':'last'}
+RESAMPLED_COLUMNS = ['open','high','low','close','volume','quote_volume','count',
+                     'taker_buy_volume','taker_buy_quote_volume']
+
+# resample_data(extra=...) 可选的附加聚合，与 OHLCV 在同一次重采样中算出：
+# 逐分钟派生列及其聚合方式（可以逐级组合），以及由 bar 内求和得到的比率（分子, 分母）
+EXTRA_AGG = {'realized_var':'sum',  # bar 内 1 分钟对数收益 log(close/open) 的平方和
+             'max_range':'max',     # bar 内单根分钟K线 high - low 的最大值
+             'minutes':'sum'}       # bar 内实际存在的分钟数
+EXTRA_RATIOS = {'vwap':('quote_volume','volume'),
+                'taker_ratio':('taker_buy_volume','volume')}
+EXTRA_AGGREGATIONS = ['vwap','taker_ratio','realized_var','max_range','minutes']
+
+# 精简读取模式（lean=True）：只保留策略实际用到的 open_time/OHLC/成交量/成交笔数，
+# 并使用紧凑类型。价格保留 float64（float32 无法精确表示到 0.01）；
+# 成交量/成交额用 float32（约 7 位有效数字）；成交笔数用 int32。内存约为完整读取的一半
+LEAN_COLUMNS = ['open_time', 'open', 'high', 'low', 'close', 'volume', 'count']
+LEAN_DTYPES = {'open_time': 'int64',
+               'open': 'float64',
+               'high': 'float64',
+               'low': 'float64',
+               'close': 'float64',
+               'volume': 'float32',
+               'close_time': 'int64',
+               'quote_volume': 'float32',
+               'count': 'int32',
+               'taker_buy_volume': 'float32',
+               'taker_buy_quote_volume': 'float32',
+               'ignore': 'int8'}
+
+# engine='arrow' 时各列的解析类型，以及每个解析块的字节数
+ARROW_SCHEMA = {} if pa_csv is None else {
+    name: pa.int64() if name in ('open_time', 'close_time', 'count', 'ignore') else pa.float64()
+    for name in COLUMN_NAMES}
+ARROW_BLOCK_SIZE = 4 * 1024 * 1024
+
+# 各 epoch 单位换算到纳秒的倍数
+_NS_PER_UNIT = {'s': 10 ** 9, 'ms': 10 ** 6, 'us': 10 ** 3, 'ns': 1}
+# datetime64[ns] 可表示的毫秒范围，超出的按 NaT 处理
+_MS_MIN = pd.Timestamp.min.value // 10 ** 6 + 1
+_MS_MAX = pd.Timestamp.max.value // 10 ** 6
+
+def _epoch_unit(value) -> str:
+    """按数量级判断 epoch 时间戳的单位：ns >= 1e18，us >= 1e15，ms >= 1e12，其余为秒"""
+    if value >= 1e18:
+        return 'ns'
+    if value >= 1e15:
+        return 'us'
+    if value >= 1e12:
+        return 'ms'
+    return 's'
+
 """
-将可能混合单位（秒/毫秒/微秒/纳秒）的 epoch 时间戳统一归一到毫秒，再安全解析为 datetime。
+将可能混合单位（秒/毫秒/微秒/纳秒）的 epoch 时间戳按数量级识别单位后解析为 datetime64[ns]。
 避免按字符串长度判断造成的单位误判，防止 OutOfBoundsDatetime。
+所有路径的精度规则相同：毫秒/微秒/纳秒按原单位的整数值精确换算，不舍入到毫秒
+（微秒 close_time 1735689659999999 解析为 00:00:59.999999）；秒级值保留到毫秒。
+币安现货从 2025 年起由毫秒改为微秒，但同一个文件内单位不变：不含缺失值的整数列只判断一次单位，
+一次向量化乘法换算为纳秒；含缺失值的（可空）整数列、浮点列与 object（字符串）列逐元素识别单位，
+只有 object 列才做可读日期字符串的兜底解析。
 """
 def _parse_epoch_mixed(series: pd.Series) -> pd.Series:
-    s_raw_str = series.astype(str).str.strip()
-    s_num = pd.to_numeric(s_raw_str, errors='coerce')
-
-    # 统一到毫秒级别
-    s_ms = pd.Series(np.nan, index=series.index, dtype='float64')
-    # ns: >= 1e18（1970-01-01 之后，以纳秒为单位）
-    mask_ns = s_num >= 1e18
-    if mask_ns.any():
-        s_ms.loc[mask_ns] = s_num.loc[mask_ns] / 1e6
-    # us: [1e15, 1e18)
-    mask_us = (s_num >= 1e15) & (s_num < 1e18)
-    if mask_us.any():
-        s_ms.loc[mask_us] = s_num.loc[mask_us] / 1e3
-    # ms: [1e12, 1e15)
-    mask_ms = (s_num >= 1e12) & (s_num < 1e15)
-    if mask_ms.any():
-        s_ms.loc[mask_ms] = s_num.loc[mask_ms]
-    # s: valid seconds（< 1e12）
-    mask_s = (s_num.notna()) & (s_num < 1e12)
-    if mask_s.any():
-        s_ms.loc[mask_s] = s_num.loc[mask_s] * 1e3
-
-    # 先按毫秒安全转换；再对非数值或仍为 NaN 的尝试字符串解析
-    # 使用四舍五入并转为 Pandas 可空整数，避免浮点误差
-    s_ms_int = pd.Series(pd.NA, index=series.index, dtype='Int64')
-    s_ms_int.loc[~pd.isna(s_ms)] = np.round(s_ms.loc[~pd.isna(s_ms)]).astype('int64')
-    dt = pd.to_datetime(s_ms_int, unit='ms', errors='coerce')
+    # 快速路径：不含缺失值的整数列，且首尾数量级一致（单位在文件内恒定）
+    if pd.api.types.is_integer_dtype(series.dtype) and len(series) > 0 and not series.hasnans:
+        values = series.to_numpy(dtype='int64')
+        v_min, v_max = values.min(), values.max()
+        unit = _epoch_unit(v_min)
+        if v_min >= 0 and unit == _epoch_unit(v_max) and v_max <= _MS_MAX * 10 ** 6 // _NS_PER_UNIT[unit]:
+            ns = values * _NS_PER_UNIT[unit]
+            return pd.Series(ns.view('datetime64[ns]'), index=series.index)
+
+    is_object = series.dtype == object
+    if is_object:
+        s_raw_str = series.astype(str).str.strip()
+        s_num = pd.to_numeric(s_raw_str, errors='coerce')
+    else:
+        s_num = series
+    num = s_num.to_numpy(dtype='float64', na_value=np.nan)
+
+    # 逐元素按单位取整后换算为纳秒：秒先乘 1e3 取整到毫秒，其余单位直接取整，再乘整数倍数
+    with np.errstate(invalid='ignore'):
+        pre = np.where(num < 1e12, 1e3, 1.0)
+        factor = np.select([num >= 1e18, num >= 1e15], [1, 10 ** 3], default=10 ** 6)
+        scaled = np.round(num * pre)
+        # 越界或非数值的保持 NaT
+        valid = ~np.isnan(scaled)
+        valid[valid] = (scaled[valid] >= _MS_MIN * 10 ** 6 // factor[valid]) & \
+                       (scaled[valid] <= _MS_MAX * 10 ** 6 // factor[valid])
+    ns = np.zeros(len(num), dtype='int64')
+    ns[valid] = scaled[valid].astype('int64') * factor[valid]
+    dt_values = ns.view('datetime64[ns]')
+    dt_values[~valid] = np.datetime64('NaT')
+    dt = pd.Series(dt_values, index=series.index)
 
     # 兜底：若仍有 NaT，尝试当作可读日期字符串解析
-    remain = dt.isna()
-    if remain.any():
-        dt.loc[remain] = pd.to_datetime(s_raw_str.loc[remain], errors='coerce')
+    if is_object:
+        remain = dt.isna()
+        if remain.any():
+            dt.loc[remain] = pd.to_datetime(s_raw_str.loc[remain], errors='coerce')
 
     return dt
 
-def load_data(start_month:str,end_month:str) -> pd.DataFrame:
-    start_month = datetime.strptime(start_month, '%Y-%m')
-    end_month = datetime.strptime(end_month, '%Y-%m')
+def _month_range(start_month: datetime, end_month: datetime) -> list:
+    """生成 [start_month, end_month] 之间的所有月份字符串（'%Y-%m'）"""
+    months = []
+    while start_month <= end_month:
+        months.append(start_month.strftime('%Y-%m'))
+        # 更新到下一个月
+        if start_month.month == 12:
+            start_month = start_month.replace(year=start_month.year + 1, month=1)
+        else:
+            start_month = start_month.replace(month=start_month.month + 1)
+    return months
+
+def _month_file_path(month_str: str, symbol: str = 'BTCUSDT') -> str:
+    return f"{DATA_DIR}/{symbol}/{symbol}-1m-{month_str}.zip"
+
+def _has_header(file_path: str) -> bool:
+    """个别月度 zip 中的 CSV 带 header 行：首字符不是数字即视为 header"""
+    with zipfile.ZipFile(file_path) as zf:
+        with zf.open(zf.namelist()[0]) as f:
+            return not f.read(1).isdigit()
 
+def _read_csv_arrow(file_path: str, columns: list = None) -> pd.DataFrame:
+    """
+    用 pyarrow 的多线程 CSV 解析器直接读取 zip 中的 CSV 成员，按币安已知的列类型解析，
+    转为 pandas 时按列拆分并释放 arrow 内存，避免额外拷贝。
+    """
+    if pa_csv is None:
+        raise ImportError("engine='arrow' 需要安装 pyarrow")
+    skip_rows = 1 if _has_header(file_path) else 0
+    with zipfile.ZipFile(file_path) as zf:
+        with zf.open(zf.namelist()[0]) as f:
+            table = pa_csv.read_csv(
+                f,
+                read_options=pa_csv.ReadOptions(column_names=COLUMN_NAMES, skip_rows=skip_rows,
+                                                use_threads=True, block_size=ARROW_BLOCK_SIZE),
+                convert_options=pa_csv.ConvertOptions(
+                    column_types=ARROW_SCHEMA,
+                    include_columns=None if columns is None else [c for c in COLUMN_NAMES if c in columns]))
+    if columns is not None:
+        table = table.cast(pa.schema([(c, pa.from_numpy_dtype(np.dtype(LEAN_DTYPES[c])))
+                                      for c in table.column_names]))
+    z = table.to_pandas(split_blocks=True, self_destruct=True)
+    del table
+    for col in ('open_time', 'close_time'):
+        if col in z.columns:
+            z[col] = _parse_epoch_mixed(z[col])
+    return z
+
+def _read_csv(file_path: str, columns: list = None, engine: str = 'c') -> pd.DataFrame:
+    """
+    解析月度 zip 中的 CSV；指定 columns 时只解析这些列并使用 LEAN_DTYPES 中的紧凑类型。
+    engine='arrow' 时使用 pyarrow 多线程解析器，否则使用 pandas 的 C 解析器。
+    """
+    if engine == 'arrow':
+        return _read_csv_arrow(file_path, columns)
+    if engine != 'c':
+        raise ValueError(f"未知的 engine: {engine}")
+    dtype = None if columns is None else {c: LEAN_DTYPES[c] for c in columns}
+    # 指定列名，因为CSV文件没有header；个别文件带 header 行，先跳过该行再按指定类型解析
+    z = pd.read_csv(file_path, names=COLUMN_NAMES, header=None,
+                    skiprows=1 if _has_header(file_path) else 0, usecols=columns, dtype=dtype)
+    # 处理时间戳：自动识别 s/ms/us/ns，直接保留为 datetime64[ns]
+    for col in ('open_time', 'close_time'):
+        if col in z.columns:
+            z[col] = _parse_epoch_mixed(z[col])
+    return z
+
+def _read_month(file_path: str, use_cache: bool = True, columns: list = None,
+                start: pd.Timestamp = None, end: pd.Timestamp = None,
+                engine: str = 'c') -> pd.DataFrame:
+    """
+    读取单个月度 zip；启用缓存时优先读取列式缓存，未命中则解析 CSV 后写入缓存。
+    指定 columns 时只返回这些列并转换为 LEAN_DTYPES 中的紧凑类型；
+    缓存始终保存完整的列，因此缓存未命中时仍会解析整个 CSV 一次。
+    指定 start/end 时只返回 start <= open_time < end 的行；命中缓存时借助块索引只读取相交的块。
+    """
+    if not use_cache:
+        z = _read_csv(file_path, columns, engine)
+    else:
+        z = crypto_cache.read_month(file_path, columns=columns, start=start, end=end)
+        if z is not None:
+            print(f"命中缓存: {file_path}")
+        else:
+            z = _read_csv(file_path, engine=engine)
+            crypto_cache.write_month(file_path, z)
+            if columns is not None:
+                z = z[columns]
+
+    if start is not None or end is not None:
+        keep = np.ones(len(z), dtype=bool)
+        if start is not None:
+            keep &= (z['open_time'] >= start).to_numpy()
+        if end is not None:
+            keep &= (z['open_time'] < end).to_numpy()
+        z = z[keep].reset_index(drop=True)
+    if columns is not None:
+        z = z.astype({c: LEAN_DTYPES[c] for c in columns if c not in ('open_time', 'close_time')})
+    return z
+
+def _parse_bound(value: str, is_end: bool) -> pd.Timestamp:
+    """
+    解析 load_data 的起止参数：'%Y-%m' 表示整月（作为结束时表示该月末），
+    其他格式按时间戳解析（作为结束时不含该时刻）。
+    """
+    try:
+        month = pd.Timestamp(datetime.strptime(value, '%Y-%m'))
+    except ValueError:
+        return pd.Timestamp(value)
+    return month + pd.offsets.MonthBegin(1) if is_end else month
+
+def _resolve_columns(columns: list, lean: bool) -> list:
+    """确定需要读取的列（按文件中的列顺序），open_time 总是保留"""
+    if columns is None and not lean:
+        return None
+    if columns is None:
+        columns = LEAN_COLUMNS
+    unknown = set(columns) - set(COLUMN_NAMES)
+    if unknown:
+        raise ValueError(f"未知的列: {sorted(unknown)}")
+    wanted = set(columns) | {'open_time'}
+    return [c for c in COLUMN_NAMES if c in wanted]
+
+def _load_from_store(store, months: list, start: pd.Timestamp, end: pd.Timestamp,
+                     use_cache: bool = True, columns: list = None) -> pd.DataFrame:
+    """把库中缺少的月份追加进库，然后返回 [start, end) 的零拷贝视图"""
+    for month_str in months:
+        if month_str in store.months:
+            continue
+        if store.months and month_str < max(store.months):
+            print(f"月份 {month_str} 早于库中已有数据，无法追加，跳过")
+            continue
+        file_path = _month_file_path(month_str, store.symbol)
+        try:
+            store.append(_read_month(file_path, use_cache=use_cache), month=month_str)
+            print(f"已追加到K线库: {file_path}")
+        except Exception as e:
+            print(f"读取文件 {file_path} 时出错: {e}")
+
+    z = store.view(start, end, columns=columns)
+    if len(z) == 0:
+        raise ValueError("没有成功读取任何数据文件")
+    print(f"K线库视图形状: {z.shape}")
+    return z
+
+def load_data(start_month:str,end_month:str,use_cache:bool=True,store=None,
+              columns:list=None,lean:bool=False,symbol:str='BTCUSDT',
+              use_manifest:bool=True,engine:str='c',validate=False) -> pd.DataFrame:
+    """
+    按月读取币安 1分钟K线（默认 BTCUSDT）。
+
+    Args:
+        start_month (str): 起始月份，格式 '%Y-%m'；也可以是任意时间戳，如 '2024-01-15 08:00'。
+        end_month (str): 结束月份（包含），格式 '%Y-%m'；也可以是任意时间戳（不含该时刻）。
+            非整月的区间只返回 start <= open_time < end 的行，命中缓存时只读取相交的数据块。
+        use_cache (bool): 是否使用列式磁盘缓存（见 crypto_cache）。设为 False 可对比冷/热加载耗时。
+        store (ohlcv_store.OHLCVStore): 若提供，缺失月份先追加进 memmap K线库，
+            然后直接返回库中该区间的零拷贝视图（不含 ignore 列，时间列为 datetime64[ms]）。
+        columns (list): 只读取这些列（open_time 总是保留），并使用 LEAN_DTYPES 中的紧凑类型。
+        lean (bool): 精简模式，等价于 columns=LEAN_COLUMNS：只保留 open_time/OHLC/volume/count，
+            成交量用 float32、成交笔数用 int32，内存约为完整读取的一半。
+        symbol (str): 交易对，对应 DATA_DIR 下的子目录。使用 store 时以 store.symbol 为准。
+        use_manifest (bool): 若该交易对已有清单（见 crypto_manifest），只读取清单中存在的月份，
+            并把区间内的缺失分钟写入返回值的 attrs['gaps']，供 clean_data 使用。
+            区间内与磁盘文件 mtime/size 不一致的条目会先重新扫描（清单中没有的月份不访问磁盘）。
+        engine (str): CSV 解析器。'c' 为 pandas 默认解析器；'arrow' 为 pyarrow 多线程解析器，
+            直接读取 zip 成员，首次（冷缓存）读取在多核机器上快数倍。
+        validate (bool | str): 读取后用 data_quality.validate 做一次向量化质量检查，
+            各项检查的问题行数写入 attrs['quality']；为 'raise' 时除缺失 bar 以外的问题会抛出 ValueError。
+
+    Returns:
+        pd.DataFrame: 合并后的原始数据，open_time/close_time 为 datetime64。
+    """
+    start = _parse_bound(start_month, is_end=False)
+    end = _parse_bound(end_month, is_end=True)
+    if start >= end:
+        raise ValueError(f"起始时间 {start} 不早于结束时间 {end}")
+
+    months = _month_range(start.normalize().replace(day=1),
+                          (end - pd.Timedelta(1)).normalize().replace(day=1))
+    columns = _resolve_columns(columns, lean)
+    if store is not None:
+        symbol = store.symbol
+
+    manifest = crypto_manifest.load_manifest(symbol) if use_manifest else None
+    if manifest is not None:
+        # 清单之后新增、改写或删除的文件以磁盘为准
+        manifest = crypto_manifest.refresh_entries(manifest, months, symbol, use_cache=use_cache)
+        missing = [m for m in months if m not in manifest['files']]
+        if missing:
+            print(f"清单中没有以下月份，跳过: {missing}")
+        months = [m for m in months if m in manifest['files']]
+        if not months:
+            raise ValueError("没有成功读取任何数据文件")
+
+    if store is not None:
+        z = _load_from_store(store, months, start, end, use_cache=use_cache, columns=columns)
+    else:
+        z = _load_months(months, start, end, use_cache, columns, symbol, engine)
+    if manifest is not None:
+        z.attrs['gaps'] = crypto_manifest.gaps_in_range(manifest, start, end)
+        print(f"区间内缺失分钟区间数: {len(z.attrs['gaps'])}")
+    if validate:
+        flags = data_quality.validate(z)
+        z.attrs['quality'] = data_quality.summarize(flags)
+        data_quality.report(z, flags)
+        if validate == 'raise' and np.any(flags & data_quality.ERROR_MASK):
+            raise ValueError(f"数据质量检查未通过: {z.attrs['quality']}")
+    return z
+
+def _load_months(months: list, start: pd.Timestamp, end: pd.Timestamp, use_cache: bool,
+                 columns: list, symbol: str, engine: str = 'c') -> pd.DataFrame:
+    """逐月读取并合并，只对区间首尾月份按时间过滤"""
     zs = []
-    while start_month <= end_month:
-        start_month_str = start_month.strftime('%Y-%m')
-        file_path = f"D:/workspace/data/crypto/1min/BTCUSDT/BTCUSDT-1m-{start_month_str}.zip"
+    for start_month_str in months:
+        file_path = _month_file_path(start_month_str, symbol)
+        # 只有区间的首尾月份需要按时间过滤
+        month_start = pd.Timestamp(start_month_str)
+        month_end = month_start + pd.offsets.MonthBegin(1)
 
         try:
-            # 指定列名，因为CSV文件没有header
-            column_names = ['open_time', 'open', 'high', 'low', 'close', 'volume',
-                          'close_time', 'quote_volume', 'count', 'taker_buy_volume',
-                          'taker_buy_quote_volume', 'ignore']
-            z = pd.read_csv(file_path, names=column_names, header=None)
+            z = _read_month(file_path, use_cache=use_cache, columns=columns,
+                            start=start if start > month_start else None,
+                            end=end if end < month_end else None, engine=engine)
             print(f"成功读取文件: {file_path}")
             print(f"列名: {z.columns.tolist()}")
             print(f"数据形状: {z.shape}")
+            print(f"内存占用: {z.memory_usage(deep=True).sum() / 1024 ** 2:.1f} MB")
 
             zs.append(z)
         except Exception as e:
             print(f"读取文件 {file_path} 时出错: {e}")
             continue
 
-        # 更新到下一个月
-        if start_month.month == 12:
-            start_month = start_month.replace(year=start_month.year + 1, month=1)
-        else:
-            start_month = start_month.replace(month=start_month.month + 1)
-
     if not zs:
         raise ValueError("没有成功读取任何数据文件")
 
@@ -83,58 +380,594 @@ def load_data(start_month:str,end_month:str) -> pd.DataFrame:
     print(f"合并后的数据形状: {z.shape}")
     print(f"合并后的列名: {z.columns.tolist()}")
 
-    # 处理时间戳：自动识别 s/ms/us/ns，直接保留为 datetime64[ns]
-    z['open_time'] = _parse_epoch_mixed(z['open_time'])
-    z['close_time'] = _parse_epoch_mixed(z['close_time'])
-
     return z
 
-def resample_data(z:pd.DataFrame,freq:str) -> pd.DataFrame:
+def iter_load(start_month: str, end_month: str, chunksize: int = 200_000,
+              columns: list = None, lean: bool = False, symbol: str = 'BTCUSDT'):
+    """
+    load_data 的流式版本：逐月、逐块解析 CSV 并 yield，内存只与 chunksize 有关。
+
+    Args:
+        start_month (str): 起始月份，格式 '%Y-%m'。
+        end_month (str): 结束月份（包含），格式 '%Y-%m'。
+        chunksize (int): 每块的行数。
+        columns (list): 同 load_data。
+        lean (bool): 同 load_data。
+        symbol (str): 同 load_data。
+
+    Yields:
+        pd.DataFrame: 按时间顺序的数据块，格式与 load_data 相同。
+    """
+    months = _month_range(datetime.strptime(start_month, '%Y-%m'),
+                          datetime.strptime(end_month, '%Y-%m'))
+    columns = _resolve_columns(columns, lean)
+    dtype = None if columns is None else {c: LEAN_DTYPES[c] for c in columns}
+    for month_str in months:
+        file_path = _month_file_path(month_str, symbol)
+        try:
+            # 带 header 行的文件先跳过该行，否则按 LEAN_DTYPES 解析第一块时会失败
+            reader = pd.read_csv(file_path, names=COLUMN_NAMES, header=None,
+                                 skiprows=1 if _has_header(file_path) else 0,
+                                 usecols=columns, dtype=dtype, chunksize=chunksize)
+        except Exception as e:
+            print(f"读取文件 {file_path} 时出错: {e}")
+            continue
+        with reader:
+            for chunk in reader:
+                for col in ('open_time', 'close_time'):
+                    if col in chunk.columns:
+                        chunk[col] = _parse_epoch_mixed(chunk[col])
+                yield chunk
+
+def _kahan_reduceat(values: np.ndarray, starts: np.ndarray, sizes: np.ndarray) -> np.ndarray:
+    """
+    按组求和（跳过 NaN），逐个组内位置向量化地执行与 pandas groupby sum 相同的 Kahan 补偿求和，
+    结果与 pandas 逐位一致。循环次数为最大组长度（如 1h 为 60），每次处理所有组的同一位置。
+    """
+    total = np.zeros((len(starts),) + values.shape[1:], dtype=values.dtype)
+    comp = np.zeros_like(total)
+    for k in range(int(sizes.max(initial=0))):
+        groups = np.flatnonzero(sizes > k)
+        val = values[starts[groups] + k]
+        s, c = total[groups], comp[groups]
+        y = val - c
+        t = s + y
+        c_new = t - s - y
+        # 与 pandas 一致：inf 导致补偿项为 NaN 时清零；NaN 值不参与求和
+        c_new[np.isnan(c_new)] = 0
+        skip = np.isnan(val)
+        total[groups] = np.where(skip, s, t)
+        comp[groups] = np.where(skip, c, c_new)
+    return total
+
+def _resample_numpy(z: pd.DataFrame, freq: str, origin, agg: dict) -> pd.DataFrame:
+    """
+    resample_data 的 numpy 内核：在 int64 时间戳上用整数除法一次算出每行所属的 bar，
+    再对连续数组用 reduceat 计算 first/max/min/last/sum，结果与 pandas 路径逐位一致。
+    """
+    try:
+        step = pd.Timedelta(pd.tseries.frequencies.to_offset(freq))
+    except (ValueError, TypeError):
+        raise ValueError(f"engine='numpy' 只支持固定时长的 freq，不支持 {freq!r}")
+    open_time = z['open_time']
+    if not pd.api.types.is_datetime64_any_dtype(open_time):
+        open_time = _parse_epoch_mixed(open_time)
+    times = open_time.to_numpy()
+    unit = np.datetime_data(times.dtype)[0]
+    ticks = times.view('int64')
+    columns = list(agg)
+    if len(ticks) == 0:
+        return _resample_columns(z, freq, origin, 'pandas', agg)
+
+    # 与 pandas 相同：乱序输入先按时间稳定排序
+    order = None
+    if np.any(ticks[1:] < ticks[:-1]):
+        order = np.argsort(ticks, kind='stable')
+        ticks = ticks[order]
+
+    per_unit = _NS_PER_UNIT[unit]
+    step_ticks = step.value // per_unit
+    if origin == 'start_day':
+        origin_ticks = pd.Timestamp(ticks[0], unit=unit).normalize().value // per_unit
+    elif origin == 'epoch':
+        origin_ticks = 0
+    else:
+        origin_ticks = pd.Timestamp(origin).value // per_unit
+    bucket = (ticks - origin_ticks) // step_ticks
+    first_bucket = bucket[0]
+    nbuckets = int(bucket[-1] - first_bucket + 1)
+
+    # 非空 bar 的起始行、行数，以及它们在完整输出中的位置
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    sizes = np.diff(np.r_[starts, len(bucket)])
+    slots = bucket[starts] - first_bucket
+    ends = starts + sizes - 1
+    positions = np.arange(len(bucket))
+
+    data = {}
+    for name in columns:
+        values = z[name].to_numpy()
+        if order is not None:
+            values = values[order]
+        how = agg[name]
+        if how == 'sum':
+            out = np.zeros(nbuckets, dtype=values.dtype)
+            if values.dtype.kind == 'f':
+                out[slots] = _kahan_reduceat(values, starts, sizes)
+            else:
+                out[slots] = np.add.reduceat(values.astype('int64'), starts).astype(values.dtype)
+            data[name] = out
+            continue
+
+        out = np.full(nbuckets, np.nan, dtype=values.dtype if values.dtype.kind == 'f' else 'float64')
+        valid = ~np.isnan(values) if values.dtype.kind == 'f' else np.ones(len(values), dtype=bool)
+        if how == 'max':
+            out[slots] = np.fmax.reduceat(values, starts)
+        elif how == 'min':
+            out[slots] = np.fmin.reduceat(values, starts)
+        elif how == 'first':
+            # 每组第一个非 NaN 的行；整组为 NaN 时保持 NaN
+            idx = np.minimum.reduceat(np.where(valid, positions, len(values)), starts)
+            found = idx <= ends
+            out[slots[found]] = values[idx[found]]
+        elif how == 'last':
+            idx = np.maximum.reduceat(np.where(valid, positions, -1), starts)
+            found = idx >= starts
+            out[slots[found]] = values[idx[found]]
+        data[name] = out
+
+    index = pd.date_range(pd.Timestamp((first_bucket * step_ticks + origin_ticks), unit=unit),
+                          periods=nbuckets, freq=freq, unit=unit, name='open_time')
+    return pd.DataFrame(data, index=index, columns=columns, copy=False)
+
+def _resample_columns(z: pd.DataFrame, freq: str, origin, engine: str, agg: dict) -> pd.DataFrame:
+    """按 agg（列名 -> 聚合方式）重采样，返回以 open_time 为索引、列顺序与 agg 相同的表"""
+    if engine == 'numpy':
+        return _resample_numpy(z, freq, origin, agg)
+    if engine != 'pandas':
+        raise ValueError(f"未知的 engine: {engine}")
+    if pd.api.types.is_datetime64_any_dtype(z['open_time']):
+        return z.resample(freq, on='open_time', origin=origin).agg(agg)
     z_ = z.copy()
     z_.index = pd.to_datetime(z_.open_time)
-    z_rspled = z_.resample(freq).agg({'open_time':'first', 
-                              'open':'first', 
-                              'high':'max', 
-                              'low':'min', 
-                              'close':'last', 
-                              'volume':'sum', 
-                              'close_time':'last',
-                              'quote_volume':'sum', 
-                              'count':'sum', 
-                              'taker_buy_volume':'sum', 
-                              'taker_buy_quote_volume':'sum',
-                              'ignore':'last'})
-    z = z_rspled[['open','high','low','close','volume','quote_volume','count','taker_buy_volume','taker_buy_quote_volume']]
+    z_rspled = z_.resample(freq, origin=origin).agg(agg)
+    z_rspled.index.name = 'open_time'
+    return z_rspled
+
+def _minute_features(z: pd.DataFrame, names: list) -> pd.DataFrame:
+    """EXTRA_AGG 中各附加聚合所需的逐分钟派生列（只依赖同一行，月度/流式拼接时不受边界影响）"""
+    data = {'open_time': z['open_time']}
+    if 'realized_var' in names:
+        data['realized_var'] = np.log(z['close'] / z['open']) ** 2
+    if 'max_range' in names:
+        data['max_range'] = z['high'] - z['low']
+    if 'minutes' in names:
+        data['minutes'] = z['close'].notna().astype('int64')
+    return pd.DataFrame(data)
+
+def _add_ratios(bars: pd.DataFrame, names: list) -> None:
+    """由 bar 内求和计算 EXTRA_RATIOS 中的比率（分母为 0 的空 bar 为 NaN）"""
+    for name in names:
+        if name in EXTRA_RATIOS:
+            num, den = EXTRA_RATIOS[name]
+            bars[name] = bars[num] / bars[den].where(bars[den] > 0)
+
+def resample_data(z:pd.DataFrame,freq:str,origin='start_day',engine:str='pandas',
+                  extra:list=None) -> pd.DataFrame:
+    """
+    按 freq 重采样。open_time 已是 datetime 列时直接按该列分组，不复制输入表；
+    只有整数时间戳的旧数据才会先复制一份并转换索引。
+    engine='numpy' 时使用 reduceat 内核（只支持固定时长的 freq），结果与默认的 pandas 路径逐位一致。
+
+    extra 为 EXTRA_AGGREGATIONS 中的附加聚合，与 OHLCV 一起算出并追加在输出列之后：
+    vwap（quote_volume / volume）、taker_ratio（taker_buy_volume / volume）、
+    realized_var（bar 内 1 分钟 log(close/open) 的平方和）、max_range（单根分钟 high - low 的最大值）、
+    minutes（bar 内的分钟数）。
+    """
+    extra = list(extra or [])
+    unknown = [name for name in extra if name not in EXTRA_AGGREGATIONS]
+    if unknown:
+        raise ValueError(f"未知的附加聚合: {unknown}")
+    for name in extra:
+        missing = [c for c in EXTRA_RATIOS.get(name, ()) if c not in z.columns]
+        if missing:
+            raise ValueError(f"{name} 需要 {missing} 列")
+
+    agg = {k: RESAMPLE_AGG[k] for k in RESAMPLED_COLUMNS if k in z.columns}
+    z_rspled = _resample_columns(z, freq, origin, engine, agg)
+    feature_agg = {k: v for k, v in EXTRA_AGG.items() if k in extra}
+    if feature_agg:
+        features = _resample_columns(_minute_features(z, extra), freq, origin, engine, feature_agg)
+        z_rspled = pd.concat([z_rspled, features], axis=1)
+    _add_ratios(z_rspled, extra)
+    if extra:
+        z_rspled = z_rspled[list(agg) + extra]
+    z_rspled.attrs = dict(z.attrs)
+    return z_rspled
+
+def resample_pyramid(z: pd.DataFrame, freqs: list, extra: list = None) -> dict:
+    """
+    一次构建多个频率的重采样结果：最细的频率由分钟数据重采样，之后每一级都由上一级聚合得到
+    （first/max/min/last/sum 都可以逐级组合），因此构建全部层级的开销与只构建最细一级相当。
+
+    Args:
+        z (pd.DataFrame): load_data 格式的分钟数据。
+        freqs (list): 频率列表，如 ['5min', '15min', '1h', '4h', '1d']；每个频率都必须能整除一天，
+            且按从细到粗排序后，每一级都是上一级的整数倍。
+        extra (list): 同 resample_data，附加聚合在每一级都会输出。
+
+    Returns:
+        dict: {freq: 重采样结果}，按从细到粗排序，各层级与 resample_data(z, freq) 一致
+            （成交量类字段逐级求和，与直接求和只有浮点舍入上的差异）。
+    """
+    steps = {}
+    for freq in freqs:
+        if not _freq_divides_day(freq):
+            raise ValueError(f"freq={freq!r} 不能整除一天，无法逐级聚合")
+        steps[freq] = pd.Timedelta(pd.tseries.frequencies.to_offset(freq))
+    ordered = sorted(steps, key=steps.get)
+    for fine, coarse in zip(ordered, ordered[1:]):
+        if steps[coarse] % steps[fine] != pd.Timedelta(0):
+            raise ValueError(f"{coarse} 不是 {fine} 的整数倍")
+
+    levels = {}
+    prev = None
+    for freq in ordered:
+        if prev is None:
+            level = resample_data(z, freq, extra=extra)
+        else:
+            agg = {k: RESAMPLE_AGG.get(k, EXTRA_AGG.get(k)) for k in prev.columns
+                   if k in RESAMPLE_AGG or k in EXTRA_AGG}
+            level = prev.resample(freq, origin='start_day').agg(agg)
+            # vwap 等比率不能逐级聚合，由本级的求和重新计算
+            _add_ratios(level, list(prev.columns))
+            level = level[list(prev.columns)]
+            level.attrs = dict(prev.attrs)
+        levels[freq] = prev = level
+    return levels
+
+def _freq_divides_day(freq: str) -> bool:
+    """freq 是否为固定时长且能整除一天（此时每个月的边界一定是 bar 的边界）"""
+    try:
+        td = pd.Timedelta(pd.tseries.frequencies.to_offset(freq))
+    except (ValueError, TypeError):
+        return False
+    day = pd.Timedelta(days=1)
+    return pd.Timedelta(0) < td <= day and day % td == pd.Timedelta(0)
+
+def _fill_empty_buckets(z: pd.DataFrame, freq: str) -> pd.DataFrame:
+    """
+    合并重复的 bar 标签并补齐缺失的 bar，使结果与对整段数据做一次 resample 一致：
+    空 bar 的价格为 NaN，成交量类字段为 0。
+    """
+    if z.index.has_duplicates:
+        agg = {k: v for k, v in {**RESAMPLE_AGG, **EXTRA_AGG}.items() if k in z.columns}
+        columns = list(z.columns)
+        z = z.groupby(level=0, sort=True).agg(agg)
+        _add_ratios(z, columns)
+        z = z[columns]
+    full_index = pd.date_range(z.index[0], z.index[-1], freq=freq,
+                               name=z.index.name, unit=z.index.unit)
+    if len(full_index) == len(z):
+        return z
+    dtypes = z.dtypes
+    z = z.reindex(full_index)
+    sum_cols = [k for k, v in {**RESAMPLE_AGG, **EXTRA_AGG}.items() if v == 'sum' and k in z.columns]
+    z[sum_cols] = z[sum_cols].fillna(0)
+    return z.astype({k: dtypes[k] for k in sum_cols})
+
+def _init_worker(data_dir: str, cache_dir: str) -> None:
+    """子进程初始化：同步数据目录与缓存目录（spawn 方式启动时不会继承运行时修改）"""
+    global DATA_DIR
+    DATA_DIR = data_dir
+    crypto_cache.CACHE_DIR = cache_dir
+
+def _load_resample_month(args: tuple) -> pd.DataFrame:
+    """子进程任务：读取一个月的 1 分钟数据并立即重采样，只把重采样后的小表返回主进程"""
+    month_str, freq, use_cache, symbol = args
+    try:
+        z = load_data(month_str, month_str, use_cache=use_cache, symbol=symbol)
+    except ValueError:
+        return None
+    return resample_data(z, freq)
+
+def load_resampled(start_month: str, end_month: str, freq: str,
+                   max_workers: int = None, use_cache: bool = True,
+                   symbol: str = 'BTCUSDT') -> pd.DataFrame:
+    """
+    按月并行读取并重采样（map-reduce），结果等价于 resample_data(load_data(...), freq)。
+    每个子进程只持有一个月的分钟数据，峰值内存约为 "单月分钟数据 × 进程数"。
+
+    Args:
+        start_month (str): 起始月份，格式 '%Y-%m'。
+        end_month (str): 结束月份（包含），格式 '%Y-%m'。
+        freq (str): 重采样频率。需为能整除一天的固定周期（如 '5min'、'1h'、'1d'），
+            否则退化为串行的 resample_data(load_data(...))。
+        max_workers (int): 进程数，默认使用 CPU 核数。
+        use_cache (bool): 是否使用列式磁盘缓存。
+        symbol (str): 交易对。
+
+    Returns:
+        pd.DataFrame: 重采样后的数据。
+    """
+    if not _freq_divides_day(freq):
+        print(f"freq={freq} 不能整除一天，改为串行读取后重采样")
+        return resample_data(load_data(start_month, end_month, use_cache=use_cache,
+                                       symbol=symbol), freq)
+
+    months = _month_range(datetime.strptime(start_month, '%Y-%m'),
+                          datetime.strptime(end_month, '%Y-%m'))
+    manifest = crypto_manifest.load_manifest(symbol)
+    if manifest is not None:
+        # 在主进程中统一核对清单，子进程读到的清单已是最新的，不会并发重写清单文件
+        crypto_manifest.refresh_entries(manifest, months, symbol, use_cache=use_cache)
+    tasks = [(m, freq, use_cache, symbol) for m in months]
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(DATA_DIR, crypto_cache.CACHE_DIR)) as executor:
+        zs = [z for z in executor.map(_load_resample_month, tasks) if z is not None]
+
+    if not zs:
+        raise ValueError("没有成功读取任何数据文件")
+
+    # 按月份顺序拼接，修正月份衔接处的 bar
+    z = _fill_empty_buckets(pd.concat(zs, axis=0), freq)
+    print(f"并行重采样后的数据形状: {z.shape}")
     return z
 
 
-def clean_data(z: pd.DataFrame) -> pd.DataFrame:
+def iter_resample(chunks, freq: str):
+    """
+    流式重采样：把跨块的未完成 bar 所对应的原始行带到下一块，只输出已完成的 bar。
+    与 iter_load 配合使用时，全部输出拼接后与 resample_data(load_data(...), freq) 相同，
+    内存上限为 "一块 + 一个 bar" 的分钟数据，与历史长度无关。
+    要求各块按 open_time 升序排列。
+
+    Args:
+        chunks: 可迭代的 1 分钟数据块，如 iter_load(...) 的返回值。
+        freq (str): 重采样频率。
+
+    Yields:
+        pd.DataFrame: 已完成的 bar。
+    """
+    carry = None
+    origin = None
+    for chunk in chunks:
+        if len(chunk) == 0:
+            continue
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        if origin is None:
+            # 与 resample_data 默认的 origin='start_day' 一致：第一行所在日期的零点
+            origin = pd.Timestamp(chunk['open_time'].iloc[0]).normalize()
+
+        z = resample_data(chunk, freq, origin=origin)
+        # 最后一个 bar 可能还没有收齐，把它的原始行留到下一块
+        carry = chunk[pd.to_datetime(chunk['open_time']) >= z.index[-1]]
+        if len(z) > 1:
+            yield z.iloc[:-1]
+
+    if carry is not None:
+        yield resample_data(carry, freq, origin=origin)
+
+class IncrementalResampler:
+    """
+    增量重采样：以已有的重采样结果为起点，之后每次只处理新到的 1 分钟数据。
+
+    最近 lookback 个 bar（含当前未完成的 bar）的原始分钟行保留在内存中，新数据落在这些 bar 内时
+    （包括迟到或重复的分钟）合并原始行后重新聚合这几个 bar；更早的 bar 视为已完成，不再改动，
+    落在其中的迟到分钟被丢弃并计入 late_dropped。每次 update 的开销只与新数据和 lookback 有关。
+    freq 必须能整除一天，此时 bar 的边界与 resample_data 默认的 origin='start_day' 一致。
+
+    Args:
+        freq (str): 重采样频率，如 '1h'。
+        bars (pd.DataFrame): 已有的重采样结果（resample_data 的输出），全部视为已完成。
+        minutes (pd.DataFrame): bars 最后若干个 bar 对应的原始分钟数据；提供时这些 bar 仍可被更新。
+        lookback (int): 保留原始分钟行、允许更新的 bar 个数。
+    """
+
+    def __init__(self, freq: str, bars: pd.DataFrame = None, minutes: pd.DataFrame = None,
+                 lookback: int = 2):
+        if not _freq_divides_day(freq):
+            raise ValueError(f"freq={freq!r} 不能整除一天，无法增量重采样")
+        if lookback < 1:
+            raise ValueError("lookback 至少为 1")
+        self.freq = freq
+        self.lookback = lookback
+        self._step = pd.Timedelta(pd.tseries.frequencies.to_offset(freq))
+        self._closed = []
+        self._closed_end = None  # 最后一个已完成 bar 的标签
+        self._minutes = None
+        self._window = None
+        self._bars = None
+        self.late_dropped = 0
+        self.duplicates = 0
+
+        if minutes is not None and len(minutes):
+            self._minutes = self._normalize(minutes)
+            first_open = self._labels(self._minutes).iloc[0]
+            if bars is not None:
+                bars = bars[bars.index < first_open]
+        if bars is not None and len(bars):
+            self._closed.append(bars)
+            self._closed_end = bars.index[-1]
+        if self._minutes is not None:
+            self._window = resample_data(self._minutes, freq)
+
+    @staticmethod
+    def _normalize(z: pd.DataFrame) -> pd.DataFrame:
+        """open_time 统一为 datetime，按时间排序，同一分钟保留最后一条"""
+        if not pd.api.types.is_datetime64_any_dtype(z['open_time']):
+            z = z.assign(open_time=_parse_epoch_mixed(z['open_time']))
+        z = z.sort_values('open_time', kind='stable')
+        return z.drop_duplicates('open_time', keep='last').reset_index(drop=True)
+
+    def _labels(self, z: pd.DataFrame) -> pd.Series:
+        return z['open_time'].dt.floor(self.freq)
+
+    def _empty(self) -> pd.DataFrame:
+        """没有 bar 变化时的返回值：与已有 bar 同列的空表"""
+        if self._window is not None:
+            return self._window.iloc[:0]
+        if self._closed:
+            return self._closed[-1].iloc[:0]
+        return pd.DataFrame()
+
+    def update(self, z: pd.DataFrame) -> pd.DataFrame:
+        """
+        加入新的 1 分钟数据。
+
+        Args:
+            z (pd.DataFrame): load_data 格式的分钟数据，可以乱序、重复或迟到。
+
+        Returns:
+            pd.DataFrame: 本次新增或被更新的 bar。
+        """
+        if len(z) == 0:
+            return self._empty()
+        new = self._normalize(z)
+
+        # 早于窗口的分钟落在已完成的 bar 中，无法再合并
+        if self._minutes is not None:
+            window_start = self._labels(self._minutes).iloc[0]
+        elif self._closed_end is not None:
+            window_start = self._closed_end + self._step
+        else:
+            window_start = None
+        if window_start is not None:
+            late = self._labels(new) < window_start
+            self.late_dropped += int(late.sum())
+            new = new[~late]
+        if len(new) == 0:
+            return self._empty()
+
+        if self._minutes is not None:
+            self.duplicates += int(new['open_time'].isin(self._minutes['open_time']).sum())
+            new = self._normalize(pd.concat([self._minutes, new], ignore_index=True))
+
+        # 只保留最近 lookback 个 bar 的原始行，更早的 bar 定稿
+        labels = self._labels(new)
+        keep_from = labels.iloc[-1] - (self.lookback - 1) * self._step
+        done = new[labels < keep_from]
+        if len(done):
+            closed = resample_data(done, self.freq)
+            self._closed.append(closed)
+            self._closed_end = closed.index[-1]
+        self._minutes = new[labels >= keep_from].reset_index(drop=True)
+        self._window = resample_data(self._minutes, self.freq)
+        self._bars = None
+
+        return pd.concat([closed, self._window]) if len(done) else self._window
+
+    @property
+    def bars(self) -> pd.DataFrame:
+        """全部 bar（已完成 + 窗口内），与对全部分钟数据做一次 resample_data 的结果一致"""
+        if self._bars is None:
+            parts = list(self._closed) + ([self._window] if self._window is not None else [])
+            if not parts:
+                return pd.DataFrame()
+            # 把已完成的部分合并成一块，避免下次访问重复拼接
+            if len(self._closed) > 1:
+                self._closed = [pd.concat(self._closed)]
+            self._bars = _fill_empty_buckets(pd.concat(parts), self.freq)
+        return self._bars
+
+def _gap_runs_from_mask(index: pd.DatetimeIndex, missing: np.ndarray) -> list:
+    """连续缺失 bar 的区间 [(起始标签, 结束标签(不含)), ...]，一次向量化扫描得到"""
+    edges = np.diff(np.r_[0, missing.astype('int8'), 0])
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    step = index[-1] - index[-2] if len(index) > 1 else pd.Timedelta(0)
+    labels = index.append(pd.Index([index[-1] + step])) if len(index) else index
+    return [(labels[a], labels[b]) for a, b in zip(starts, ends)]
+
+def _gap_runs_from_gaps(index: pd.DatetimeIndex, gaps: list) -> list:
+    """由 load_data 给出的缺失分钟区间推出完全没有分钟数据的 bar 区间，无需扫描数据"""
+    step = pd.Timedelta(index.freq)
+    runs = []
+    for g_start, g_end in gaps:
+        # 只有整个 bar 都落在缺失区间内，这个 bar 才是空的
+        first = max(pd.Timestamp(g_start).ceil(step), index[0])
+        end = min(pd.Timestamp(g_end).floor(step), index[-1] + step)
+        if first < end:
+            runs.append((first, end))
+    return runs
+
+def _gap_index_key(z: pd.DataFrame) -> tuple:
+    """attrs['gap_index'] 对应的数据范围：(行数, 第一个标签, 最后一个标签)"""
+    return (len(z), z.index[0], z.index[-1]) if len(z) else (0,)
+
+def gap_index(z: pd.DataFrame) -> list:
     """
-    使用前向填充（forward-fill）方法清洗数据中的NaN值。
-    注意：如果数据开头的行存在NaN，'ffill'无法填充它们。
-    
+    重采样结果中连续缺失（close 为 NaN）的 bar 区间。
+
+    依次使用：attrs['gap_index']（之前算过的结果）、attrs['gaps']（load_data 从清单得到的缺失分钟），
+    都没有时才扫描 close 列。pandas 会把 attrs 带到切片、copy、concat 等派生出的表上，
+    因此 attrs['gap_index'] 只在 attrs['gap_index_key'] 记录的行数与首末标签和 z 一致时才使用。
+
+    Returns:
+        list: [(起始标签, 结束标签(不含)), ...]。
+    """
+    runs = z.attrs.get('gap_index')
+    if runs is not None and z.attrs.get('gap_index_key') == _gap_index_key(z):
+        return runs
+    if len(z) == 0:
+        return []
+    gaps = z.attrs.get('gaps')
+    if gaps is not None and isinstance(z.index, pd.DatetimeIndex) and z.index.freq is not None:
+        return _gap_runs_from_gaps(z.index, gaps)
+    column = 'close' if 'close' in z.columns else z.columns[0]
+    return _gap_runs_from_mask(z.index, z[column].isna().to_numpy())
+
+def clean_data(z: pd.DataFrame, limit: int = None, gap_column: str = 'gap') -> pd.DataFrame:
+    """
+    按缺失区间清洗重采样后的数据。
+
+    连续缺失的 bar 不超过 limit 根时前向填充；更长的缺口（如交易所长时间停机）保留 NaN，
+    不再被填成一段水平的假K线污染 ATR/ADX，并在 gap_column 列中标记为 True，策略可据此跳过。
+    缺失区间保存在返回值的 attrs['gap_index'] 中，之后再次调用时不必重新扫描。
+    数据开头的缺失无法前向填充，总是保留并标记。
+
     Args:
-        z (pd.DataFrame): 输入的DataFrame，可能包含NaN值。
+        z (pd.DataFrame): resample_data 的输出。
+        limit (int): 允许前向填充的最长连续缺失 bar 数；None 表示全部填充（原有行为）。
+        gap_column (str): limit 不为 None 时添加的缺口标记列名。
 
     Returns:
-        pd.DataFrame: 已填充NaN值后的DataFrame。
+        pd.DataFrame: 清洗后的数据；limit 为 None 且任何列都没有 NaN 时直接返回 z。
+            limit 不为 None 时总是包含 gap_column 列（没有缺口时全为 False）。
     """
-    print("\n开始数据清洗：对NaN值进行前向填充...")
-    nan_before = z.isnull().sum().sum()
-    if nan_before == 0:
-        print("数据中无NaN值，无需清洗。")
+    print("\n开始数据清洗：按缺失区间前向填充...")
+    runs = gap_index(z)
+    # 缺失 bar 由 close 判断，其他列（如 vwap）在有成交的 bar 上也可能为 NaN，同样需要填充
+    has_nan = bool(z.isna().to_numpy().any())
+    if not runs and not has_nan and limit is None:
+        print("数据中无 NaN 值，无需清洗。")
         return z
-    
-    z_cleaned = z.fillna(method='ffill')
-    nan_after = z_cleaned.isnull().sum().sum()
-    
-    print(f"清洗前NaN值总数: {nan_before}")
-    print(f"清洗后NaN值总数: {nan_after}")
-    if nan_after > 0:
-        print(f"警告：清洗后仍有 {nan_after} 个NaN值。这可能是因为数据开头的行包含NaN。")
-        
-    return z_cleaned
 
+    z_cleaned = z.ffill() if has_nan else z.copy()
+    unfilled = np.zeros(len(z), dtype=bool)
+    if runs:
+        lengths = [z.index.searchsorted(end) - z.index.searchsorted(start) for start, end in runs]
+        print(f"共 {len(runs)} 段缺失 bar，最长 {max(lengths)} 根")
+        for (start, end), length in zip(runs, lengths):
+            lo, hi = z.index.searchsorted(start), z.index.searchsorted(end)
+            if lo == 0 or (limit is not None and length > limit):
+                unfilled[lo:hi] = True
+        if unfilled.any():
+            z_cleaned.loc[unfilled] = z.loc[unfilled]
+            if limit is not None:
+                print(f"超过 {limit} 根的缺口及数据开头的缺口保留为 NaN，共 {int(unfilled.sum())} 根")
+            else:
+                print(f"数据开头的缺口无法前向填充，保留为 NaN，共 {int(unfilled.sum())} 根")
+    else:
+        print("区间内无缺失 bar，只填充其他列的 NaN 值。" if has_nan else "区间内无缺失 bar，只添加缺口标记列。")
+    if limit is not None:
+        z_cleaned[gap_column] = unfilled
+
+    z_cleaned.attrs = dict(z.attrs)
+    z_cleaned.attrs['gap_index'] = runs
+    z_cleaned.attrs['gap_index_key'] = _gap_index_key(z_cleaned)
+    return z_cleaned
 
 if __name__ == '__main__':
     start_month = '2023-01'
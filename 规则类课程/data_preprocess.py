@@ -3,23 +3,24 @@
 """
 
 import pandas as pd
-import talib as ta
 
-def preprocess_data(z_: pd.DataFrame) -> pd.DataFrame:
-    """数据预处理：计算收益率、波动率、ATR"""
-    z = z_.copy()
+import indicator_cache
+
+def preprocess_data(z_: pd.DataFrame, inplace: bool = False) -> pd.DataFrame:
+    """数据预处理：计算收益率、波动率、ATR。inplace=True 时直接在 z_ 上添加列，不复制整表"""
+    z = z_ if inplace else z_.copy()
     z['ret'] = z['close'].pct_change().fillna(0)
     # 波动率校正后的收益率，夏普比率的变形
     z['rolling_ret'] = z['close'].pct_change(periods=10).fillna(0)  # 滚动计算过去10个周期的ret
-    z['rolling_vol'] = z['ret'].rolling(window=10).std().fillna(1e-6)  # 滚动计算过去10个周期的波动率
+    z['rolling_vol'] = indicator_cache.rolling_std(z, 10, 'ret').fillna(1e-6)  # 滚动计算过去10个周期的波动率
     z['signal_strength'] = z['rolling_ret'] / z['rolling_vol']
-    z['atr'] = ta.ATR(z['high'], z['low'], z['close'], timeperiod=14)
+    z['atr'] = indicator_cache.atr(z, 14)
     z['position'] = 0.0
     z['flag'] = 0.0
     return z
 
-def run_strategy(z: pd.DataFrame) -> tuple:
-    """运行交易策略"""
+def run_strategy(z: pd.DataFrame, columns: list = None) -> tuple:
+    """运行交易策略；columns 指定 data_price 中保留的列，默认 close/position/flag"""
     Buy, Sell = [], []
     max_price = 0
     atr_entry = 0
@@ -84,7 +85,7 @@ def run_strategy(z: pd.DataFrame) -> tuple:
     transaction = transaction.sort_values('date').reset_index(drop=True)
     
     # 构建价格数据
-    data_price = z[['close', 'position', 'flag']].copy()
+    data_price = z[columns or ['close', 'position', 'flag']].copy()
     
     return data_price, transaction
 
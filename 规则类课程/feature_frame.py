@@ -0,0 +1,52 @@
+"""
+惰性特征表
+
+策略的 preprocess_data 以前一次算出所有指标列，而 run_strategy 在不同开关下只读其中一部分。
+FeatureFrame 把每个特征登记为 {列名: (依赖的列, 计算函数)}，某列在第一次被访问时才计算，
+计算前先递归地算好它依赖的特征；没有登记的列（open/high/low/close 等）直接取原表。
+策略只需声明需要哪些列（require），用不到的特征完全不计算。
+"""
+
+import pandas as pd
+
+
+class FeatureFrame:
+    """
+    在 DataFrame 上按需计算特征列。
+
+    Attributes:
+        frame (pd.DataFrame): 底层数据，计算出的特征直接作为列加入。
+        definitions (dict): {列名: (依赖列名的 tuple, compute(frame) -> Series)}。
+        computed (list): 已计算的特征，按计算顺序排列。
+    """
+
+    def __init__(self, frame: pd.DataFrame, definitions: dict):
+        self.frame = frame
+        self.definitions = definitions
+        self.computed = []
+
+    def __getitem__(self, name: str) -> pd.Series:
+        self._resolve(name, ())
+        return self.frame[name]
+
+    def _resolve(self, name: str, stack: tuple) -> None:
+        # 登记过的特征在本 FeatureFrame 中总是重新计算一次，不沿用原表中可能过期的同名列
+        if name in self.computed:
+            return
+        if name not in self.definitions:
+            if name not in self.frame.columns:
+                raise KeyError(f"数据中没有 {name} 列，也没有它的计算定义")
+            return
+        if name in stack:
+            raise ValueError(f"特征依赖存在环: {' -> '.join(stack + (name,))}")
+        deps, compute = self.definitions[name]
+        for dep in deps:
+            self._resolve(dep, stack + (name,))
+        self.frame[name] = compute(self.frame)
+        self.computed.append(name)
+
+    def require(self, names: list) -> pd.DataFrame:
+        """计算 names 及其依赖，返回底层 DataFrame"""
+        for name in names:
+            self._resolve(name, ())
+        return self.frame
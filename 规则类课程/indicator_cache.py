@@ -0,0 +1,155 @@
+"""
+技术指标缓存
+
+各版本的 preprocess_data 会在同一份重采样数据上重复计算 ATR、ADX、均线和滚动标准差。
+这里按 (数据指纹, 指标名, 参数) 缓存计算结果：
+- 数据指纹只对指标实际用到的列和索引做哈希（blake2b），比计算 ADX 快一个数量级，
+  数据有任何一个值变化指纹就不同，不会误用旧结果；
+- 内存层为容量 MAX_ENTRIES 的 LRU；
+- 指定 cache_dir 时另有磁盘层，每个结果保存为一个 .npy 文件，重启 notebook 内核后仍可复用。
+缓存的是与数据等长的 float64 数组，返回时包装为以原数据索引为索引的 Series。
+"""
+
+import hashlib
+import os
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import talib as ta
+
+# 内存中最多保留的指标个数
+MAX_ENTRIES = 128
+
+
+def fingerprint(z: pd.DataFrame, columns: list) -> str:
+    """z 的索引与 columns 各列内容的哈希"""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr((len(z), list(columns))).encode())
+    index = z.index.to_numpy()
+    if index.dtype != object:
+        h.update(np.ascontiguousarray(index).view('uint8'))
+    else:
+        h.update(repr(index.tolist()).encode())
+    for name in columns:
+        h.update(np.ascontiguousarray(z[name].to_numpy(dtype='float64')).view('uint8'))
+    return h.hexdigest()
+
+
+class IndicatorCache:
+    """
+    两级指标缓存。
+
+    Attributes:
+        max_entries (int): 内存层容量，超出时淘汰最久未使用的结果。
+        cache_dir (str): 磁盘层目录，None 时只用内存层。
+        hits (int): 内存层命中次数。
+        disk_hits (int): 内存层未命中、磁盘层命中的次数。
+        misses (int): 两层都未命中、实际计算的次数。
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, cache_dir: str = None):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _disk_path(self, key: tuple) -> str:
+        digest = hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest()
+        return os.path.join(self.cache_dir, f"{key[1]}_{digest}.npy")
+
+    def _remember(self, key: tuple, values: np.ndarray) -> None:
+        values.flags.writeable = False  # 结果被多次返回，防止调用方原地修改
+        self._entries[key] = values
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, z: pd.DataFrame, name: str, params: tuple, columns: list, compute) -> pd.Series:
+        """
+        取缓存的指标，不存在时计算并缓存。
+
+        Args:
+            z (pd.DataFrame): 数据。
+            name (str): 指标名，如 'atr'。
+            params (tuple): 指标参数，与 name 一起区分结果。
+            columns (list): 指标用到的列，只有这些列参与指纹。
+            compute (callable): compute(z) 返回与 z 等长的 Series 或数组。
+
+        Returns:
+            pd.Series: 以 z.index 为索引、name 为名的指标。
+        """
+        key = (fingerprint(z, columns), name, tuple(params))
+        values = self._entries.get(key)
+        if values is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+        else:
+            path = self._disk_path(key) if self.cache_dir else None
+            if path and os.path.exists(path):
+                self.disk_hits += 1
+                values = np.load(path)
+            else:
+                self.misses += 1
+                values = np.asarray(compute(z), dtype='float64').copy()
+                if path:
+                    os.makedirs(self.cache_dir, exist_ok=True)
+                    tmp_path = f"{path}.{os.getpid()}.tmp"
+                    with open(tmp_path, 'wb') as f:
+                        np.save(f, values)
+                    os.replace(tmp_path, path)
+            self._remember(key, values)
+        return pd.Series(values, index=z.index, name=name)
+
+    def stats(self) -> dict:
+        """命中/未命中计数与当前内存层大小"""
+        return {'hits': self.hits, 'disk_hits': self.disk_hits, 'misses': self.misses,
+                'entries': len(self._entries)}
+
+    def clear(self) -> None:
+        """清空内存层并重置计数（不删除磁盘文件）"""
+        self._entries.clear()
+        self.hits = self.disk_hits = self.misses = 0
+
+
+# 各策略共用的默认缓存；需要磁盘层时设置 default_cache.cache_dir
+default_cache = IndicatorCache()
+
+
+def stats() -> dict:
+    """默认缓存的命中/未命中计数"""
+    return default_cache.stats()
+
+
+def sma(z: pd.DataFrame, period: int, column: str = 'close', cache: IndicatorCache = None) -> pd.Series:
+    """简单移动平均，同 z[column].rolling(period).mean()"""
+    return (cache or default_cache).get(
+        z, 'sma', (column, period), [column], lambda d: d[column].rolling(period).mean())
+
+
+def ema(z: pd.DataFrame, period: int, column: str = 'close', cache: IndicatorCache = None) -> pd.Series:
+    """指数移动平均，同 ta.MA(z[column], timeperiod=period, matype=1)"""
+    return (cache or default_cache).get(
+        z, 'ema', (column, period), [column], lambda d: ta.MA(d[column], timeperiod=period, matype=1))
+
+
+def rolling_std(z: pd.DataFrame, window: int, column: str = 'ret', cache: IndicatorCache = None) -> pd.Series:
+    """滚动标准差，同 z[column].rolling(window).std()"""
+    return (cache or default_cache).get(
+        z, 'rolling_std', (column, window), [column], lambda d: d[column].rolling(window).std())
+
+
+def atr(z: pd.DataFrame, period: int = 14, cache: IndicatorCache = None) -> pd.Series:
+    """平均真实波幅，同 ta.ATR"""
+    return (cache or default_cache).get(
+        z, 'atr', (period,), ['high', 'low', 'close'],
+        lambda d: ta.ATR(d['high'], d['low'], d['close'], timeperiod=period))
+
+
+def adx(z: pd.DataFrame, period: int = 14, cache: IndicatorCache = None) -> pd.Series:
+    """平均趋向指数，同 ta.ADX"""
+    return (cache or default_cache).get(
+        z, 'adx', (period,), ['high', 'low', 'close'],
+        lambda d: ta.ADX(d['high'], d['low'], d['close'], timeperiod=period))
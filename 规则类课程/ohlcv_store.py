@@ -0,0 +1,182 @@
+"""
+按 symbol/interval 存放的只追加（append-only）二进制K线库
+
+每一列是一个定长的二进制文件（int64 时间戳、float64 价格/成交量、int64 成交笔数），
+通过 np.memmap 映射到内存；header.json 记录列类型、行数和已写入的月份。
+读取某个时间区间时只在 open_time 上做二分查找，然后返回指向映射文件的切片视图，
+不解析、不拷贝，页面在真正被访问时才会读入内存。追加一个月就是在每个列文件末尾追加字节。
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# 库的根目录：每个 symbol/interval 一个子目录
+STORE_DIR = "D:/workspace/data/crypto/store"
+
+# 列名与磁盘上的定长类型；时间列以毫秒时间戳保存
+STORE_COLUMNS = {'open_time': 'int64',
+                 'open': 'float64',
+                 'high': 'float64',
+                 'low': 'float64',
+                 'close': 'float64',
+                 'volume': 'float64',
+                 'close_time': 'int64',
+                 'quote_volume': 'float64',
+                 'count': 'int64',
+                 'taker_buy_volume': 'float64',
+                 'taker_buy_quote_volume': 'float64'}
+TIME_COLUMNS = ('open_time', 'close_time')
+
+
+def _to_epoch_ms(series: pd.Series) -> np.ndarray:
+    """datetime 列或整数时间戳列统一转换为 int64 毫秒"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.to_numpy().astype('datetime64[ms]').view('int64')
+    return series.to_numpy(dtype='int64')
+
+
+class OHLCVStore:
+    """
+    单个 symbol/interval 的 memmap K线库。
+
+    Args:
+        symbol (str): 交易对，如 'BTCUSDT'。
+        interval (str): K线周期，如 '1m'。
+        root (str): 库的根目录，默认为 STORE_DIR。
+    """
+
+    def __init__(self, symbol: str = 'BTCUSDT', interval: str = '1m', root: str = None):
+        self.symbol = symbol
+        self.interval = interval
+        self.path = os.path.join(root or STORE_DIR, f"{symbol}-{interval}")
+        self._header_path = os.path.join(self.path, 'header.json')
+        self._maps = {}
+        self.header = self._read_header()
+
+    def _read_header(self) -> dict:
+        try:
+            with open(self._header_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'columns': STORE_COLUMNS, 'nrows': 0, 'months': []}
+
+    def _write_header(self) -> None:
+        tmp_path = f"{self._header_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.header, f)
+        os.replace(tmp_path, self._header_path)
+
+    def _column_path(self, name: str) -> str:
+        return os.path.join(self.path, f"{name}.bin")
+
+    def __len__(self) -> int:
+        return self.header['nrows']
+
+    @property
+    def months(self) -> list:
+        """已写入的月份（'%Y-%m'）"""
+        return list(self.header['months'])
+
+    def last_open_time(self) -> int:
+        """最后一行的 open_time（毫秒），库为空时返回 None"""
+        if len(self) == 0:
+            return None
+        return int(self.column('open_time')[-1])
+
+    def column(self, name: str) -> np.ndarray:
+        """返回某一列的只读 memmap（长度为 header 中记录的行数）"""
+        nrows = len(self)
+        if nrows == 0:
+            return np.empty(0, dtype=self.header['columns'][name])
+        cached = self._maps.get(name)
+        if cached is None or len(cached) != nrows:
+            cached = np.memmap(self._column_path(name), dtype=self.header['columns'][name],
+                               mode='r', shape=(nrows,))
+            self._maps[name] = cached
+        return cached
+
+    def _truncate_to_header(self) -> None:
+        """
+        把各列文件截断到 header 记录的行数。
+
+        上次追加若在写完部分列之后、写 header 之前中断，列文件末尾会留下没有被 header 计入的字节；
+        不截掉的话，本次追加的数据会接在这些字节后面，各列因此错位。
+
+        Raises:
+            ValueError: 某个列文件比 header 记录的行数短（库已损坏）。
+        """
+        for name, dtype in self.header['columns'].items():
+            path = self._column_path(name)
+            expected = self.header['nrows'] * np.dtype(dtype).itemsize
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            if size < expected:
+                raise ValueError(f"列文件 {path} 只有 {size} 字节，少于 header 记录的 {expected} 字节")
+            if size > expected:
+                self._maps.pop(name, None)  # Windows 下不能截断仍被映射的文件
+                os.truncate(path, expected)
+                print(f"截掉 {name} 列上次中断追加留下的 {size - expected} 字节")
+
+    def append(self, z: pd.DataFrame, month: str = None) -> None:
+        """
+        在库末尾追加数据。
+
+        Args:
+            z (pd.DataFrame): load_data 格式的数据，须按 open_time 升序且晚于库中已有数据。
+            month (str): 这批数据所属的月份，记录到 header 中。
+
+        Raises:
+            ValueError: 数据早于或等于库中最后一行。
+        """
+        if len(z) == 0:
+            return
+        open_ms = _to_epoch_ms(z['open_time'])
+        last = self.last_open_time()
+        if np.any(np.diff(open_ms) <= 0) or (last is not None and open_ms[0] <= last):
+            raise ValueError("追加的数据必须按 open_time 严格递增且晚于库中已有数据")
+
+        os.makedirs(self.path, exist_ok=True)
+        self._truncate_to_header()
+        for name, dtype in self.header['columns'].items():
+            if name in TIME_COLUMNS:
+                arr = _to_epoch_ms(z[name])
+            else:
+                arr = z[name].to_numpy(dtype=dtype)
+            with open(self._column_path(name), 'ab') as f:
+                f.write(np.ascontiguousarray(arr, dtype=dtype).tobytes())
+
+        # header 最后写入：中途失败时多出的尾部字节不会被读到，下次追加前由 _truncate_to_header 截掉
+        self.header['nrows'] += len(z)
+        if month is not None and month not in self.header['months']:
+            self.header['months'].append(month)
+        self._write_header()
+
+    def view(self, start=None, end=None, columns: list = None) -> pd.DataFrame:
+        """
+        返回 [start, end) 区间的零拷贝视图。
+
+        Args:
+            start: 起始时间（含），可为字符串/Timestamp，None 表示从头开始。
+            end: 结束时间（不含），None 表示到末尾。
+            columns (list): 只返回这些列（库中没有的列会被忽略），None 表示全部列。
+
+        Returns:
+            pd.DataFrame: 各列直接引用 memmap，open_time/close_time 为 datetime64[ms]。
+        """
+        open_time = self.column('open_time')
+        lo, hi = 0, len(open_time)
+        if start is not None:
+            lo = int(np.searchsorted(open_time, pd.Timestamp(start).value // 10 ** 6, side='left'))
+        if end is not None:
+            hi = int(np.searchsorted(open_time, pd.Timestamp(end).value // 10 ** 6, side='left'))
+        hi = max(lo, hi)
+
+        data = {}
+        for name in self.header['columns']:
+            if columns is not None and name not in columns:
+                continue
+            arr = self.column(name)[lo:hi]
+            data[name] = arr.view('datetime64[ms]') if name in TIME_COLUMNS else arr
+        return pd.DataFrame(data, copy=False)
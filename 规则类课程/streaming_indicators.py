@@ -0,0 +1,306 @@
+"""
+逐 bar 增量计算的技术指标
+
+preprocess_data 用 talib / pandas rolling 在整段历史上计算指标，追加一根 bar 也要全部重算（O(n)），
+无法用于实盘。这里的每个指标对象只保存计算下一个值所需的状态，update 一次为 O(1)：
+- SMA：窗口 deque + Kahan 补偿的滑动和，与 pandas rolling().mean() 一致（窗口内全部相同时精确等于该值）；
+- EMA：以前 period 个值的均值为种子，同 ta.MA(matype=1)；
+- RollingStd：滑动窗口 Welford，与 pandas rolling().std() 一致（窗口内全部相同时精确为 0）；
+- ATR / ADX：Wilder 平滑，按 TA-Lib 的递推顺序实现，结果与 ta.ATR / ta.ADX 一致；
+- RollingMax：单调递减 deque，均摊 O(1)；
+- ZScore：V2 的 signal_z，(x - 滚动均值) / 滚动标准差，标准差为 0 时按 1 处理。
+预热期（数据不足一个窗口）输出 NaN，与批量计算相同；输入假定不含 NaN。
+
+snapshot() 返回可 pickle 的状态副本，restore() 回到该状态，可用于保存/恢复实盘进度。
+StrategyFeatures 组合以上指标，逐 bar 输出与 V2/V3 preprocess_data 相同的特征列。
+"""
+
+import copy
+import math
+from collections import deque
+
+NAN = float('nan')
+
+
+class Indicator:
+    """增量指标基类：value 为最近一次 update 的输出"""
+
+    value = NAN
+
+    def snapshot(self) -> dict:
+        """当前状态的深拷贝"""
+        return copy.deepcopy(self.__dict__)
+
+    def restore(self, state: dict) -> None:
+        """恢复到 snapshot() 返回的状态"""
+        self.__dict__.update(copy.deepcopy(state))
+
+
+class SMA(Indicator):
+    """简单移动平均，同 pd.Series.rolling(period).mean()"""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.window = deque()
+        self.total = 0.0
+        self.comp = 0.0  # Kahan 补偿项，避免长时间运行后滑动和漂移
+        self.same_run = 0  # 末尾连续相同值的个数；覆盖整个窗口时均值精确等于该值（同 pandas）
+        self.value = NAN
+
+    def _add(self, x: float) -> None:
+        y = x - self.comp
+        t = self.total + y
+        self.comp = (t - self.total) - y
+        self.total = t
+
+    def update(self, x: float) -> float:
+        self.same_run = self.same_run + 1 if self.window and self.window[-1] == x else 1
+        self.window.append(x)
+        self._add(x)
+        if len(self.window) > self.period:
+            self._add(-self.window.popleft())
+        if len(self.window) < self.period:
+            self.value = NAN
+        elif self.same_run >= self.period:
+            self.value = x
+        else:
+            self.value = self.total / self.period
+        return self.value
+
+
+class EMA(Indicator):
+    """指数移动平均，同 ta.MA(x, timeperiod=period, matype=1)：以前 period 个值的均值为种子"""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.k = 2.0 / (period + 1)
+        self.count = 0
+        self.seed = 0.0
+        self.value = NAN
+
+    def update(self, x: float) -> float:
+        self.count += 1
+        if self.count < self.period:
+            self.seed += x
+        elif self.count == self.period:
+            self.value = (self.seed + x) / self.period
+        else:
+            self.value = (x - self.value) * self.k + self.value
+        return self.value
+
+
+class RollingStd(Indicator):
+    """滑动窗口标准差（Welford 增删），同 pd.Series.rolling(window).std(ddof=ddof)"""
+
+    def __init__(self, window: int, ddof: int = 1):
+        self.window_size = window
+        self.ddof = ddof
+        self.window = deque()
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.same_run = 0  # 末尾连续相同值的个数；覆盖整个窗口时标准差精确为 0（同 pandas）
+        self.value = NAN
+
+    def update(self, x: float) -> float:
+        self.same_run = self.same_run + 1 if self.window and self.window[-1] == x else 1
+        self.window.append(x)
+        n = len(self.window)
+        delta = x - self.mean
+        self.mean += delta / n
+        self.m2 += delta * (x - self.mean)
+        if n > self.window_size:
+            old = self.window.popleft()
+            n -= 1
+            delta = old - self.mean
+            self.mean -= delta / n
+            self.m2 -= delta * (old - self.mean)
+        if n < self.window_size or n <= self.ddof:
+            self.value = NAN
+        elif self.same_run >= n:
+            self.value = 0.0
+        else:
+            self.value = math.sqrt(max(self.m2, 0.0) / (n - self.ddof))
+        return self.value
+
+
+class RollingMax(Indicator):
+    """滑动窗口最大值（单调递减 deque），同 pd.Series.rolling(window).max()"""
+
+    def __init__(self, window: int):
+        self.window = window
+        self.count = 0
+        self.candidates = deque()  # (序号, 值)，值单调递减
+        self.value = NAN
+
+    def update(self, x: float) -> float:
+        while self.candidates and self.candidates[-1][1] <= x:
+            self.candidates.pop()
+        self.candidates.append((self.count, x))
+        if self.candidates[0][0] <= self.count - self.window:
+            self.candidates.popleft()
+        self.count += 1
+        self.value = self.candidates[0][1] if self.count >= self.window else NAN
+        return self.value
+
+
+class ZScore(Indicator):
+    """滚动 z-score，同 V2 的 signal_z：((x - mean) / std.replace(0, 1)).fillna(0)"""
+
+    def __init__(self, window: int):
+        self.mean = SMA(window)
+        self.std = RollingStd(window)
+        self.value = 0.0
+
+    def update(self, x: float) -> float:
+        mean, std = self.mean.update(x), self.std.update(x)
+        z = (x - mean) / (1.0 if std == 0 else std)
+        self.value = 0.0 if math.isnan(z) else z
+        return self.value
+
+
+def _true_range(high: float, low: float, prev_close: float) -> float:
+    return max(high - low, abs(high - prev_close), abs(low - prev_close))
+
+
+def _is_zero(x: float) -> bool:
+    """TA-Lib 的 TA_IS_ZERO"""
+    return -1e-8 < x < 1e-8
+
+
+class ATR(Indicator):
+    """Wilder ATR，同 ta.ATR：前 period 个真实波幅的均值为种子，之后 (prev * (period - 1) + tr) / period"""
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.count = 0
+        self.prev_close = NAN
+        self.tr_sum = 0.0
+        self.value = NAN
+
+    def update(self, high: float, low: float, close: float) -> float:
+        if self.count > 0:
+            tr = _true_range(high, low, self.prev_close)
+            if self.count < self.period:
+                self.tr_sum += tr
+            elif self.count == self.period:
+                self.value = (self.tr_sum + tr) / self.period
+            else:
+                self.value = (self.value * (self.period - 1) + tr) / self.period
+        self.prev_close = close
+        self.count += 1
+        return self.value
+
+
+class ADX(Indicator):
+    """Wilder ADX，同 ta.ADX：第 2 * period 根 bar 起有值，递推顺序与 TA-Lib 相同"""
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.count = 0
+        self.prev_high = self.prev_low = self.prev_close = NAN
+        self.plus_dm = self.minus_dm = self.tr = 0.0
+        self.dx_sum = 0.0
+        self.value = NAN
+
+    def _dx(self) -> float:
+        """当前的 DX；TR 或 +DI 与 -DI 之和为 0 时返回 None"""
+        if _is_zero(self.tr):
+            return None
+        minus_di = 100.0 * self.minus_dm / self.tr
+        plus_di = 100.0 * self.plus_dm / self.tr
+        total = minus_di + plus_di
+        if _is_zero(total):
+            return None
+        return 100.0 * abs(minus_di - plus_di) / total
+
+    def update(self, high: float, low: float, close: float) -> float:
+        n, period = self.count, self.period
+        if n > 0:
+            diff_p = high - self.prev_high
+            diff_m = self.prev_low - low
+            tr = _true_range(high, low, self.prev_close)
+            if n >= period:
+                # 第 period 根起为 Wilder 平滑，之前为简单累加
+                self.minus_dm -= self.minus_dm / period
+                self.plus_dm -= self.plus_dm / period
+                self.tr -= self.tr / period
+            if diff_m > 0 and diff_p < diff_m:
+                self.minus_dm += diff_m
+            elif diff_p > 0 and diff_p > diff_m:
+                self.plus_dm += diff_p
+            self.tr += tr
+
+            if period <= n < 2 * period:
+                dx = self._dx()
+                if dx is not None:
+                    self.dx_sum += dx
+                if n == 2 * period - 1:
+                    self.value = self.dx_sum / period
+            elif n >= 2 * period:
+                dx = self._dx()
+                if dx is not None:
+                    self.value = (self.value * (period - 1) + dx) / period
+        self.prev_high, self.prev_low, self.prev_close = high, low, close
+        self.count += 1
+        return self.value
+
+
+class PctChange(Indicator):
+    """n 期收益率，同 pd.Series.pct_change(periods).fillna(0)"""
+
+    def __init__(self, periods: int = 1):
+        self.history = deque(maxlen=periods + 1)
+        self.value = 0.0
+
+    def update(self, x: float) -> float:
+        self.history.append(x)
+        full = len(self.history) == self.history.maxlen
+        self.value = x / self.history[0] - 1 if full else 0.0
+        return self.value
+
+
+class StrategyFeatures(Indicator):
+    """
+    逐 bar 计算 V2/V3 preprocess_data 的特征列，参数含义与 preprocess_data 相同。
+
+    update(bar) 接收含 high/low/close 的 dict 或 Series，返回本根 bar 的特征 dict：
+    ret, rolling_ret, rolling_vol, signal_strength, signal_z, sma_fast, sma_slow, adx, atr, hh。
+    """
+
+    def __init__(self, ret_periods: int = 24, vol_window: int = 24, atr_period: int = 14,
+                 sma_fast: int = 48, sma_slow: int = 200, adx_period: int = 14,
+                 breakout_lookback: int = 48, z_window: int = 240):
+        self.ret = PctChange(1)
+        self.rolling_ret = PctChange(ret_periods)
+        self.rolling_vol = RollingStd(vol_window)
+        self.signal_z = ZScore(z_window)
+        self.sma_fast = SMA(sma_fast)
+        self.sma_slow = SMA(sma_slow)
+        self.adx = ADX(adx_period)
+        self.atr = ATR(atr_period)
+        self.high_max = RollingMax(breakout_lookback)
+        self.value = {}
+
+    def update(self, bar) -> dict:
+        high, low, close = float(bar['high']), float(bar['low']), float(bar['close'])
+        ret = self.ret.update(close)
+        rolling_ret = self.rolling_ret.update(close)
+        rolling_vol = self.rolling_vol.update(ret)
+        if math.isnan(rolling_vol):
+            rolling_vol = 1e-6
+        signal_strength = rolling_ret / rolling_vol
+        hh = self.high_max.value  # 不含本根 bar 的前 N 根最高价，即 shift(1)
+        self.high_max.update(high)
+        self.value = {
+            'ret': ret,
+            'rolling_ret': rolling_ret,
+            'rolling_vol': rolling_vol,
+            'signal_strength': signal_strength,
+            'signal_z': self.signal_z.update(signal_strength),
+            'sma_fast': self.sma_fast.update(close),
+            'sma_slow': self.sma_slow.update(close),
+            'adx': self.adx.update(high, low, close),
+            'atr': self.atr.update(high, low, close),
+            'hh': hh,
+        }
+        return self.value
@@ -0,0 +1,202 @@
+"""
+紧凑的整数K线表示（tick 编码）
+
+价格有固定的最小变动单位（BTCUSDT 为 0.01），成交量有固定的精度，
+因此可以无损地保存为整数：
+- 价格先换算为 tick 数，close 相对上一根 close 做差分，open/high/low 保存为相对上一根 close 的偏移，
+  分钟级的差分通常很小，可以用 int32 甚至 int16 保存；
+- 成交量按 10 ** 小数位数 缩放为整数，按取值范围选择最小的整数类型；
+  重采样后的成交量是浮点累加的结果，通常不在十进制网格上，这类列原样保存为 float64；
+- open_time 保存为相对上一根的毫秒差分。
+编码时会逐列校验还原结果与原始 float 完全一致，解码是纯向量化的 cumsum 与除法。
+"""
+
+import numpy as np
+import pandas as pd
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+VOLUME_COLUMNS = ['volume', 'quote_volume', 'taker_buy_volume', 'taker_buy_quote_volume']
+# 寻找无损缩放倍数时尝试的最大小数位数
+MAX_DECIMALS = 8
+
+
+def _smallest_int_dtype(values: np.ndarray) -> np.dtype:
+    """能容纳 values 的最小有符号整数类型"""
+    if len(values) == 0:
+        return np.dtype('int8')
+    lo, hi = values.min(), values.max()
+    for dtype in ('int8', 'int16', 'int32'):
+        info = np.iinfo(dtype)
+        if info.min <= lo and hi <= info.max:
+            return np.dtype(dtype)
+    return np.dtype('int64')
+
+
+def _find_scale(values: np.ndarray, max_decimals: int = MAX_DECIMALS) -> int:
+    """最小的 10 ** k，使 rint(values * 10 ** k) / 10 ** k 与 values 完全相等；找不到时返回 None"""
+    for k in range(max_decimals + 1):
+        scale = 10 ** k
+        scaled = np.rint(values * scale)
+        if np.abs(scaled).max(initial=0) >= 2 ** 63:
+            return None
+        if np.array_equal(scaled / scale, values):
+            return scale
+    return None
+
+
+class TickBars:
+    """
+    tick 编码后的K线。
+
+    Attributes:
+        time_anchor (int): 第一根 bar 的 open_time（毫秒）。
+        time_delta (np.ndarray): open_time 相对上一根的差分（毫秒），第一个元素为 0。
+        price_scale (int): 价格的缩放倍数（1 / tick_size），如 100 表示 tick 为 0.01。
+        anchor (int): 第一根有效 bar 的 close（tick 数），差分的起点。
+        prices (dict): {'close': 相对上一根 close 的差分, 'open'/'high'/'low': 相对上一根 close 的偏移}。
+        volumes (dict): {列名: (缩放后的整数数组, 缩放倍数)}；无法无损缩放的列为 (float64 数组, None)。
+        extra (dict): 其余列（如 count）: {列名: (按最小整数类型保存的数组, 原始 dtype)}。
+        valid (np.ndarray): 布尔数组，False 表示价格为 NaN 的空 bar；全部有效时为 None。
+        time_as_index (bool): 原表是否以 open_time 为索引（resample_data 的输出）。
+    """
+
+    def __init__(self, time_anchor, time_delta, price_scale, anchor, prices, volumes, extra, valid,
+                 columns, time_as_index):
+        self.time_anchor = time_anchor
+        self.time_delta = time_delta
+        self.price_scale = price_scale
+        self.anchor = anchor
+        self.prices = prices
+        self.volumes = volumes
+        self.extra = extra
+        self.valid = valid
+        self.columns = list(columns)
+        self.time_as_index = time_as_index
+
+    def __len__(self) -> int:
+        return len(self.time_delta)
+
+    @property
+    def nbytes(self) -> int:
+        """编码后占用的字节数"""
+        arrays = [self.time_delta, *self.prices.values()]
+        arrays.extend(arr for arr, _ in self.volumes.values())
+        arrays.extend(arr for arr, _ in self.extra.values())
+        if self.valid is not None:
+            arrays.append(self.valid)
+        return sum(arr.nbytes for arr in arrays)
+
+    def decode(self, columns: list = None) -> pd.DataFrame:
+        """
+        还原为 float 表，与编码前的数据完全相等。
+
+        Args:
+            columns (list): 只还原这些列，None 表示编码时的全部列。
+        """
+        columns = self.columns if columns is None else [c for c in self.columns if c in columns]
+        data = {}
+        if any(c in self.prices for c in columns):
+            close = self.anchor + np.cumsum(self.prices['close'], dtype='int64')
+            prev_close = np.empty_like(close)
+            prev_close[:1] = self.anchor
+            prev_close[1:] = close[:-1]
+            for name in PRICE_COLUMNS:
+                if name not in columns or name not in self.prices:
+                    continue
+                ticks = close if name == 'close' else prev_close + self.prices[name]
+                values = ticks / self.price_scale
+                if self.valid is not None:
+                    values[~self.valid] = np.nan
+                data[name] = values
+        for name, (arr, scale) in self.volumes.items():
+            if name in columns:
+                data[name] = arr.copy() if scale is None else arr / scale
+        for name, (arr, dtype) in self.extra.items():
+            if name in columns:
+                data[name] = arr.astype(dtype)
+
+        open_ms = self.time_anchor + np.cumsum(self.time_delta, dtype='int64')
+        open_time = pd.to_datetime(open_ms, unit='ms')
+        if self.time_as_index:
+            z = pd.DataFrame(data, index=pd.DatetimeIndex(open_time, name='open_time'))
+        else:
+            data['open_time'] = open_time
+            z = pd.DataFrame(data)
+        return z[[c for c in columns if c in z.columns]]
+
+
+def encode(z: pd.DataFrame, price_scale: int = None) -> TickBars:
+    """
+    把 load_data / resample_data 格式的K线编码为 TickBars。
+
+    Args:
+        z (pd.DataFrame): 含 PRICE_COLUMNS 的K线，open_time 为列或索引；
+            VOLUME_COLUMNS 与 count 存在时一并编码，其余列（close_time、ignore）丢弃。
+            open_time 须严格递增。
+        price_scale (int): 价格缩放倍数（1 / tick_size），None 时自动推断最小的无损倍数。
+
+    Returns:
+        TickBars: 编码结果。
+
+    Raises:
+        ValueError: 价格不在 tick 网格上，或 open_time 不是严格递增。
+    """
+    time_as_index = 'open_time' not in z.columns
+    open_time = z.index if time_as_index else z['open_time']
+    if pd.api.types.is_datetime64_any_dtype(open_time):
+        open_ms = np.asarray(open_time, dtype='datetime64[ms]').view('int64')
+    else:
+        open_ms = np.asarray(open_time, dtype='int64')
+
+    if np.any(np.diff(open_ms) <= 0):
+        raise ValueError("open_time 必须严格递增")
+    time_anchor = int(open_ms[0]) if len(open_ms) else 0
+    time_delta = np.diff(open_ms, prepend=time_anchor)
+
+    price_cols = [c for c in PRICE_COLUMNS if c in z.columns]
+    if 'close' not in price_cols:
+        raise ValueError("编码需要 close 列")
+    raw = {c: z[c].to_numpy(dtype='float64') for c in price_cols}
+    valid = ~np.isnan(raw['close'])
+    if price_scale is None:
+        price_scale = _find_scale(np.concatenate([v[valid] for v in raw.values()]))
+        if price_scale is None:
+            raise ValueError("价格无法无损地编码为整数 tick")
+
+    ticks = {}
+    for name, values in raw.items():
+        t = np.rint(values * price_scale)
+        if not np.array_equal(t[valid] / price_scale, values[valid]):
+            raise ValueError(f"{name} 列不在 1/{price_scale} 的 tick 网格上")
+        ticks[name] = t
+
+    # 空 bar 的价格沿用上一根有效 close，差分与偏移均为 0
+    close = pd.Series(np.where(valid, ticks['close'], np.nan)).ffill().bfill().to_numpy()
+    close = np.nan_to_num(close).astype('int64')
+    anchor = int(close[0]) if len(close) else 0
+    prev_close = np.r_[anchor, close[:-1]] if len(close) else close
+    prices = {'close': np.diff(close, prepend=anchor)}
+    for name in price_cols:
+        if name != 'close':
+            prices[name] = np.where(valid, ticks[name], prev_close).astype('int64') - prev_close
+    prices = {name: arr.astype(_smallest_int_dtype(arr)) for name, arr in prices.items()}
+
+    volumes = {}
+    for name in (c for c in VOLUME_COLUMNS if c in z.columns):
+        values = z[name].to_numpy(dtype='float64')
+        scale = _find_scale(values)
+        if scale is None:
+            volumes[name] = (values.copy(), None)
+            continue
+        scaled = np.rint(values * scale).astype('int64')
+        volumes[name] = (scaled.astype(_smallest_int_dtype(scaled)), scale)
+
+    extra = {}
+    if 'count' in z.columns:
+        count = z['count'].to_numpy(dtype='int64')
+        extra['count'] = (count.astype(_smallest_int_dtype(count)), z['count'].dtype)
+
+    columns = [c for c in z.columns if c in raw or c in volumes or c in extra or c == 'open_time']
+    time_delta = time_delta.astype(_smallest_int_dtype(time_delta))
+    return TickBars(time_anchor, time_delta, price_scale, anchor, prices, volumes, extra,
+                    None if valid.all() else valid, columns, time_as_index)